@@ -1,13 +1,49 @@
 import argparse
+import base64
+import hashlib
+import json
 import os
+import threading
 
-from flask import Flask, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
+from flask import Blueprint, Flask, Response, current_app, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+from sqlalchemy import and_, or_
 
-from .models_base import get_session
+from .cache import game_cache, game_cache_key
+from .models_base import configure_engine, get_read_only_session, pool_metrics
 from .scoreboard_game_model import ScoreboardGame
+from .draft_action_model import DraftAction
+from .draft_actions import DRAFT_SEQUENCE
+from .game_documents import (
+    ACCEPTED_MEDIA_TYPES, DEFAULT_GAME_FIELDS, GAME_FIELDS, GAME_FORMATS, encode_game, game_load_options,
+    read_game_document, serialize_game,
+)
+from .ingest_events import KEEPALIVE_INTERVAL, RETRY_MS, ingest_feed, sse_message
+from .partitions import in_partition, season_router
+from .instrumentation import PROFILING_ENABLED, STATEMENT_BUCKETS, Registry, RequestTimings, SamplingProfiler, timed
+from .search_index import AUTOCOMPLETE_LIMIT, SEARCH_TYPES, autocomplete_index, search
+from .stats_rollup import SIDES, champion_stats, team_stats
+from .stats_rollup_model import ALL
 
-app = Flask(__name__)
+class TimedJSONProvider(DefaultJSONProvider):
+    """Counts JSON encoding time into the request's `serialize` phase."""
+
+    def dumps(self, obj, **kwargs):
+        with timed('serialize'):
+            return super().dumps(obj, **kwargs)
+
+
+bp = Blueprint('api', __name__)
+
+GAMES_PAGE_SIZE = 50
+GAMES_MAX_PAGE_SIZE = 500
+GAMES_BATCH_MAX_IDS = 500
+SIMILAR_DRAFTS_DEFAULT_K = 10
+SIMILAR_DRAFTS_MAX_K = 100
+SEARCH_DEFAULT_LIMIT = 5
+SEARCH_MAX_LIMIT = 50
 
 # Helper function at module level
 def _split_comma_separated(cs_string: str | None) -> list[str]:
@@ -15,88 +51,606 @@ def _split_comma_separated(cs_string: str | None) -> list[str]:
         return []
     return [item.strip() for item in cs_string.split(',')]
 
-# Database Configuration
-db_url_default = 'sqlite:///./app.db'
-db_url_env = os.environ.get('DATABASE_URL')
+# Win-probability tables built offline by bin/build_draft_tables, memory-mapped on first use
+draft_model = None
+# Concurrent first requests would otherwise each load (and map) the tables
+_draft_model_lock = threading.Lock()
+
+def get_draft_model():
+    global draft_model
+    if draft_model is None:
+        with _draft_model_lock:
+            if draft_model is None:
+                from .draft_model import DraftModel
+                draft_model = DraftModel.load()
+    return draft_model
+
+def get_db_session():
+    """The request's read-only session, opened on first use and closed when the request ends."""
+    if 'db_session' not in g:
+        g.db_session = get_read_only_session()
+    return g.db_session
+
+def close_db_session(exception=None):
+    session = g.pop('db_session', None)
+    if session is not None:
+        session.close()
+
+
+# --- Instrumentation ---
+# Per process: with several Gunicorn workers, each one serves its own /metrics.
+metrics = Registry()
+REQUESTS = metrics.counter('api_requests_total', "Requests served.", ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = metrics.histogram('api_request_duration_seconds', "Request latency until the response is built.", ('endpoint',))
+PHASE_SECONDS = metrics.histogram(
+    'api_request_phase_seconds', "Request time per phase: db, hydrate (ORM), serialize (JSON) and app (the rest).",
+    ('endpoint', 'phase'))
+SQL_STATEMENTS = metrics.histogram(
+    'api_request_sql_statements', "SQL statements executed per request.", ('endpoint',), buckets=STATEMENT_BUCKETS)
+POOL_GAUGES = {
+    key: metrics.gauge(f'db_pool_{key}', f"Connection pool {key.replace('_', ' ')}.", ('engine',))
+    for key in ('checked_out', 'overflow', 'checkouts', 'timeouts', 'wait_seconds_total', 'wait_seconds_max')
+}
+
+@metrics.on_render
+def _refresh_pool_gauges():
+    for engine_name, snapshot in pool_metrics().items():
+        for key, gauge in POOL_GAUGES.items():
+            if key in snapshot:
+                gauge.set(snapshot[key], engine=engine_name)
+
+def observe_request(timings, endpoint, method, status):
+    """Records a request's count, latency, phases and SQL statements (a RequestTimings) for /metrics."""
+    phases = timings.phases()
+    REQUESTS.inc(endpoint=endpoint, method=method, status=status)
+    REQUEST_SECONDS.observe(phases.pop('total'), endpoint=endpoint)
+    for phase, seconds in phases.items():
+        PHASE_SECONDS.observe(seconds, endpoint=endpoint, phase=phase)
+    SQL_STATEMENTS.observe(timings.statements, endpoint=endpoint)
+
+@bp.before_app_request
+def start_request_timings():
+    g.timings = RequestTimings().activate()
+    # Opt-in sampling profile of this request, e.g. curl -H 'X-Profile: 1' (needs API_PROFILING=1)
+    if PROFILING_ENABLED and request.headers.get('X-Profile'):
+        g.profiler = SamplingProfiler().start()
+
+@bp.after_app_request
+def record_request_timings(response):
+    """
+    Records the request's metrics and reports its phases in a Server-Timing header.
+    Streamed responses (format=ndjson) are measured up to their first byte only.
+    """
+    timings = g.get('timings')
+    if timings is None:
+        return response
+    # Labelled without the blueprint prefix ("api.list_games" -> "list_games")
+    endpoint = request.endpoint.rpartition('.')[2] if request.endpoint else 'unmatched'
+    observe_request(timings, endpoint, request.method, response.status_code)
+    response.headers['Server-Timing'] = timings.server_timing()
+    response.headers['X-SQL-Statements'] = str(timings.statements)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        try:
+            response.headers['X-Profile-File'] = os.path.basename(profiler.save(endpoint))
+        except OSError as e:
+            current_app.logger.error(f"Could not save the request profile: {e}")
+    return response
 
-parser = argparse.ArgumentParser(description='Flask API with SQLAlchemy')
-parser.add_argument('--db_url', dest='db_url', default=db_url_env or db_url_default,
-                    help=f'Database URL (default: {db_url_default}, or DATABASE_URL env var)')
-args, unknown = parser.parse_known_args()
+@bp.teardown_app_request
+def end_request_timings(exception=None):
+    timings = g.pop('timings', None)
+    if timings is not None:
+        timings.deactivate()
 
-app.config['SQLALCHEMY_DATABASE_URI'] = args.db_url
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics: requests, latency and phase histograms, SQL statements per request, pool usage."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 
-@app.route('/echo', methods=['POST'])
+@bp.route('/echo', methods=['POST'])
 def echo():
     data = request.get_json()
     if not data or 'message' not in data:
         return jsonify({"error": "No message provided"}), 400
     return jsonify({"echo": data['message']})
 
-@app.route('/')
+@bp.route('/')
 def home():
     return "Flask API is running!"
 
-@app.route('/games/<string:game_id>', methods=['GET'])
+@bp.route('/metrics/pool', methods=['GET'])
+def get_pool_metrics():
+    """Connection pool usage: checked out/in connections, overflow and checkout wait times."""
+    return jsonify(pool_metrics()), 200
+
+def requested_game_fields(value: str | None = None) -> tuple[str, ...]:
+    """
+    The fields requested with `?fields=a,b` (or in `value`), DEFAULT_GAME_FIELDS without it.
+    Raises ValueError for unknown fields.
+    """
+    value = request.args.get('fields') if value is None else value
+    if not value:
+        return DEFAULT_GAME_FIELDS
+    fields = tuple(dict.fromkeys(_split_comma_separated(value)))
+    unknown = [field for field in fields if field not in GAME_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(GAME_FIELDS)}")
+    return fields
+
+def requested_game_format(accept: str | None = None) -> str:
+    """The GAME_FORMATS key best matching the request's Accept header (or `accept`), JSON by default."""
+    accepted = request.accept_mimetypes if accept is None else parse_accept_header(accept, MIMEAccept)
+    return ACCEPTED_MEDIA_TYPES[accepted.best_match(ACCEPTED_MEDIA_TYPES, default=next(iter(ACCEPTED_MEDIA_TYPES)))]
+
+def game_body(game_id: str, fields, open_session, format='json') -> tuple[str, bytes] | None:
+    """
+    (ETag, body) of a game in `format`, from the response cache, else from its GameDocument
+    or serialized from ScoreboardGames with a session from `open_session()`; None if the
+    game doesn't exist. Database errors propagate.
+    """
+    # Only the default projection is cached and materialized, so invalidating a game is one key per format
+    cache_key = game_cache_key(game_id, format) if fields == DEFAULT_GAME_FIELDS else None
+    cached = game_cache.get(cache_key) if cache_key else None
+    if cached is None:
+        session = open_session()
+        body = None
+        if cache_key:
+            for schema, _ in season_router.for_games(session, [game_id]):
+                body = read_game_document(session, game_id, format, schema)
+                if body is not None:
+                    break
+        if body is None:
+            game = _find_games(session, [game_id], fields).get(game_id)
+            if not game:
+                return None
+            with timed('serialize'):
+                body = encode_game(serialize_game(game, fields), format)
+        cached = (hashlib.sha1(body).hexdigest(), body)
+        if cache_key:
+            game_cache.set(cache_key, cached)
+    return cached
+
+def _find_games(session, game_ids, fields) -> dict[str, ScoreboardGame]:
+    """The stored games among `game_ids` by GameId, loaded for `fields`, from whichever partitions hold them."""
+    query = session.query(ScoreboardGame).options(*game_load_options(fields))
+    found = {}
+    missing = set(game_ids)
+    for schema, candidates in season_router.for_games(session, list(missing)):
+        wanted = missing if candidates is None else missing & candidates
+        if wanted:
+            for game in query.filter(ScoreboardGame.GameId.in_(wanted)).execution_options(**in_partition(schema)):
+                found[game.GameId] = game
+            missing -= found.keys()
+        if not missing:
+            break
+    return found
+
+def stream_start(last_event_id: str | None) -> int:
+    """The id a /games/stream stream starts after: the client's Last-Event-ID, else the newest event's."""
+    newest = ingest_feed.start()
+    if not last_event_id:
+        return newest
+    if not last_event_id.strip().isdigit():
+        raise ValueError("Last-Event-ID must be an event id")
+    return int(last_event_id)
+
+@bp.route('/games/stream', methods=['GET'])
+def stream_games():
+    """
+    Pushes a server-sent `game` event for each game the ingest daemon (api.bin.ingest)
+    stores, with its id, tournament and date, instead of clients polling /games/<game_id>.
+
+    A reconnecting EventSource sends the last event id it got as Last-Event-ID and first
+    receives the events it missed. Idle streams get a comment every KEEPALIVE_INTERVAL
+    seconds. Each stream holds a thread: serve it with threaded workers
+    (gunicorn -k gthread) or api.asgi, which streams without one.
+    """
+    try:
+        after_id = stream_start(request.headers.get('Last-Event-ID'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Database error while starting the game stream: {e}")
+        return jsonify({"error": "Internal server error during database query"}), 500
+
+    def generate(after_id):
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            events = ingest_feed.wait(after_id, KEEPALIVE_INTERVAL)
+            if not events:
+                yield ": keepalive\n\n"
+            for event_id, data in events:
+                yield sse_message(event_id, data)
+                after_id = event_id
+
+    response = Response(generate(after_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Nginx: pass events through as they come
+    return response
+
+@bp.route('/games/<string:game_id>', methods=['GET'])
 def get_game_details(game_id: str):
     """
     Retrieves detailed information for a specific game by its ID.
 
+    `?fields=` selects the response fields (see GAME_FIELDS); only the columns they
+    need are read. Responses are cached and carry an ETag; a request whose If-None-Match
+    matches gets a 304 without a body. A game can still be corrected (see verify_data), so
+    clients and proxies may store a response but must revalidate it before reusing it.
+    The default fields are served from the game's precomputed GameDocument. The body is
+    compact JSON, or msgpack when the Accept header prefers application/msgpack.
+
     Args:
         game_id: The unique identifier for the game.
 
     Returns:
         A JSON response containing the game details if found (200 OK).
+        Returns a 400 error for unknown fields.
         Returns a 404 error if the game_id does not exist.
         Returns a 500 error for other internal server issues.
     """
-    session = get_session()
     try:
-        game = session.query(ScoreboardGame).filter(ScoreboardGame.GameId == game_id).first()
+        fields = requested_game_fields()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        format = requested_game_format()
+        cached = game_body(game_id, fields, get_db_session, format)
     except Exception as e:
-        app.logger.error(f"Database error while fetching game {game_id}: {e}")
+        current_app.logger.error(f"Database error while fetching game {game_id}: {e}")
         return jsonify({"error": "Internal server error during database query"}), 500
-    finally:
-        session.close()
-
-    if not game:
+    # Misses aren't cached, so a game shows up as soon as it is collected.
+    if cached is None:
         return jsonify({"error": "Game not found"}), 404
 
-    # If an error occurs during these assignments or in _split_comma_separated,
-    # Flask's default error handling will take over (usually resulting in a 500).
-    winner_team_str = "blue" if game.Winner == 1 else "red" if game.Winner == 2 else "unknown"
-    blue_team_name = game.Team1 if game.Team1 else "Blue Team"
-    red_team_name = game.Team2 if game.Team2 else "Red Team"
-
-    response_data = {
-        "id": game.GameId,
-        "match": game.MatchId,
-        "tournament": game.Tournament,
-        "date": game.DateTime_UTC,
-        "blue": {
-            "team": {
-                "name": blue_team_name,
-                "logo": "<url_placeholder>",
-                "players": _split_comma_separated(game.Team1Players),
-            },
-            "bans": _split_comma_separated(game.Team1Bans),
-            "picks": _split_comma_separated(game.Team1Picks),
-        },
-        "red": {
-            "team": {
-                "name": red_team_name,
-                "logo": "<url_placeholder>",
-                "players": _split_comma_separated(game.Team2Players),
-            },
-            "bans": _split_comma_separated(game.Team2Bans),
-            "picks": _split_comma_separated(game.Team2Picks),
-        },
-        "winner": winner_team_str
-    }
-    return jsonify(response_data), 200
+    etag, body = cached
+    response = Response(body, mimetype=GAME_FORMATS[format][0])
+    response.vary.add('Accept')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@bp.route('/games:batch', methods=['POST'])
+def get_games_batch():
+    """
+    Retrieves several games at once with a single IN query, e.g. for a series or a bracket.
+
+    Expects a JSON body {"ids": [...]} with at most GAMES_BATCH_MAX_IDS ids. Returns one result
+    per requested id, in request order: {"id", "status": 200, "game"} with the get_game_details
+    shape, or {"id", "status": 404, "error"} for unknown ids. Accepts `?fields=` like get_game_details.
+    """
+    try:
+        fields = requested_game_fields()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    data = request.get_json(silent=True)
+    game_ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(game_ids, list) or not all(isinstance(game_id, str) for game_id in game_ids):
+        return jsonify({"error": "Expected a JSON body with an 'ids' list of strings"}), 400
+    if len(game_ids) > GAMES_BATCH_MAX_IDS:
+        return jsonify({"error": f"At most {GAMES_BATCH_MAX_IDS} ids per batch"}), 400
+
+    session = get_db_session()
+    try:
+        games = _find_games(session, game_ids, fields) if game_ids else {}
+    except Exception as e:
+        current_app.logger.error(f"Database error while fetching a batch of {len(game_ids)} games: {e}")
+        return jsonify({"error": "Internal server error during database query"}), 500
+
+    found = {game_id: serialize_game(game, fields) for game_id, game in games.items()}
+    return jsonify({"results": [
+        {"id": game_id, "status": 200, "game": found[game_id]} if game_id in found
+        else {"id": game_id, "status": 404, "error": "Game not found"}
+        for game_id in game_ids
+    ]}), 200
+
+def _encode_cursor(game: ScoreboardGame) -> str:
+    raw = json.dumps([game.DateTime_UTC, game.GameId]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    """Raises ValueError for a malformed cursor."""
+    try:
+        date, game_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    return date, game_id
+
+def _date_range(args) -> tuple[str | None, str | None]:
+    """The listing's (from, to) DateTime_UTC bounds; a bare `to` date includes the whole day."""
+    to = args.get('to')
+    return args.get('from') or None, (to + ' 23:59:59' if to and len(to) == 10 else to) or None
+
+def _games_query(session, args):
+    """ScoreboardGames matching the listing filters, newest first; games without a date are not listed."""
+    query = session.query(ScoreboardGame).filter(ScoreboardGame.DateTime_UTC.isnot(None))
+    if args.get('tournament'):
+        query = query.filter(ScoreboardGame.Tournament == args['tournament'])
+    if args.get('patch'):
+        query = query.filter(ScoreboardGame.Patch == args['patch'])
+    if args.get('team'):
+        query = query.filter(or_(ScoreboardGame.Team1 == args['team'], ScoreboardGame.Team2 == args['team']))
+    if args.get('champion'):
+        picked = session.query(DraftAction.GameId) \
+            .filter(DraftAction.Champion == args['champion'], DraftAction.ActionType == 'pick')
+        query = query.filter(ScoreboardGame.GameId.in_(picked))
+    first, last = _date_range(args)
+    if first:
+        query = query.filter(ScoreboardGame.DateTime_UTC >= first)
+    if last:
+        query = query.filter(ScoreboardGame.DateTime_UTC <= last)
+    return query.order_by(ScoreboardGame.DateTime_UTC.desc(), ScoreboardGame.GameId.desc())
+
+def _after_cursor(query, cursor):
+    date, game_id = cursor
+    return query.filter(or_(
+        ScoreboardGame.DateTime_UTC < date,
+        and_(ScoreboardGame.DateTime_UTC == date, ScoreboardGame.GameId < game_id),
+    ))
+
+def _games_page(session, query, cursor, limit, date_range=(None, None)) -> list[ScoreboardGame]:
+    """
+    The first `limit` games of `query` after `cursor`, from the partitions holding games in
+    `date_range` (and older than the cursor). Partitions are read latest games first, and the
+    rest skipped once none can hold a game newer than the page's last.
+    """
+    first, last = date_range
+    if cursor and (last is None or cursor[0] < last):
+        last = cursor[0]
+    page = []
+    for schema, last_date in season_router.for_dates(session, first, last):
+        if len(page) >= limit and last_date < page[-1].DateTime_UTC:
+            break
+        games = (_after_cursor(query, cursor) if cursor else query).execution_options(**in_partition(schema)).limit(limit).all()
+        # Season date ranges can overlap, e.g. a 2024 season game played in January 2025
+        page = sorted(page + games, key=lambda game: (game.DateTime_UTC, game.GameId), reverse=True)[:limit]
+    return page
+
+@bp.route('/games', methods=['GET'])
+def list_games():
+    """
+    Lists games newest first, filtered by `tournament`, `team`, `patch`, `champion` (picked)
+    and a `from`/`to` date range.
+
+    Pages are keyset-paginated on (DateTime_UTC, GameId): pass the returned `next_cursor`
+    as `cursor` to get the next page, and `limit` (max 500) to size pages.
+    With `format=ndjson` every matching game is streamed, one JSON object per line.
+    `fields` projects each game like get_game_details.
+    """
+    try:
+        fields = requested_game_fields()
+        cursor = _decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        limit = min(max(int(request.args.get('limit', GAMES_PAGE_SIZE)), 1), GAMES_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    session = get_db_session()
+    base_query = _games_query(session, request.args).options(*game_load_options(fields))
+    date_range = _date_range(request.args)
+
+    if request.args.get('format') == 'ndjson':
+        def generate(cursor):
+            # Fetched page by page so neither the rows nor the response are held in memory at once
+            while True:
+                page = _games_page(session, base_query, cursor, GAMES_MAX_PAGE_SIZE, date_range)
+                for game in page:
+                    yield json.dumps(serialize_game(game, fields)) + "\n"
+                if len(page) < GAMES_MAX_PAGE_SIZE:
+                    return
+                cursor = (page[-1].DateTime_UTC, page[-1].GameId)
+                session.expunge_all()
+        return Response(stream_with_context(generate(cursor)), mimetype='application/x-ndjson')
+
+    try:
+        games = _games_page(session, base_query, cursor, limit + 1, date_range)
+    except Exception as e:
+        current_app.logger.error(f"Database error while listing games: {e}")
+        return jsonify({"error": "Internal server error during database query"}), 500
+
+    has_more = len(games) > limit
+    games = games[:limit]
+    return jsonify({
+        "games": [serialize_game(game, fields) for game in games],
+        "next_cursor": _encode_cursor(games[-1]) if has_more else None,
+    }), 200
+
+@bp.route('/drafts/similar', methods=['GET'])
+def get_similar_drafts():
+    """
+    The past games whose drafts are most similar to a query draft, from the in-memory DraftIndex.
+
+    The draft is given either as `picks` / `bans` (comma-separated champions, both sides
+    together) or as an existing `game_id`, which is then left out of the results. `k`
+    (max 100) sets the number of results. Similarity is a weighted Jaccard of the picks and bans.
+    """
+    try:
+        k = min(max(int(request.args.get('k', SIMILAR_DRAFTS_DEFAULT_K)), 1), SIMILAR_DRAFTS_MAX_K)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    session = get_db_session()
+    game_id = request.args.get('game_id')
+    if game_id:
+        game = _find_games(session, [game_id], ("blue", "red")).get(game_id)
+        if not game:
+            return jsonify({"error": "Game not found"}), 404
+        picks = _split_comma_separated(game.Team1Picks) + _split_comma_separated(game.Team2Picks)
+        bans = _split_comma_separated(game.Team1Bans) + _split_comma_separated(game.Team2Bans)
+    else:
+        picks = _split_comma_separated(request.args.get('picks'))
+        bans = _split_comma_separated(request.args.get('bans'))
+        if not picks and not bans:
+            return jsonify({"error": "Provide picks and/or bans, or a game_id"}), 400
+
+    # The index (and numpy) is only imported by processes that serve this endpoint
+    from .draft_similarity import draft_index
+    try:
+        draft_index.refresh_if_stale(session, season_router.schemas(session))
+        matches = draft_index.similar(picks, bans, k=k, exclude=[game_id] if game_id else ())
+        fields = ("id", "tournament", "date", "blue", "red", "winner")
+        games = _find_games(session, [match[0] for match in matches], fields)
+    except Exception as e:
+        current_app.logger.error(f"Error while searching similar drafts: {e}")
+        return jsonify({"error": "Internal server error during draft search"}), 500
+
+    found = {game_id: serialize_game(game, fields) for game_id, game in games.items()}
+    return jsonify({
+        "query": {"picks": picks, "bans": bans},
+        "results": [{
+            "id": match_id,
+            "similarity": round(similarity, 4),
+            "picks_similarity": round(picks_similarity, 4),
+            "bans_similarity": round(bans_similarity, 4),
+            "game": found.get(match_id),
+        } for match_id, similarity, picks_similarity, bans_similarity in matches],
+    }), 200
+
+@bp.route('/drafts/predict', methods=['POST'])
+def predict_draft():
+    """
+    Win probability of a partial draft and the best champions for its next action.
+
+    Expects a JSON body with the draft so far, either as `draft` ({"Team1Ban1": "Yone", ...},
+    keyed by PicksAndBansS7 columns) or as `actions` (champions in tournament draft order),
+    plus optional `patch` (selects the matching patch-range tables) and `top` (max 50).
+    Answers from precomputed tables only, no database access.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON body"}), 400
+    if isinstance(data.get('actions'), list):
+        if len(data['actions']) > len(DRAFT_SEQUENCE):
+            return jsonify({"error": f"A draft has at most {len(DRAFT_SEQUENCE)} actions"}), 400
+        draft = {step[0]: champion for step, champion in zip(DRAFT_SEQUENCE, data['actions'])}
+    elif isinstance(data.get('draft'), dict):
+        columns = {step[0] for step in DRAFT_SEQUENCE}
+        unknown = [column for column in data['draft'] if column not in columns]
+        if unknown:
+            return jsonify({"error": f"Unknown draft columns: {', '.join(unknown)}"}), 400
+        draft = data['draft']
+    else:
+        return jsonify({"error": "Provide the draft as 'draft' or 'actions'"}), 400
+    if not all(champion is None or isinstance(champion, str) for champion in draft.values()):
+        return jsonify({"error": "Champions must be strings"}), 400
+    try:
+        top = min(max(int(data.get('top', 10)), 1), 50)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    tables = get_draft_model().tables_for(data.get('patch'))
+    if tables is None:
+        return jsonify({"error": "Draft tables are not built, run bin/build_draft_tables"}), 503
+    return jsonify(tables.predict(draft, top=top)), 200
+
+def _stats_slice():
+    """The (patch, tournament, side) slice from the query string, or None if `side` is invalid."""
+    side = request.args.get('side', ALL)
+    if side not in SIDES.values() and side != ALL:
+        return None
+    return request.args.get('patch', ALL), request.args.get('tournament', ALL), side
+
+@bp.route('/stats/champions', methods=['GET'])
+def get_champion_stats():
+    """
+    Pick, ban, win rates and presence per champion, from the ChampionStats rollup.
+
+    Query parameters `patch`, `tournament` and `side` ('blue' or 'red') narrow the slice;
+    `champion` returns a single champion.
+    """
+    stats_slice = _stats_slice()
+    if stats_slice is None:
+        return jsonify({"error": "side must be 'blue' or 'red'"}), 400
+    try:
+        data = champion_stats(get_db_session(), *stats_slice, champion=request.args.get('champion'))
+    except Exception as e:
+        current_app.logger.error(f"Database error while fetching champion stats: {e}")
+        return jsonify({"error": "Internal server error during database query"}), 500
+    return jsonify(data), 200
+
+@bp.route('/stats/teams', methods=['GET'])
+def get_team_stats():
+    """Games and win rate per team, from the TeamStats rollup. Accepts the same slice parameters, plus `team`."""
+    stats_slice = _stats_slice()
+    if stats_slice is None:
+        return jsonify({"error": "side must be 'blue' or 'red'"}), 400
+    try:
+        data = team_stats(get_db_session(), *stats_slice, team=request.args.get('team'))
+    except Exception as e:
+        current_app.logger.error(f"Database error while fetching team stats: {e}")
+        return jsonify({"error": "Internal server error during database query"}), 500
+    return jsonify(data), 200
+
+@bp.route('/search', methods=['GET'])
+def search_names():
+    """
+    Teams, players, tournaments and champions matching `q`, from the SearchIndex FTS5 table.
+
+    Every word of `q` must start a word of the name. Results come grouped by type (teams,
+    players, tournaments, champions), then exact matches and most games first; `limit`
+    (max 50) applies per type and `type` keeps a single type.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Provide a query with q"}), 400
+    entity_type = request.args.get('type')
+    if entity_type is not None and entity_type not in SEARCH_TYPES:
+        return jsonify({"error": f"type must be one of {', '.join(SEARCH_TYPES)}"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', SEARCH_DEFAULT_LIMIT)), 1), SEARCH_MAX_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        results = search(get_db_session(), query, types=(entity_type,) if entity_type else SEARCH_TYPES, limit=limit)
+    except Exception as e:
+        current_app.logger.error(f"Database error while searching: {e}")
+        return jsonify({"error": "Internal server error during search"}), 500
+    return jsonify({"query": query, "results": results}), 200
+
+@bp.route('/search/autocomplete', methods=['GET'])
+def autocomplete_names():
+    """Names with a word starting with `q`, most games first, from the in-memory prefix trie. `limit` max 10."""
+    query = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', AUTOCOMPLETE_LIMIT)), 1), AUTOCOMPLETE_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        autocomplete_index.refresh_if_stale(get_read_only_session)
+    except Exception as e:
+        current_app.logger.error(f"Database error while refreshing the autocomplete index: {e}")
+        return jsonify({"error": "Internal server error during search"}), 500
+    return jsonify({"query": query, "results": autocomplete_index.complete(query, limit)}), 200
+
+def create_app(db_url=None) -> Flask:
+    """
+    Builds the Flask app. Nothing heavy happens here: the database engines, draft tables
+    and similarity index are created on first use, in the process that serves the request
+    (so after Gunicorn forks its workers). `db_url` overrides LEAGUE_DB_PATH / DATABASE_URL
+    for the process-wide engines in models_base.
+    """
+    if db_url:
+        configure_engine(db_url)
+    flask_app = Flask(__name__)
+    flask_app.json = TimedJSONProvider(flask_app)
+    flask_app.register_blueprint(bp)
+    flask_app.teardown_appcontext(close_db_session)
+    return flask_app
+
+
+# The app served by `gunicorn api.app:app` and `flask --app api.app`; cheap to build
+app = create_app()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Flask API with SQLAlchemy')
+    parser.add_argument('--db_url', dest='db_url', default=None,
+                        help='Database URL (default: LEAGUE_DB_PATH, or DATABASE_URL env var)')
+    args = parser.parse_args()
+    if args.db_url:
+        configure_engine(args.db_url)
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,290 @@
+"""
+ASGI serving mode, e.g. `python -m uvicorn api.asgi:app --port 5000`.
+
+The event loop only accepts connections and moves bytes; anything that reads the database
+runs on DB_EXECUTOR, a dedicated thread pool sized to the connection pool, so one process
+keeps many connections open while at most ASGI_DB_THREADS requests hold a DB connection.
+
+GET /games/<id> and POST /echo are native async handlers: a game whose response is in the
+in-process cache is answered on the loop without a thread, and only cache misses go to the
+pool. GET /games/stream is native too: its streams wait on the loop for the ingest event
+feed's wake-ups, so open streams hold no thread. Every other route runs the Flask app (WSGI) on the same pool, so all routes, status
+codes and bodies are the ones of the sync server.
+"""
+import asyncio
+import contextvars
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs
+
+from werkzeug.http import parse_etags
+
+from .app import (
+    REQUESTS, app as flask_app, game_body, game_cache, game_cache_key, observe_request, requested_game_fields,
+    requested_game_format, stream_start, DEFAULT_GAME_FIELDS, GAME_FORMATS,
+)
+from .instrumentation import RequestTimings
+from .ingest_events import KEEPALIVE_INTERVAL, RETRY_MS, ingest_feed, sse_message
+from .models_base import POOL_MAX_OVERFLOW, POOL_SIZE, get_read_only_session
+
+# Threads running DB reads and WSGI fallbacks; more would only wait on the connection pool
+ASGI_DB_THREADS = int(os.environ.get('ASGI_DB_THREADS', POOL_SIZE + POOL_MAX_OVERFLOW))
+DB_EXECUTOR = ThreadPoolExecutor(max_workers=ASGI_DB_THREADS, thread_name_prefix='asgi-db')
+
+_JSON_HEADERS = [(b'content-type', flask_app.json.mimetype.encode())]
+
+
+def _json_body(data):
+    # Same bytes as Flask's jsonify
+    return flask_app.json.dumps(data).encode() + b"\n"
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def _respond(send, status, body=b'', headers=()):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': list(headers) + [(b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+    return status
+
+
+def _header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+# --- Native handlers ---
+def _load_game(game_id, fields, format):
+    """Runs on DB_EXECUTOR: the game's (ETag, body) from the shared cache or the database."""
+    session = None
+
+    def open_session():
+        nonlocal session
+        session = get_read_only_session()
+        return session
+
+    try:
+        return game_body(game_id, fields, open_session, format)
+    finally:
+        if session is not None:
+            session.close()
+
+
+async def get_game_details(scope, receive, send, game_id):
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+    try:
+        fields = requested_game_fields(query.get('fields', [''])[0])
+    except ValueError as e:
+        return await _respond(send, 400, _json_body({"error": str(e)}), _JSON_HEADERS)
+
+    format = requested_game_format(_header(scope, b'accept') or '')
+    cached = game_cache.local.get(game_cache_key(game_id, format)) if fields == DEFAULT_GAME_FIELDS else None
+    if cached is None:
+        try:
+            # The request's timings are a context variable, which executor threads don't inherit
+            cached = await asyncio.get_running_loop().run_in_executor(
+                DB_EXECUTOR, contextvars.copy_context().run, _load_game, game_id, fields, format)
+        except Exception as e:
+            flask_app.logger.error(f"Database error while fetching game {game_id}: {e}")
+            return await _respond(send, 500, _json_body({"error": "Internal server error during database query"}), _JSON_HEADERS)
+    if cached is None:
+        return await _respond(send, 404, _json_body({"error": "Game not found"}), _JSON_HEADERS)
+
+    etag, body = cached
+    headers = [(b'etag', f'"{etag}"'.encode()), (b'cache-control', b'public, no-cache'),
+               (b'vary', b'Accept')]
+    # Weak comparison, like Flask's conditional responses: W/"etag" matches too
+    if parse_etags(_header(scope, b'if-none-match')).contains_weak(etag):
+        return await _respond(send, 304, b'', headers)
+    return await _respond(send, 200, body, [(b'content-type', GAME_FORMATS[format][0].encode())] + headers)
+
+
+async def _disconnected(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream_games(scope, receive, send):
+    """The Flask stream_games' events, sent from the loop until the client disconnects."""
+    loop = asyncio.get_running_loop()
+    try:
+        after_id = await loop.run_in_executor(DB_EXECUTOR, stream_start, _header(scope, b'last-event-id'))
+    except ValueError as e:
+        return await _respond(send, 400, _json_body({"error": str(e)}), _JSON_HEADERS)
+    except Exception as e:
+        flask_app.logger.error(f"Database error while starting the game stream: {e}")
+        return await _respond(send, 500, _json_body({"error": "Internal server error during database query"}), _JSON_HEADERS)
+
+    wake = asyncio.Event()
+    listener = partial(loop.call_soon_threadsafe, wake.set)
+    ingest_feed.add_listener(listener)
+    disconnected = asyncio.ensure_future(_disconnected(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'), (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')]})
+        await send({'type': 'http.response.body', 'body': f"retry: {RETRY_MS}\n\n".encode(), 'more_body': True})
+        while not disconnected.done():
+            wake.clear()
+            events = ingest_feed.events_after(after_id)
+            if events is None: # fell behind the buffer
+                events = await loop.run_in_executor(DB_EXECUTOR, ingest_feed.catch_up, after_id)
+            if events:
+                after_id = events[-1][0]
+                body = "".join(sse_message(event_id, data) for event_id, data in events)
+                await send({'type': 'http.response.body', 'body': body.encode(), 'more_body': True})
+                continue
+            woken = asyncio.ensure_future(wake.wait())
+            done, _ = await asyncio.wait({woken, disconnected}, timeout=KEEPALIVE_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+            woken.cancel()
+            if not done:
+                await send({'type': 'http.response.body', 'body': b": keepalive\n\n", 'more_body': True})
+        return 200
+    finally:
+        ingest_feed.remove_listener(listener)
+        disconnected.cancel()
+
+
+async def echo(scope, receive, send, body):
+    """
+    The JSON happy path of /echo, returning the response status; anything else returns None
+    and goes to Flask for its exact error responses.
+    """
+    try:
+        data = json.loads(body) if (_header(scope, b'content-type') or '').startswith('application/json') else None
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return None
+    if 'message' not in data:
+        return await _respond(send, 400, _json_body({"error": "No message provided"}), _JSON_HEADERS)
+    return await _respond(send, 200, _json_body({"echo": data['message']}), _JSON_HEADERS)
+
+
+# --- WSGI fallback ---
+def _environ(scope, body):
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _run_wsgi(environ, loop, send):
+    """Runs on DB_EXECUTOR: calls the Flask app and streams its response back through the loop."""
+    def call(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+    result = flask_app(environ, start_response)
+    try:
+        started = False
+        for chunk in result:
+            if not started:
+                call({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+                started = True
+            if chunk:
+                call({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        if not started:
+            call({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+        call({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+
+
+async def _wsgi(scope, send, body):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(DB_EXECUTOR, _run_wsgi, _environ(scope, body), loop, send)
+
+
+# --- Application ---
+async def _send_timed(send, timings, message):
+    """Sends `message`, adding the Server-Timing and X-SQL-Statements headers Flask responses have."""
+    if message['type'] == 'http.response.start':
+        message = dict(message, headers=list(message['headers']) + [
+            (b'server-timing', timings.server_timing().encode()), (b'x-sql-statements', str(timings.statements).encode())])
+    await send(message)
+
+
+async def _timed(endpoint, handler, scope, receive, send, *args):
+    """
+    Runs a native handler with the request timings and headers of a Flask response, and counts
+    it with the Flask responses on /metrics; a handler returning None left the request to Flask.
+    """
+    timings = RequestTimings().activate()
+    try:
+        status = await handler(scope, receive, partial(_send_timed, send, timings), *args)
+    finally:
+        timings.deactivate()
+    if status is not None:
+        observe_request(timings, endpoint, scope['method'], status)
+    return status
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            DB_EXECUTOR.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+    path, method = scope['path'], scope['method']
+    if method == 'GET' and path == '/games/stream':
+        # Counted once the stream ends
+        status = await stream_games(scope, receive, send)
+        REQUESTS.inc(endpoint='stream_games', method=method, status=status)
+        return
+    game_id = path[len('/games/'):] if path.startswith('/games/') else ''
+    if method == 'GET' and game_id and '/' not in game_id:
+        await _timed('get_game_details', get_game_details, scope, receive, send, game_id)
+        return
+    body = await _read_body(receive)
+    if method == 'POST' and path == '/echo' and await _timed('echo', echo, scope, receive, send, body) is not None:
+        return
+    await _wsgi(scope, send, body)
@@ -0,0 +1,283 @@
+"""
+Latency and throughput of the API endpoints under concurrent clients, on a synthetic database.
+
+Each server (the Flask dev server, Gunicorn as in the Dockerfile, and Uvicorn running the
+ASGI mode of api/asgi.py) is started as a subprocess on a synthetic database (500k games by
+default, generated once and kept at --dataset, ~20 minutes for 500k). Every endpoint is then
+hit by --concurrency keep-alive clients for --duration seconds, after a warmup; requests are
+drawn from random games, teams, patches and drafts of the dataset. Reported per endpoint:
+requests/sec, p50/p95/p99/max latency and errors.
+
+Results are written as JSON to data/bench/results/api-<time>-<commit>.json; pass a previous
+file to --compare to print the change per endpoint.
+
+The clients are threads of this process, so at very high request rates they compete with
+each other for the GIL; compare runs made with the same settings on the same machine.
+
+Usage: python -m api.benchmarks.bench_api [--games 500000] [--server gunicorn --server uvicorn]
+       [--endpoint game ...] [--concurrency 16] [--duration 10] [--compare previous.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from contextlib import closing
+from datetime import datetime, timezone
+from urllib.parse import quote, urlencode
+
+from ..draft_actions import DRAFT_SEQUENCE
+from ..synthetic import write_database
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BENCH_DIR = os.path.join(ROOT_DIR, 'data', 'bench')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+DEFAULT_GAMES = 500_000
+SEED = 0
+SAMPLE_SIZE = 5000
+PERCENTILES = (50, 95, 99)
+
+
+# --- Dataset ---
+class Sample:
+    """Random values from the dataset that requests are built from."""
+
+    def __init__(self, path, size=SAMPLE_SIZE):
+        with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as connection:
+            rows = connection.execute(
+                'SELECT sg."GameId", sg."Team1", sg."Patch", sg."Tournament", '
+                + ", ".join(f'pb."{column}"' for column, *_ in DRAFT_SEQUENCE)
+                + ' FROM "ScoreboardGames" sg JOIN "PicksAndBansS7" pb ON pb."GameId" = sg."GameId" '
+                'ORDER BY RANDOM() LIMIT ?', (size,)
+            ).fetchall()
+        if not rows:
+            raise ValueError(f"{path} has no games")
+        self.game_ids = [row[0] for row in rows]
+        self.teams = sorted({row[1] for row in rows if row[1]})
+        self.patches = sorted({row[2] for row in rows if row[2]})
+        self.tournaments = sorted({row[3] for row in rows if row[3]})
+        self.drafts = [row[4:] for row in rows]
+        self.champions = sorted({champion for draft in self.drafts for champion in draft if champion})
+
+
+def _get(path, **params):
+    return 'GET', f"{path}?{urlencode(params)}" if params else path, None
+
+
+def _post(path, body):
+    return 'POST', path, json.dumps(body).encode()
+
+
+# name: (sample, rng) -> (method, path, body)
+ENDPOINTS = {
+    'game': lambda s, rng: _get(f"/games/{quote(rng.choice(s.game_ids), safe='')}"),
+    'game_draft': lambda s, rng: _get(f"/games/{quote(rng.choice(s.game_ids), safe='')}", fields="id,date,blue,red,draft"),
+    'games_batch': lambda s, rng: _post("/games:batch", {"ids": rng.sample(s.game_ids, 50)}),
+    'games_by_team': lambda s, rng: _get("/games", team=rng.choice(s.teams), limit=50),
+    'games_by_champion': lambda s, rng: _get("/games", champion=rng.choice(s.champions), patch=rng.choice(s.patches)),
+    'drafts_similar': lambda s, rng: _get("/drafts/similar", game_id=rng.choice(s.game_ids)),
+    'drafts_predict': lambda s, rng: _post("/drafts/predict", {
+        "actions": list(rng.choice(s.drafts)[:rng.randint(0, 19)]), "patch": rng.choice(s.patches)}),
+    'stats_champions': lambda s, rng: _get("/stats/champions", patch=rng.choice(s.patches)),
+    'stats_teams': lambda s, rng: _get("/stats/teams", tournament=rng.choice(s.tournaments)),
+}
+
+
+def prepare_dataset(path, games):
+    """Writes the synthetic database and its draft tables if they don't exist yet. Returns the tables dir."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if not os.path.exists(path):
+        print(f"Generating {games} synthetic games in {path} (once; reused by later runs)...")
+        started = time.monotonic()
+        write_database(path, games, seed=SEED, derived=True)
+        print(f"  done in {time.monotonic() - started:.0f}s.")
+    tables_dir = f"{path}.draft_tables"
+    if not os.path.isdir(tables_dir):
+        subprocess.run([sys.executable, '-m', 'api.bin.build_draft_tables', '--output', tables_dir],
+                       cwd=ROOT_DIR, env={**os.environ, 'LEAGUE_DB_PATH': path}, check=True, stdout=subprocess.DEVNULL)
+    return tables_dir
+
+
+# --- Servers ---
+SERVERS = {
+    'dev': lambda port, args: [
+        sys.executable, '-m', 'flask', '--app', 'api.app', 'run',
+        '--port', str(port), '--with-threads', '--no-reload', '--no-debugger',
+    ],
+    'gunicorn': lambda port, args: [
+        sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+        '--threads', str(args.threads), '--log-level', 'warning', 'api.app:app',
+    ],
+    # ASGI mode: one event loop process, DB reads on its thread pool (api/asgi.py)
+    'uvicorn': lambda port, args: [
+        sys.executable, '-m', 'uvicorn', '--host', '127.0.0.1', '--port', str(port),
+        '--workers', str(args.workers), '--log-level', 'warning', 'api.asgi:app',
+    ],
+}
+
+
+def start_server(name, port, args, env):
+    process = subprocess.Popen(SERVERS[name](port, args), cwd=ROOT_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} server exited with code {process.returncode}")
+        try:
+            with closing(http.client.HTTPConnection('127.0.0.1', port, timeout=1)) as connection:
+                connection.request('GET', '/')
+                if connection.getresponse().status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{name} server didn't start within 60s")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# --- Load ---
+def run_load(port, make_request, sample, concurrency, duration, warmup):
+    """Hits one endpoint with `concurrency` clients; only requests started after the warmup are measured."""
+    started = time.monotonic()
+    measure_from, stop_at = started + warmup, started + warmup + duration
+    latencies, errors, lock = [], [0], threading.Lock()
+
+    def client(seed):
+        rng = random.Random(seed)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        own_latencies, own_errors = [], 0
+        while (now := time.monotonic()) < stop_at:
+            method, path, body = make_request(sample, rng)
+            headers = {'Content-Type': 'application/json'} if body else {}
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                failed = response.status >= 400
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                failed = True
+            if now >= measure_from:
+                own_latencies.append(time.monotonic() - now)
+                own_errors += failed
+        connection.close()
+        with lock:
+            latencies.extend(own_latencies)
+            errors[0] += own_errors
+
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], duration)
+
+
+def summarize(latencies, errors, duration):
+    if len(latencies) < 2:
+        return {'requests': len(latencies), 'errors': errors, 'rps': len(latencies) / duration}
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    result = {'requests': len(latencies), 'errors': errors, 'rps': round(len(latencies) / duration, 1)}
+    result.update({f'p{p}_ms': round(cuts[p - 1] * 1e3, 2) for p in PERCENTILES})
+    result['max_ms'] = round(max(latencies) * 1e3, 2)
+    return result
+
+
+# --- Results ---
+def git_output(*command):
+    """The output of a git command in the repository, None if git isn't available."""
+    try:
+        return subprocess.run(['git', *command], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results, directory=RESULTS_DIR):
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    path = os.path.join(directory, f"api-{stamp}-{results['commit'] or 'nogit'}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def compare(previous, current):
+    """Lines of p50 / p99 / req/s changes per server and endpoint, relative to `previous`."""
+    lines = [f"Compared with {previous.get('commit')} ({previous.get('timestamp')}):"]
+    for server, endpoints in current['results'].items():
+        for endpoint, now in endpoints.items():
+            before = previous.get('results', {}).get(server, {}).get(endpoint)
+            if not before or 'p50_ms' not in before or 'p50_ms' not in now:
+                continue
+            change = lambda key: f"{(now[key] - before[key]) / before[key] * 100:+6.1f}%" if before[key] else "   n/a"
+            lines.append(f"  {server:9} {endpoint:18} p50 {change('p50_ms')}  p99 {change('p99_ms')}  req/s {change('rps')}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API endpoint latency under concurrent clients.")
+    parser.add_argument("--games", type=int, default=DEFAULT_GAMES, help=f"Synthetic games. Default: {DEFAULT_GAMES}.")
+    parser.add_argument("--dataset", help="Synthetic database to use, written if missing. Default: data/bench/api-<games>.db.")
+    parser.add_argument("--server", choices=list(SERVERS), action="append", help="Repeatable. Default: all.")
+    parser.add_argument("--endpoint", choices=list(ENDPOINTS), action="append", help="Repeatable. Default: all.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients. Default: 16.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per endpoint. Default: 10.")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds per endpoint first. Default: 2.")
+    parser.add_argument("--workers", type=int, default=4, help="Gunicorn and Uvicorn worker processes. Default: 4.")
+    parser.add_argument("--threads", type=int, default=4, help="Gunicorn threads per worker. Default: 4.")
+    parser.add_argument("--port", type=int, default=5099, help="Default: 5099.")
+    parser.add_argument("--cache", action="store_true", help="Keep the in-process game response cache on.")
+    parser.add_argument("--compare", metavar="RESULTS", help="Previous results file to compare with.")
+    parser.add_argument("--output-dir", default=RESULTS_DIR, help=f"Default: {RESULTS_DIR}.")
+    args = parser.parse_args()
+
+    dataset = os.path.abspath(args.dataset or os.path.join(BENCH_DIR, f"api-{args.games}.db"))
+    tables_dir = prepare_dataset(dataset, args.games)
+    sample = Sample(dataset)
+    env = {**os.environ, 'LEAGUE_DB_PATH': dataset, 'DRAFT_TABLES_DIR': tables_dir}
+    if not args.cache:
+        env['GAME_CACHE_SIZE'] = '0'
+
+    results = {
+        'commit': git_output('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(git_output('status', '--porcelain', '--untracked-files=no')),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'dataset': {'path': dataset, 'games': args.games, 'seed': SEED},
+        'config': {key: getattr(args, key) for key in ('concurrency', 'duration', 'warmup', 'workers', 'threads', 'cache')},
+        'results': {},
+    }
+    for server in args.server or list(SERVERS):
+        process = start_server(server, args.port, args, env)
+        try:
+            for endpoint in args.endpoint or list(ENDPOINTS):
+                stats = run_load(args.port, ENDPOINTS[endpoint], sample, args.concurrency, args.duration, args.warmup)
+                results['results'].setdefault(server, {})[endpoint] = stats
+                print(f"{server:9} {endpoint:18} {stats['rps']:8.1f} req/s  "
+                      + "  ".join(f"p{p} {stats.get(f'p{p}_ms', float('nan')):7.1f}ms" for p in PERCENTILES)
+                      + f"  errors {stats['errors']}")
+        finally:
+            stop_server(process)
+
+    print(f"Results written to {save_results(results, args.output_dir)}")
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n".join(compare(json.load(f), results)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Bytes and CPU per GET /games/<game_id> request when serving the stored GameDocuments, against
+loading and serializing the game through the ORM, through Flask's test client.
+
+A synthetic database with derived tables (5k games by default, or --dataset) is served as
+is for the document modes, and from a copy without GameDocuments rows for the ORM mode,
+which then takes the fallback path (ORM hydration and encoding per request). The response
+cache is disabled so every request does the work. CPU time is this process's, so it covers
+Flask, SQLite and the serialization; the test client has no network.
+
+Usage: python -m api.benchmarks.bench_game_documents [--games 5000] [--requests 5000] [--dataset bench.db]
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from .. import models_base
+from ..app import app
+from ..cache import LRUCache, game_cache
+from ..synthetic import write_database
+
+MODES = {
+    # name: (uses the documents, Accept header)
+    'orm json': (False, 'application/json'),
+    'document json': (True, 'application/json'),
+    'document msgpack': (True, 'application/msgpack'),
+}
+
+
+def _game_ids(path):
+    with contextlib.closing(sqlite3.connect(path)) as connection:
+        return [game_id for (game_id,) in connection.execute('SELECT GameId FROM GameDocuments ORDER BY GameId')]
+
+
+def _without_documents(path, copy_path):
+    with contextlib.closing(sqlite3.connect(path)) as source, contextlib.closing(sqlite3.connect(copy_path)) as copy:
+        source.backup(copy)
+        copy.execute('DELETE FROM GameDocuments')
+        copy.commit()
+
+
+def _run(client, game_ids, accept):
+    """(CPU seconds, wall seconds, response bytes) per request."""
+    headers = {'Accept': accept}
+    total_bytes = 0
+    cpu_started, started = time.process_time(), time.perf_counter()
+    for game_id in game_ids:
+        response = client.get(f"/games/{game_id}", headers=headers)
+        assert response.status_code == 200, response.status_code
+        total_bytes += len(response.data)
+    count = len(game_ids)
+    return (time.process_time() - cpu_started) / count, (time.perf_counter() - started) / count, total_bytes / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serving GameDocuments against the ORM serialization path.")
+    parser.add_argument("--games", type=int, default=5000, help="Synthetic games. Default: 5000.")
+    parser.add_argument("--dataset", help="Synthetic database to reuse across runs (written, with derived tables, if missing).")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests per mode. Default: 5000.")
+    parser.add_argument("--warmup", type=int, default=200, help="Unmeasured requests per mode. Default: 200.")
+    args = parser.parse_args()
+
+    game_cache.local = LRUCache(maxsize=0)
+    game_cache.shared = None
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        dataset = args.dataset or os.path.join(directory, 'games.db')
+        if not os.path.exists(dataset):
+            started = time.monotonic()
+            write_database(dataset, args.games, derived=True)
+            print(f"Wrote {args.games} synthetic games to {dataset} in {time.monotonic() - started:.1f}s.")
+        without_documents = os.path.join(directory, 'without-documents.db')
+        _without_documents(dataset, without_documents)
+        game_ids = _game_ids(dataset)
+        sample = [rng.choice(game_ids) for _ in range(args.requests)]
+
+        results = {}
+        client = app.test_client()
+        for mode, (documents, accept) in MODES.items():
+            models_base.configure_engine(f"sqlite:///{dataset if documents else without_documents}")
+            _run(client, sample[:args.warmup], accept)
+            results[mode] = _run(client, sample, accept)
+        # Bytes of the encoding used before documents: Flask's JSON with ', ' / ': ' separators
+        previous = sum(len(app.json.dumps(json.loads(client.get(f"/games/{game_id}").data))) + 1
+                       for game_id in sample[:1000]) / min(len(sample), 1000)
+        models_base.engine.dispose()
+        models_base.read_only_engine.dispose()
+
+    print(f"{len(game_ids)} games, {args.requests} GET /games/<game_id> per mode, response cache off")
+    baseline = results['orm json'][0]
+    for mode, (cpu, wall, size) in results.items():
+        print(f"  {mode:17} {cpu * 1e6:7.0f} us CPU/request ({baseline / cpu:.2f}x)  {wall * 1e6:7.0f} us wall  {size:6.0f} bytes/request")
+    print(f"  (JSON as encoded before documents: {previous:.0f} bytes/request)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Latency of fetching a series of games with POST /games:batch against one
+GET /games/<game_id> per game, through Flask's test client.
+
+The test client has no network, so the gap measured here is the per-request
+session, query and dispatch overhead only; real clients also save N-1 round trips.
+
+Usage: python -m api.benchmarks.bench_games_batch [--games 200] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, undefer_group
+
+from .. import models_base
+from ..app import app
+from ..cache import LRUCache, game_cache
+from ..models_base import Base
+from ..scoreboard_game_model import ScoreboardGame
+
+SAMPLE_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'tests', 'league_data.db')
+
+
+def _build_database(path, games):
+    """Copies the test database's games into `path` until it holds `games` rows. Returns their ids."""
+    source = sessionmaker(bind=create_engine(f"sqlite:///{SAMPLE_DB_PATH}"))()
+    templates = [{column.name: getattr(game, column.name) for column in ScoreboardGame.__table__.columns}
+                 for game in source.query(ScoreboardGame).options(undefer_group('wide'))]
+    source.close()
+
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[ScoreboardGame.__table__])
+    rows = [dict(templates[i % len(templates)], GameId=f"bench_{i}") for i in range(games)]
+    with engine.begin() as connection:
+        connection.execute(ScoreboardGame.__table__.insert(), rows)
+    engine.dispose()
+    return [row['GameId'] for row in rows]
+
+
+def _time(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark POST /games:batch against N single-game requests.")
+    parser.add_argument("--games", type=int, default=200, help="Games per lookup. Default: 200.")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions, the median is reported. Default: 5.")
+    parser.add_argument("--cached", action="store_true", help="Let single-game requests use the response cache.")
+    args = parser.parse_args()
+
+    if not args.cached:
+        game_cache.local = LRUCache(maxsize=0)
+        game_cache.shared = None
+
+    with tempfile.TemporaryDirectory() as directory:
+        game_ids = _build_database(os.path.join(directory, 'bench.db'), args.games)
+        models_base.configure_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        client = app.test_client()
+
+        def single_calls():
+            for game_id in game_ids:
+                assert client.get(f"/games/{game_id}").status_code == 200
+
+        def batch_call():
+            assert client.post("/games:batch", json={"ids": game_ids}).status_code == 200
+
+        single = _time(args.repeat, single_calls)
+        batch = _time(args.repeat, batch_call)
+        models_base.engine.dispose()
+        models_base.read_only_engine.dispose()
+
+    print(f"{args.games} games, median of {args.repeat}{' (single calls cached)' if args.cached else ''}")
+    print(f"  {args.games} x GET /games/<game_id>: {single * 1e3:8.1f} ms ({single * 1e6 / args.games:.0f} us/game)")
+    print(f"  1 x POST /games:batch:        {batch * 1e3:8.1f} ms ({batch * 1e6 / args.games:.0f} us/game, {single / batch:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Cold-start time of the API and the collector: how long a fresh interpreter takes to import
+`api.app`, `api.asgi` and `api.bin.collect_data`, and what that import does besides.
+
+Each target is imported --runs times, each time in a new process, so nothing is cached in
+memory (the OS file cache stays warm). Reported per target: the median import time, the
+median process time (interpreter start to exit), the direct imports that cost the most (from
+`python -X importtime`), and the import's side effects, which should all be none: database
+engines created, files created under LEAGUE_DB_PATH's directory, and heavy modules loaded
+(numpy, mwrogue, mwclient) that only some endpoints or runs need.
+
+Results are written as JSON to data/bench/results/import-<time>-<commit>.json; pass a
+previous file to --compare to print the change per target.
+
+Usage: python -m api.benchmarks.bench_import [--runs 10] [--target api ...] [--compare previous.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from .bench_api import RESULTS_DIR, ROOT_DIR, git_output
+
+TARGETS = {
+    'api': 'api.app',
+    'asgi': 'api.asgi',
+    'collector': 'api.bin.collect_data',
+}
+HEAVY_MODULES = ('numpy', 'mwrogue', 'mwclient')
+TOP_IMPORTS = 8
+
+# Run in the child: imports the target, then reports what the import left behind
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+__import__(sys.argv[1]) # the import statement's path, which -X importtime reports
+seconds = time.perf_counter() - started
+from api import models_base
+print(json.dumps({
+    'import_seconds': seconds,
+    'engines_created': models_base._engines.engine is not None,
+    'heavy_modules': [name for name in sys.argv[2:] if name in sys.modules],
+    'modules': len(sys.modules),
+}))
+"""
+
+
+def import_once(module, importtime=False):
+    """(probe report, process seconds, -X importtime lines) of one fresh import of `module`."""
+    with tempfile.TemporaryDirectory() as directory:
+        data_dir = os.path.join(directory, 'data')
+        env = {**os.environ, 'LEAGUE_DB_PATH': os.path.join(data_dir, 'league_data.db')}
+        command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', PROBE, module, *HEAVY_MODULES]
+        started = time.perf_counter()
+        process = subprocess.run(command, cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True)
+        process_seconds = time.perf_counter() - started
+        report = json.loads(process.stdout.strip().splitlines()[-1])
+        report['files_created'] = os.path.exists(data_dir)
+    return report, process_seconds, process.stderr.splitlines()
+
+
+def top_imports(lines, module, count=TOP_IMPORTS):
+    """The `count` direct imports of `module` with the highest cumulative time, as (name, ms)."""
+    children = []
+    for line in lines:
+        if not line.startswith('import time:') or line.endswith('| imported package'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Names are indented two spaces per nesting level, after the separator's space
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        # A module is printed after its imports: the children of `module` are the depth-1
+        # entries since the previous top-level one
+        if depth == 0 and name.strip() == module:
+            break
+        if depth == 0:
+            children = []
+        elif depth == 1:
+            children.append((name.strip(), int(cumulative)))
+    return [(name, round(us / 1e3, 1)) for name, us in sorted(children, key=lambda c: -c[1])[:count]]
+
+
+def measure(module, runs):
+    reports, process_seconds = [], []
+    for _ in range(runs):
+        report, seconds, _ = import_once(module)
+        reports.append(report)
+        process_seconds.append(seconds)
+    report, _, lines = import_once(module, importtime=True)
+    return {
+        'module': module,
+        'import_ms': round(statistics.median(r['import_seconds'] for r in reports) * 1e3, 1),
+        'process_ms': round(statistics.median(process_seconds) * 1e3, 1),
+        'modules': report['modules'],
+        'top_imports': top_imports(lines, module),
+        'side_effects': {
+            'engines_created': any(r['engines_created'] for r in reports),
+            'files_created': any(r['files_created'] for r in reports),
+            'heavy_modules': sorted({name for r in reports for name in r['heavy_modules']}),
+        },
+    }
+
+
+def save_results(results, directory=RESULTS_DIR):
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    path = os.path.join(directory, f"import-{stamp}-{results['commit'] or 'nogit'}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def compare(previous, current):
+    """Lines of import / process time changes per target, relative to `previous`."""
+    lines = [f"Compared with {previous.get('commit')} ({previous.get('timestamp')}):"]
+    for target, now in current['results'].items():
+        before = previous.get('results', {}).get(target)
+        if not before:
+            continue
+        change = lambda key: f"{(now[key] - before[key]) / before[key] * 100:+6.1f}%" if before[key] else "   n/a"
+        lines.append(f"  {target:9} import {change('import_ms')}  process {change('process_ms')}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cold-start import time of the API and the collector.")
+    parser.add_argument("--target", choices=list(TARGETS), action="append", help="Repeatable. Default: all.")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh processes per target. Default: 10.")
+    parser.add_argument("--compare", metavar="RESULTS", help="Previous results file to compare with.")
+    parser.add_argument("--output-dir", default=RESULTS_DIR, help=f"Default: {RESULTS_DIR}.")
+    args = parser.parse_args()
+
+    results = {
+        'commit': git_output('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(git_output('status', '--porcelain', '--untracked-files=no')),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {'runs': args.runs},
+        'results': {},
+    }
+    for target in args.target or list(TARGETS):
+        stats = measure(TARGETS[target], args.runs)
+        results['results'][target] = stats
+        effects = stats['side_effects']
+        print(f"{target:9} import {stats['import_ms']:7.1f}ms  process {stats['process_ms']:7.1f}ms  "
+              f"{stats['modules']} modules  engines created: {'yes' if effects['engines_created'] else 'no'}  "
+              f"files created: {'yes' if effects['files_created'] else 'no'}  "
+              f"heavy modules: {', '.join(effects['heavy_modules']) or 'none'}")
+        print("          " + ", ".join(f"{name} {ms}ms" for name, ms in stats['top_imports']))
+
+    print(f"Results written to {save_results(results, args.output_dir)}")
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n".join(compare(json.load(f), results)))
+
+
+if __name__ == '__main__':
+    main()
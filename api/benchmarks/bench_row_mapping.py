@@ -0,0 +1,142 @@
+"""
+Micro-benchmark of the compiled RowMapper against the per-row column
+introspection the insert_*_batch functions used before it.
+
+Usage: python -m api.benchmarks.bench_row_mapping [--rows 100000] [--repeat 5]
+"""
+import argparse
+import random
+import time
+
+from sqlalchemy import Boolean, Float, Integer, create_engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import sessionmaker
+
+from ..models_base import Base
+from ..scoreboard_game_model import ScoreboardGame
+from ..picks_and_bans_model import PicksAndBansS7Model
+from ..bin.collect_data import (
+    DB_TO_API_KEY_MAP_SG, DB_TO_API_KEY_MAP_PB, SG_ROW_MAPPER, PB_ROW_MAPPER,
+)
+
+
+# --- Previous implementation, kept verbatim (minus logging) as the baseline ---
+def legacy_map_scoreboard_games(data_dicts):
+    objects_to_insert = []
+    for api_row_dict in data_dicts:
+        model_data = {}
+        for model_attr in ScoreboardGame.__table__.columns.keys():
+            api_key = DB_TO_API_KEY_MAP_SG.get(model_attr, model_attr)
+            if api_key in api_row_dict:
+                 model_data[model_attr] = api_row_dict.get(api_key)
+        if not model_data.get('GameId'):
+            continue
+        objects_to_insert.append(model_data)
+    return objects_to_insert
+
+def legacy_map_picks_and_bans(data_dicts):
+    objects_to_insert = []
+    for api_row_dict in data_dicts:
+        model_data = {}
+        for model_attr in PicksAndBansS7Model.__table__.columns.keys():
+            api_key = DB_TO_API_KEY_MAP_PB.get(model_attr, model_attr)
+            if api_key in api_row_dict:
+                model_data[model_attr] = api_row_dict.get(api_key)
+        if not model_data.get('UniqueLine'):
+            continue
+        for bool_field_name in ['IsComplete', 'IsFilled']:
+            api_val = model_data.get(bool_field_name)
+            if isinstance(api_val, str):
+                if api_val.lower() in ['true', '1', 'yes', 't']: model_data[bool_field_name] = True
+                elif api_val.lower() in ['false', '0', 'no', 'f']: model_data[bool_field_name] = False
+                else: model_data[bool_field_name] = None
+            elif isinstance(api_val, int): model_data[bool_field_name] = bool(api_val)
+        objects_to_insert.append(model_data)
+    return objects_to_insert
+
+
+def _api_row(mapper, rng, index):
+    """An API-shaped row: every field a string, like Cargo returns them."""
+    row = {}
+    for column, api_key in zip(mapper.model.__table__.columns, mapper.api_keys):
+        if isinstance(column.type, Boolean):
+            row[api_key] = rng.choice(['1', '0', 'Yes', 'false'])
+        elif isinstance(column.type, Integer):
+            row[api_key] = str(rng.randint(0, 9))
+        elif isinstance(column.type, Float):
+            row[api_key] = f"{rng.uniform(20, 45):.2f}"
+        else:
+            row[api_key] = f"{column.name}-{index}"
+    return row
+
+
+def _best_of(repeat, func, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _insert_time(insert_batch, model, api_rows, repeat, chunk=500):
+    """Best time to map and insert api_rows (in collector-sized batches) into a fresh in-memory database."""
+    best = float('inf')
+    for _ in range(repeat):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[model.__table__])
+        session = sessionmaker(bind=engine)()
+        started = time.perf_counter()
+        for i in range(0, len(api_rows), chunk):
+            insert_batch(session, api_rows[i:i + chunk])
+        session.commit()
+        best = min(best, time.perf_counter() - started)
+        session.close()
+        engine.dispose()
+    return best
+
+
+def _legacy_insert(legacy_map, model, key_column):
+    def insert_batch(session, api_rows):
+        stmt = sqlite_insert(model).values(legacy_map(api_rows))
+        session.execute(stmt.on_conflict_do_nothing(index_elements=[key_column]))
+    return insert_batch
+
+
+def _mapper_insert(mapper):
+    def insert_batch(session, api_rows):
+        mapper.insert_or_ignore(session, mapper.map_rows(api_rows))
+    return insert_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API row mapping for the collector's insert functions.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows per table. Default: 100000.")
+    parser.add_argument("--insert-rows", type=int, default=10_000, help="Rows per table for the map + insert comparison. Default: 10000.")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions, best time is reported. Default: 5.")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    cases = [
+        ("ScoreboardGames", SG_ROW_MAPPER, legacy_map_scoreboard_games, ScoreboardGame, ScoreboardGame.GameId),
+        ("PicksAndBansS7", PB_ROW_MAPPER, legacy_map_picks_and_bans, PicksAndBansS7Model, PicksAndBansS7Model.UniqueLine),
+    ]
+    print(f"{args.rows} rows per table, best of {args.repeat}\n")
+    for name, mapper, legacy, model, key_column in cases:
+        api_rows = [_api_row(mapper, rng, i) for i in range(args.rows)]
+        legacy_time = _best_of(args.repeat, legacy, api_rows)
+        mapper_time = _best_of(args.repeat, mapper.map_rows, api_rows)
+        print(f"{name} mapping:")
+        print(f"  legacy per-row introspection (dicts): {legacy_time * 1e6 / args.rows:7.2f} us/row")
+        print(f"  RowMapper.map_rows (tuples):          {mapper_time * 1e6 / args.rows:7.2f} us/row ({legacy_time / mapper_time:.1f}x)")
+
+        insert_rows = api_rows[:args.insert_rows]
+        repeat = max(1, args.repeat // 2)
+        legacy_insert = _insert_time(_legacy_insert(legacy, model, key_column), model, insert_rows, repeat)
+        mapper_insert = _insert_time(_mapper_insert(mapper), model, insert_rows, repeat)
+        print(f"  map + insert {len(insert_rows)} rows: legacy {len(insert_rows) / legacy_insert:,.0f} rows/sec, "
+              f"RowMapper {len(insert_rows) / mapper_insert:,.0f} rows/sec ({legacy_insert / mapper_insert:.1f}x)\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import argparse
+
+from sqlalchemy.orm import undefer_group
+
+from ..models_base import get_session, init_db
+from ..partition_model import SeasonPartition
+from ..partitions import in_partition, season_router
+from ..scoreboard_game_model import ScoreboardGame
+from ..picks_and_bans_model import PicksAndBansS7Model
+from ..draft_actions import build_draft_actions, insert_draft_actions
+from ..game_documents import write_game_documents
+from ..search_index import update_search_index
+from ..stats_rollup import update_rollups
+
+BATCH_SIZE = 1000
+
+
+def _row_dict(obj):
+    return {column.name: getattr(obj, column.name) for column in obj.__table__.columns}
+
+
+def _schema(session, season, write=False):
+    """
+    The schema of a season partition (season None: the main database), attached again at each
+    batch since a commit may hand the session another pooled connection. With `write`, the
+    season must not have been compacted since the backfill started (see SeasonRouter.writable).
+    """
+    if season is None:
+        return None
+    if write:
+        return season_router.writable(session, season)
+    return season_router.attach(session, session.get(SeasonPartition, season))
+
+
+def _game_ids_after(session, schema, last_game_id, batch_size):
+    return [game_id for (game_id,) in session.query(ScoreboardGame.GameId).filter(ScoreboardGame.GameId > last_game_id)
+            .order_by(ScoreboardGame.GameId).limit(batch_size).execution_options(**in_partition(schema))]
+
+
+def backfill_draft_actions(session, batch_size=BATCH_SIZE, season=None):
+    """
+    Fills DraftActions for the stored games, walking ScoreboardGames by GameId.
+    Actions already present are left alone, so the backfill can be re-run or resumed.
+    """
+    inserted = 0
+    last_game_id = ''
+    while True:
+        schema = _schema(session, season, write=True)
+        games = session.query(ScoreboardGame).options(undefer_group('wide')).filter(ScoreboardGame.GameId > last_game_id) \
+            .order_by(ScoreboardGame.GameId).limit(batch_size).execution_options(**in_partition(schema)).all()
+        if not games:
+            break
+        game_ids = [game.GameId for game in games]
+        pb_by_game = {}
+        for pb in session.query(PicksAndBansS7Model).filter(PicksAndBansS7Model.GameId.in_(game_ids)) \
+                .order_by(PicksAndBansS7Model.UniqueLine).execution_options(**in_partition(schema)):
+            pb_by_game.setdefault(pb.GameId, _row_dict(pb))
+
+        actions = []
+        for game in games:
+            actions.extend(build_draft_actions(_row_dict(game), pb_by_game.get(game.GameId)))
+        inserted += insert_draft_actions(session, actions, schema)
+        session.commit()
+        session.expunge_all()
+        last_game_id = game_ids[-1]
+        print(f"Backfilled DraftActions up to GameId {last_game_id} ({inserted} rows inserted so far).")
+    return inserted
+
+
+def backfill_stats_rollups(session, batch_size=BATCH_SIZE, season=None):
+    """
+    Adds the stored games missing from ChampionStats / TeamStats.
+    Champion counts come from DraftActions, so this runs after the draft-actions backfill.
+    """
+    added = 0
+    last_game_id = ''
+    while True:
+        schema = _schema(session, season)
+        game_ids = _game_ids_after(session, schema, last_game_id, batch_size)
+        if not game_ids:
+            break
+        added += update_rollups(session, game_ids, schema)
+        session.commit()
+        last_game_id = game_ids[-1]
+        print(f"Rolled up stats up to GameId {last_game_id} ({added} games added so far).")
+    return added
+
+
+def backfill_search_index(session, batch_size=BATCH_SIZE, season=None):
+    """Adds the stored games missing from the search index (SearchEntries and its FTS5 table)."""
+    added = 0
+    last_game_id = ''
+    while True:
+        schema = _schema(session, season)
+        game_ids = _game_ids_after(session, schema, last_game_id, batch_size)
+        if not game_ids:
+            break
+        added += update_search_index(session, game_ids, schema)
+        session.commit()
+        last_game_id = game_ids[-1]
+        print(f"Indexed names for search up to GameId {last_game_id} ({added} games added so far).")
+    return added
+
+
+def backfill_game_documents(session, batch_size=BATCH_SIZE, season=None):
+    """(Re)writes the GameDocuments of every stored game, e.g. after a change to the response shape."""
+    written = 0
+    last_game_id = ''
+    while True:
+        schema = _schema(session, season, write=True)
+        game_ids = _game_ids_after(session, schema, last_game_id, batch_size)
+        if not game_ids:
+            break
+        written += write_game_documents(session, game_ids, schema)
+        session.commit()
+        session.expunge_all()
+        last_game_id = game_ids[-1]
+        print(f"Wrote game documents up to GameId {last_game_id} ({written} so far).")
+    return written
+
+
+# Derived data that can be rebuilt from the stored ScoreboardGames / PicksAndBansS7 rows
+BACKFILLS = {
+    'draft-actions': backfill_draft_actions,
+    'stats-rollups': backfill_stats_rollups,
+    'search-index': backfill_search_index,
+    'game-documents': backfill_game_documents,
+}
+# Backfills whose rows live in the partitions themselves, so can't run on a compacted season
+WRITES_TO_PARTITIONS = {'draft-actions', 'game-documents'}
+
+
+def run_backfills(names, batch_size=BATCH_SIZE):
+    init_db()
+    session = get_session()
+    try:
+        # The main database, then each season partition
+        seasons = [(None, False)]
+        if season_router.enabled:
+            seasons += [(partition.Season, partition.Immutable) for partition in season_router.catalog(session)]
+        for name in [name for name in BACKFILLS if name in names]:
+            for season, immutable in seasons:
+                if immutable and name in WRITES_TO_PARTITIONS:
+                    print(f"Skipping backfill '{name}' for the compacted season {season}.")
+                    continue
+                where = f" (season {season})" if season is not None else ""
+                print(f"Running backfill '{name}'{where}...")
+                count = BACKFILLS[name](session, batch_size=batch_size, season=season)
+                print(f"Backfill '{name}'{where} done: {count} rows added.")
+    except Exception as e:
+        print(f"Error during backfill: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rebuild derived tables from the stored games.")
+    parser.add_argument(
+        "--only", choices=list(BACKFILLS), action="append",
+        help="Backfill to run; repeat for several. Default: all of them, in dependency order."
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=BATCH_SIZE,
+        help=f"Games processed per transaction. Default: {BATCH_SIZE}."
+    )
+    args = parser.parse_args()
+    run_backfills(args.only or list(BACKFILLS), batch_size=max(1, args.batch_size))
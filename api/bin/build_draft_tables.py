@@ -0,0 +1,95 @@
+import argparse
+import os
+import shutil
+from collections import defaultdict
+
+from ..draft_actions import split_comma_separated
+from ..draft_model import ALL_PATCHES, DRAFT_TABLES_DIR, build_tables, patch_key, save_tables
+from ..models_base import get_session
+from ..partitions import in_partition, season_router
+from ..scoreboard_game_model import ScoreboardGame
+from .export_snapshot import replace_directory
+
+BATCH_SIZE = 5000
+
+
+def load_games(session, batch_size=BATCH_SIZE):
+    """
+    (patch, blue picks, red picks, winner) of every stored game with a winner, read in GameId
+    order from each season partition in turn (or from the main database without partitioning).
+    """
+    games = []
+    for schema in season_router.schemas(session):
+        last_game_id = ''
+        while True:
+            rows = session.query(
+                ScoreboardGame.GameId, ScoreboardGame.Patch, ScoreboardGame.Team1Picks,
+                ScoreboardGame.Team2Picks, ScoreboardGame.Winner,
+            ).filter(ScoreboardGame.GameId > last_game_id, ScoreboardGame.Winner.in_((1, 2))) \
+                .order_by(ScoreboardGame.GameId).limit(batch_size).execution_options(**in_partition(schema)).all()
+            if not rows:
+                break
+            games.extend((patch, split_comma_separated(team1_picks), split_comma_separated(team2_picks), winner)
+                         for _, patch, team1_picks, team2_picks, winner in rows)
+            last_game_id = rows[-1][0]
+    return games
+
+
+def _parse_range(text):
+    first, _, last = text.partition('-')
+    if patch_key(first) is None or patch_key(last or first) is None:
+        raise argparse.ArgumentTypeError(f"Invalid patch range '{text}', expected e.g. 25.1-25.6")
+    return first, last or first
+
+
+def default_ranges(games):
+    """One range per season (e.g. 25.1-25.13), from the first to the last patch seen in it."""
+    seasons = defaultdict(list)
+    for patch, *_ in games:
+        key = patch_key(patch)
+        if key:
+            seasons[key[0]].append((key, patch))
+    return [(min(patches)[1], max(patches)[1]) for _, patches in sorted(seasons.items())]
+
+
+def build_draft_tables(output_dir=DRAFT_TABLES_DIR, ranges=None):
+    """Builds the all-patches tables and one set per patch range, replacing `output_dir` atomically."""
+    session = get_session()
+    try:
+        games = load_games(session)
+    finally:
+        session.close()
+    print(f"Loaded {len(games)} games with a winner.")
+
+    champions = sorted({name for _, blue, red, _ in games for name in blue + red if name})
+    staging_dir = f"{output_dir}.tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    for patch_range in [None] + list(ranges or default_ranges(games)):
+        if patch_range is None:
+            name, patches, selected = ALL_PATCHES, None, games
+        else:
+            first, last = patch_range
+            low, high = patch_key(first), patch_key(last)
+            name, patches = f"{first}-{last}", [first, last]
+            selected = [game for game in games if patch_key(game[0]) and low <= patch_key(game[0]) <= high]
+        tables = build_tables([(blue, red, winner) for _, blue, red, winner in selected], champions)
+        save_tables(staging_dir, name, tables, champions, patches, len(selected))
+        print(f"Built draft tables '{name}' from {len(selected)} games, {len(champions)} champions.")
+
+    os.makedirs(staging_dir, exist_ok=True)
+    replace_directory(staging_dir, output_dir)
+    print(f"Draft tables written to {output_dir}. Restart the API to load them.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the win-probability tables served by /drafts/predict.")
+    parser.add_argument(
+        "--output", default=DRAFT_TABLES_DIR,
+        help=f"Output directory. Default: {DRAFT_TABLES_DIR} (DRAFT_TABLES_DIR env var)."
+    )
+    parser.add_argument(
+        "--range", dest="ranges", type=_parse_range, action="append",
+        help="Patch range to build tables for, e.g. 25.1-25.6; repeat for several. Default: one per season."
+    )
+    args = parser.parse_args()
+    build_draft_tables(args.output, args.ranges)
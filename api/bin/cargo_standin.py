@@ -0,0 +1,52 @@
+import argparse
+import os
+import time
+
+from ..cargo_replay import ReplayCargoClient
+from ..cargo_standin import CargoStandIn, SqliteCargo, serve_http
+from ..synthetic import write_database
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve a local stand-in for the Leaguepedia Cargo API; point the collector at it with --cargo-url.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--db", help="SQLite database with ScoreboardGames and PicksAndBansS7 tables to query.")
+    source.add_argument("--fixture", help="Fixture recorded with collect_data --record to replay.")
+    parser.add_argument(
+        "--synthetic", type=int, default=0, metavar="GAMES",
+        help="Write this many synthetic games to --db first if it doesn't exist yet."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic games and throttling. Default: 0.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response. Default: 0.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many random extra seconds per response. Default: 0.")
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0,
+        help="Fraction of calls answered with a 'ratelimited' error instead. Default: 0."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Default: 127.0.0.1.")
+    parser.add_argument("--port", type=int, default=8765, help="Default: 8765.")
+    args = parser.parse_args()
+
+    if args.db:
+        if args.synthetic and not os.path.exists(args.db):
+            started = time.monotonic()
+            write_database(args.db, args.synthetic, seed=args.seed)
+            print(f"Wrote {args.synthetic} synthetic games to {args.db} in {time.monotonic() - started:.1f}s.")
+        source = SqliteCargo(args.db)
+    else:
+        source = ReplayCargoClient(args.fixture)
+    standin = CargoStandIn(source, latency=args.latency, jitter=args.jitter, throttle_rate=args.throttle_rate, seed=args.seed)
+    server = serve_http(standin, args.host, args.port)
+    print(f"Cargo stand-in serving {args.db or args.fixture} at http://{args.host}:{server.server_port}/ "
+          f"(latency {args.latency}s, throttle rate {args.throttle_rate}). Ctrl-C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Served {standin.calls} calls, {standin.throttled} throttled.")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,16 +2,48 @@ import os
 import sys
 import time
 import argparse # For --limit argument
-from mwrogue.esports_client import EsportsClient
-from sqlalchemy import func
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from functools import partial
+from urllib.parse import quote_plus, urlencode
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from ..models_base import get_session
+from ..cache import game_cache, game_cache_key
+from ..cargo_replay import RecordingCargoClient, ReplayCargoClient
+from ..models_base import bulk_load, get_session, init_db
+from ..partitions import in_partition, season_of, season_router
 from ..scoreboard_game_model import ScoreboardGame
 from ..picks_and_bans_model import PicksAndBansS7Model
+from ..collection_checkpoint_model import CollectionCheckpoint
+from ..draft_action_model import DraftAction
+from ..fingerprints import STAMP_FIELDS, game_stamps, save_stamps
+from ..instrumentation import Registry
+from ..rate_limiter import AdaptiveTokenBucket
+from ..row_mapping import RowMapper
+from ..draft_actions import build_draft_actions, insert_draft_actions
+from ..game_documents import GAME_FORMATS, write_game_documents
+from ..search_index import update_search_index
+from ..stats_rollup import update_rollups
 
 
 BATCH_SIZE = 100
+# Cargo caps a single query at 500 rows; larger pages need offset continuation.
+CARGO_MAX_LIMIT = 500
+# Keeps each encoded query below the ~8KB URL limit of common proxies in front of the wiki.
+MAX_QUERY_CHARS = 7000
+# Alias prefix keeping PicksAndBansS7 fields apart from ScoreboardGames ones in joined queries
+JOINED_PB_PREFIX = 'PB'
+DEFAULT_CONCURRENCY = 4
+MAX_RETRIES = 3
+# mwclient APIError codes the wiki uses to ask clients to back off
+THROTTLE_ERROR_CODES = {'ratelimited', 'maxlag'}
+
+# Collection directions, each with its own keyset checkpoint
+FORWARD = 'forward'
+BACKWARD = 'backward'
 
 # --- Mappings from DB schema column names to API field names ---
 DB_TO_API_KEY_MAP_SG = {
@@ -22,6 +54,7 @@ DB_TO_API_KEY_MAP_SG = {
     'N_MatchInPage': 'N MatchInPage',
     'N_GameInMatch': 'N GameInMatch',
 }
+SG_DATETIME_API_KEY = DB_TO_API_KEY_MAP_SG['DateTime_UTC']
 
 DB_TO_API_KEY_MAP_PB = {
     'N_Page': 'N Page',
@@ -34,217 +67,600 @@ DB_TO_API_KEY_MAP_PB = {
     'GameID_Wiki': 'GameID Wiki',
 }
 
+# Compiled once: column order, API keys and type coercion for each model
+SG_ROW_MAPPER = RowMapper(ScoreboardGame, DB_TO_API_KEY_MAP_SG, 'GameId')
+PB_ROW_MAPPER = RowMapper(PicksAndBansS7Model, DB_TO_API_KEY_MAP_PB, 'UniqueLine')
+
 # --- Database Utility Functions (SQLAlchemy) ---
-def get_last_collected_timestamp():
+def load_checkpoint(direction):
+    """
+    Returns the (DateTime_UTC, GameId) keyset cursor to resume `direction` from.
+
+    Without a saved checkpoint, a forward run starts after the newest stored game and
+    a backward run starts below the oldest one (or from the newest game on the wiki
+    when the table is empty).
+    """
     session = get_session()
     try:
-        max_timestamp = session.query(func.max(ScoreboardGame.DateTime_UTC)).scalar()
-        if max_timestamp:
-            print(f"Successfully fetched last collected timestamp: {max_timestamp}")
-            return max_timestamp
-        else:
-            count = session.query(func.count(ScoreboardGame.GameId)).scalar()
-            if count > 0:
-                print(f"No valid MAX(DateTime_UTC) found in ScoreboardGames, but table has {count} rows. Treating as fresh start for timestamp.")
-            else:
-                print("ScoreboardGames table is empty or contains no valid timestamps. Starting fresh.")
-            return None
-    except Exception as e:
-        print(f"SQLAlchemy error in get_last_collected_timestamp: {e}")
+        checkpoint = session.get(CollectionCheckpoint, direction)
+        if checkpoint and checkpoint.DateTime_UTC and checkpoint.GameId:
+            print(f"Resuming {direction} collection from checkpoint ({checkpoint.DateTime_UTC}, {checkpoint.GameId}).")
+            return checkpoint.DateTime_UTC, checkpoint.GameId
+
+        order = (ScoreboardGame.DateTime_UTC.desc(), ScoreboardGame.GameId.desc()) if direction == FORWARD \
+            else (ScoreboardGame.DateTime_UTC.asc(), ScoreboardGame.GameId.asc())
+        edges = [
+            session.query(ScoreboardGame.DateTime_UTC, ScoreboardGame.GameId).filter(ScoreboardGame.DateTime_UTC.isnot(None))
+            .order_by(*order).execution_options(**in_partition(schema)).first()
+            for schema in season_router.schemas(session)
+        ]
+        edge = (max if direction == FORWARD else min)((tuple(edge) for edge in edges if edge), default=None)
+        if edge:
+            print(f"No {direction} checkpoint, starting from stored edge ({edge[0]}, {edge[1]}).")
+            return edge[0], edge[1]
+        print(f"No {direction} checkpoint and no stored games. Starting fresh.")
         return None
+    except Exception as e:
+        print(f"SQLAlchemy error in load_checkpoint: {e}")
+        raise
     finally:
         session.close()
 
+def save_checkpoint(session, direction, cursor):
+    """Upserts the cursor for `direction`; call it in the same transaction as the batch it covers."""
+    stmt = sqlite_insert(CollectionCheckpoint).values(
+        Direction=direction, DateTime_UTC=cursor[0], GameId=cursor[1],
+        UpdatedAt=datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CollectionCheckpoint.Direction],
+        set_={'DateTime_UTC': stmt.excluded.DateTime_UTC, 'GameId': stmt.excluded.GameId, 'UpdatedAt': stmt.excluded.UpdatedAt},
+    )
+    session.execute(stmt)
+
 # --- Data Insertion Functions (SQLAlchemy) ---
-def insert_scoreboard_games_batch(session, data_dicts):
+def insert_scoreboard_games_batch(session, data_dicts, schema=None):
     if not data_dicts: return 0
-    objects_to_insert = []
-    for api_row_dict in data_dicts:
-        model_data = {}
-        for model_attr in ScoreboardGame.__table__.columns.keys():
-            api_key = DB_TO_API_KEY_MAP_SG.get(model_attr, model_attr)
-            if api_key in api_row_dict: # Check if API provided this key
-                 model_data[model_attr] = api_row_dict.get(api_key)
-
-        if not model_data.get('GameId'):
-            # print(f"Skipping ScoreboardGame data due to missing GameId: {api_row_dict.get('GameId', 'N/A')}") # Can be verbose
-            continue
-        objects_to_insert.append(model_data)
-
-    if not objects_to_insert:
+    rows = SG_ROW_MAPPER.map_rows(data_dicts)
+    if not rows:
         # print("No valid ScoreboardGame objects to insert after processing.") # Can be verbose
         return 0
 
-    try:
-        stmt = sqlite_insert(ScoreboardGame).values(objects_to_insert)
-        stmt = stmt.on_conflict_do_nothing(index_elements=[ScoreboardGame.GameId])
-        result = session.execute(stmt)
-        print(f"Attempted to insert {len(objects_to_insert)} ScoreboardGames. Rows affected: {result.rowcount}")
-        return result.rowcount
-    except Exception as e: print(f"SQLAlchemy error during SG batch insert: {e}"); return 0
-
-def insert_picks_and_bans_batch(session, data_dicts):
-    if not data_dicts: return 0
-    objects_to_insert = []
-    for api_row_dict in data_dicts:
-        model_data = {}
-        for model_attr in PicksAndBansS7Model.__table__.columns.keys():
-            api_key = DB_TO_API_KEY_MAP_PB.get(model_attr, model_attr)
-            if api_key in api_row_dict: # Check if API provided this key
-                model_data[model_attr] = api_row_dict.get(api_key)
-
-        if not model_data.get('UniqueLine'):
-            # print(f"Skipping PicksAndBansS7 data due to missing UniqueLine: {api_row_dict.get('UniqueLine', 'N/A')}") # Can be verbose
-            continue
-
-        for bool_field_name in ['IsComplete', 'IsFilled']:
-            api_val = model_data.get(bool_field_name)
-            if isinstance(api_val, str):
-                if api_val.lower() in ['true', '1', 'yes', 't']: model_data[bool_field_name] = True
-                elif api_val.lower() in ['false', '0', 'no', 'f']: model_data[bool_field_name] = False
-                else: model_data[bool_field_name] = None
-            elif isinstance(api_val, int): model_data[bool_field_name] = bool(api_val)
+    # Errors propagate: the caller rolls the whole batch back rather than committing it without these rows
+    rowcount = SG_ROW_MAPPER.insert_or_ignore(session, rows, schema)
+    print(f"Attempted to insert {len(rows)} ScoreboardGames. Rows affected: {rowcount}")
+    return rowcount
 
-        objects_to_insert.append(model_data)
-
-    if not objects_to_insert:
+def insert_picks_and_bans_batch(session, data_dicts, schema=None):
+    if not data_dicts: return 0
+    rows = PB_ROW_MAPPER.map_rows(data_dicts)
+    if not rows:
         # print("No valid PicksAndBansS7 objects to insert after processing.") # Can be verbose
         return 0
 
-    try:
-        stmt = sqlite_insert(PicksAndBansS7Model).values(objects_to_insert)
-        stmt = stmt.on_conflict_do_nothing(index_elements=[PicksAndBansS7Model.UniqueLine])
-        result = session.execute(stmt)
-        print(f"Attempted to insert {len(objects_to_insert)} PicksAndBansS7. Rows affected: {result.rowcount}")
-        return result.rowcount
-    except Exception as e: print(f"SQLAlchemy error during PB batch insert: {e}"); return 0
-
-# --- Main Data Collection Logic ---
-def collect_data(process_limit=0):
-    site = EsportsClient('lol')
-
-    all_pb_fields_list = [col.name for col in PicksAndBansS7Model.__table__.columns]
-    all_sg_fields_list = [col.name for col in ScoreboardGame.__table__.columns]
-
-    offset = 0
-    total_pb_fetched_this_run = 0
-    total_sg_fetched_this_run = 0
-    sg_references_processed_count = 0
-
-    last_timestamp = get_last_collected_timestamp()
-    print(f"Starting collection. Last collected timestamp: {last_timestamp}")
-
-    while True:
-        if process_limit > 0 and sg_references_processed_count >= process_limit:
-            print(f"Process limit of {process_limit} ScoreboardGames references reached.")
-            break
-
-        current_batch_fetch_limit = BATCH_SIZE
-        if process_limit > 0:
-            remaining_to_fetch = process_limit - sg_references_processed_count
-            if remaining_to_fetch < current_batch_fetch_limit:
-                current_batch_fetch_limit = remaining_to_fetch
-
-        if current_batch_fetch_limit <= 0 and process_limit > 0:
-             print("Limit effectively reached, breaking loop.")
-             break
-
-        print(f"\nFetching SG refs, offset: {offset}, batch_limit: {current_batch_fetch_limit}, processed_count: {sg_references_processed_count}/{process_limit if process_limit > 0 else 'unlimited'}")
-
-        sg_query_params = {
-            'tables': "ScoreboardGames", 'fields': "GameId, DateTime_UTC",
-            'order_by': "DateTime_UTC DESC", 'limit': current_batch_fetch_limit, 'offset': offset
-        }
-        if last_timestamp: sg_query_params['where'] = f"DateTime_UTC < '{last_timestamp}'"
-
-        print(f"Querying ScoreboardGames refs: {sg_query_params}")
-        sg_references = []
+    rowcount = PB_ROW_MAPPER.insert_or_ignore(session, rows, schema)
+    print(f"Attempted to insert {len(rows)} PicksAndBansS7. Rows affected: {rowcount}")
+    return rowcount
+
+def insert_draft_actions_batch(session, sg_data_dicts, pb_data_dicts, schema=None):
+    """Normalizes the batch's drafts into DraftActions, from PicksAndBansS7 when available."""
+    if not sg_data_dicts: return 0
+    pb_by_game = {}
+    for values in PB_ROW_MAPPER.map_rows(pb_data_dicts):
+        pb_row = dict(zip(PB_ROW_MAPPER.columns, values))
+        pb_by_game.setdefault(pb_row['GameId'], pb_row)
+    actions = []
+    for values in SG_ROW_MAPPER.map_rows(sg_data_dicts):
+        sg_row = dict(zip(SG_ROW_MAPPER.columns, values))
+        actions.extend(build_draft_actions(sg_row, pb_by_game.get(sg_row['GameId'])))
+
+    rowcount = insert_draft_actions(session, actions, schema)
+    print(f"Attempted to insert {len(actions)} DraftActions. Rows affected: {rowcount}")
+    return rowcount
+
+def rows_by_season(sg_data_dicts, pb_data_dicts):
+    """
+    Splits a batch's SG and PB rows by season partition ({None: all rows} without partitioning).
+    PB rows follow their game's SG row, so a game's rows always land in the same partition.
+    """
+    if not season_router.enabled:
+        return {None: (sg_data_dicts, pb_data_dicts)}
+    seasons = {}
+    game_seasons = {}
+    for row in sg_data_dicts:
+        season = season_of(row.get('OverviewPage'), row.get(SG_DATETIME_API_KEY))
+        game_seasons[row.get('GameId')] = season
+        seasons.setdefault(season, ([], []))[0].append(row)
+    for row in pb_data_dicts:
+        season = game_seasons.get(row.get('GameId')) or season_of(row.get('OverviewPage'))
+        seasons.setdefault(season, ([], []))[1].append(row)
+    return seasons
+
+def unstored_game_ids(session, game_ids, schema=None):
+    """The `game_ids` without a ScoreboardGames row yet (in the season partition `schema`, if given)."""
+    stored = {game_id for (game_id,) in session.query(ScoreboardGame.GameId).filter(ScoreboardGame.GameId.in_(game_ids))
+              .execution_options(**in_partition(schema))}
+    return set(game_ids) - stored
+
+def store_batch(session, stats, sg_api_data, pb_api_data, stamps=None, added=None):
+    """
+    Writes a batch's games and everything derived from them, leaving stored games as they are:
+    their rows go to their season's partition (the main database without partitioning), then
+    to the rollups, search index and game documents. `stamps` ({GameId: stamp}, see
+    fingerprints.py) are recorded for the games the batch adds, whose GameIds are also added
+    to the `added` set if given. Doesn't commit. Returns the batch's GameIds.
+    """
+    batch_game_ids = []
+    for season, (sg_rows, pb_rows) in rows_by_season(sg_api_data, pb_api_data).items():
+        # Per-game rows go to the season's partition (schema None: the main database)
+        schema = season_router.writable(session, season) if season else None
+        game_ids = [row['GameId'] for row in sg_rows if row.get('GameId')]
+        # Only stamp games stored now: an older row may predate the stamp
+        new_ids = unstored_game_ids(session, game_ids, schema) if stamps or added is not None else set()
+        count = insert_scoreboard_games_batch(session, sg_rows, schema); stats.incr('sg_rows', count)
+        if season:
+            season_router.record_games(session, season, [row.get(SG_DATETIME_API_KEY) for row in sg_rows], count)
+        count = insert_picks_and_bans_batch(session, pb_rows, schema); stats.incr('pb_rows', count)
+        count = insert_draft_actions_batch(session, sg_rows, pb_rows, schema); stats.incr('draft_actions', count)
+        count = update_rollups(session, game_ids, schema); stats.incr('rolled_up_games', count)
+        count = update_search_index(session, game_ids, schema); stats.incr('search_indexed_games', count)
+        count = write_game_documents(session, game_ids, schema); stats.incr('game_documents', count)
+        save_stamps(session, {game_id: stamps[game_id] for game_id in new_ids if game_id in (stamps or {})})
+        if added is not None:
+            added.update(new_ids)
+        batch_game_ids.extend(game_ids)
+    return batch_game_ids
+
+# --- Concurrent Cargo Fetching ---
+class CollectionStats:
+    """
+    Thread-safe counters for a collection run, used for the final throughput summary,
+    plus a Cargo call latency histogram; export_metrics() writes them all in the
+    Prometheus text format.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.metrics = Registry()
+        self.api_call_seconds = self.metrics.histogram(
+            'collector_api_call_duration_seconds', "Cargo API call latency, by outcome (ok, error, throttled).", ('outcome',))
+        self.api_calls = 0
+        self.api_errors = 0
+        self.throttled = 0
+        self.retries = 0
+        self.sg_rows = 0
+        self.pb_rows = 0
+        self.draft_actions = 0
+        self.rolled_up_games = 0
+        self.search_indexed_games = 0
+        self.game_documents = 0
+        self.legacy_api_calls = 0
+        self.inserted_rows = 0 # rows handed to the insert functions, including ones already stored
+        self.insert_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def api_call_percentiles(self, outcome='ok'):
+        """Bucket estimates of the p50/p95/p99 call latency, in seconds."""
+        return {p: self.api_call_seconds.quantile(p / 100, outcome=outcome) for p in (50, 95, 99)}
+
+    def summary(self, limiter=None):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        rows = self.sg_rows + self.pb_rows
+        percentiles = self.api_call_percentiles()
+        lines = [
+            f"Elapsed: {elapsed:.1f}s",
+            f"Rows affected: {rows} (SG: {self.sg_rows}, PB: {self.pb_rows}) -> {rows / elapsed:.2f} rows/sec",
+            f"Draft actions normalized: {self.draft_actions}, games added to stats rollups: {self.rolled_up_games}, "
+            f"to the search index: {self.search_indexed_games}, "
+            f"game documents written: {self.game_documents}",
+            f"API calls: {self.api_calls} -> {self.api_calls / elapsed:.2f} calls/sec "
+            f"(errors: {self.api_errors}, throttled: {self.throttled}, retries: {self.retries})",
+            "API call latency (successful calls): " + (", ".join(f"p{p} <= {seconds * 1e3:.0f}ms" for p, seconds in percentiles.items())
+                                                      if percentiles[50] is not None else "no calls"),
+            f"Inserts: {self.inserted_rows} rows written in {self.insert_seconds:.2f}s -> "
+            f"{self.inserted_rows / max(self.insert_seconds, 1e-9):.0f} insert rows/sec",
+            f"API calls saved vs the original four-step fetch: {self.legacy_api_calls - self.api_calls} "
+            f"(it would have needed ~{self.legacy_api_calls})",
+        ]
+        if limiter is not None:
+            lines.append(f"Rate limiter: final rate {limiter.rate:.2f} calls/sec, {limiter.slept_seconds:.1f}s spent waiting for tokens (summed across workers)")
+        return "\n".join(lines)
+
+    def export_metrics(self, path, limiter=None):
+        """Writes the run's metrics for node_exporter's textfile collector (or any Prometheus text reader)."""
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        gauge = lambda name, help, value, **labels: self.metrics.gauge(name, help, tuple(labels)).set(value, **labels)
+        for name in ('api_calls', 'api_errors', 'throttled', 'retries'):
+            gauge(f'collector_{name}_total', f"Cargo {name.replace('_', ' ')} in the last run.", getattr(self, name))
+        for table, rows in (('ScoreboardGames', self.sg_rows), ('PicksAndBansS7', self.pb_rows), ('DraftActions', self.draft_actions)):
+            gauge('collector_rows_total', "Rows added in the last run.", rows, table=table)
+        gauge('collector_rows_per_second', "ScoreboardGames and PicksAndBansS7 rows added per second.", (self.sg_rows + self.pb_rows) / elapsed)
+        gauge('collector_insert_seconds_total', "Time spent writing batches.", self.insert_seconds)
+        gauge('collector_run_seconds', "Duration of the last run.", elapsed)
+        gauge('collector_last_run_timestamp_seconds', "When the last run ended.", time.time())
+        if limiter is not None:
+            gauge('collector_rate_limiter_sleep_seconds_total', "Time spent waiting for rate limiter tokens, summed across workers.", limiter.slept_seconds)
+            gauge('collector_rate_limiter_rate', "Final rate limiter rate, calls/sec.", limiter.rate)
+        self.metrics.write_textfile(path)
+
+
+def _is_throttle_error(error):
+    """Best-effort detection of the API telling us to slow down."""
+    if getattr(error, 'code', None) in THROTTLE_ERROR_CODES:
+        return True
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) in (429, 503):
+        return True
+    message = str(error).lower()
+    return 'ratelimit' in message or 'rate limit' in message or 'too many requests' in message
+
+
+def cargo_query(cargo_client, limiter, stats, params, max_retries=MAX_RETRIES):
+    """
+    Runs one Cargo query through the shared rate limiter, retrying failed calls.
+    Raises the last error once retries are exhausted.
+    """
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        stats.incr('api_calls')
+        started = time.perf_counter()
         try:
-            sg_references = site.cargo_client.query(**sg_query_params)
+            result = cargo_client.query(**params)
         except Exception as e:
-            print(f"API error fetching SG refs: {e}. Advancing offset.")
-            offset += current_batch_fetch_limit
-            time.sleep(30)
+            stats.incr('api_errors')
+            throttled = _is_throttle_error(e)
+            stats.api_call_seconds.observe(time.perf_counter() - started, outcome='throttled' if throttled else 'error')
+            if throttled:
+                stats.incr('throttled')
+            # Any failure is treated as a signal to slow down; this replaces the fixed 5s/30s sleeps.
+            limiter.on_throttle()
+            if attempt == max_retries:
+                raise
+            stats.incr('retries')
+            print(f"API error ({e}), retrying ({attempt + 1}/{max_retries}) at {limiter.rate:.2f} calls/sec.")
             continue
-
-        if not sg_references:
-            print("No more ScoreboardGames data to fetch.")
-            break
-
-        sg_references_processed_count += len(sg_references) # Increment after successful fetch
-
+        stats.api_call_seconds.observe(time.perf_counter() - started, outcome='ok')
+        limiter.on_success()
+        return result or []
+
+
+def gather_rows(futures):
+    """Collects the rows of submitted chunk queries; any chunk that kept failing fails the whole batch."""
+    rows = []
+    for future in futures:
+        rows.extend(future.result())
+    return rows
+
+
+def quote_literal(value):
+    """`value` as a quoted Cargo (SQL) string literal."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def in_queries(base_params, field, values, max_values=CARGO_MAX_LIMIT):
+    """
+    Splits `values` into `field IN (...)` queries, each holding as many values as fit
+    within MAX_QUERY_CHARS once URL-encoded (and at most `max_values`, so a single
+    response never needs more than one page).
+    """
+    prefix = f"{field} IN ("
+    budget = MAX_QUERY_CHARS - len(urlencode({**base_params, 'where': prefix + ')'}))
+    queries, chunk, used = [], [], 0
+    for value in values:
+        cost = len(quote_plus(quote_literal(value) + ','))
+        if chunk and (used + cost > budget or len(chunk) >= max_values):
+            queries.append({**base_params, 'where': prefix + ",".join(map(quote_literal, chunk)) + ")"})
+            chunk, used = [], 0
+        chunk.append(value)
+        used += cost
+    if chunk:
+        queries.append({**base_params, 'where': prefix + ",".join(map(quote_literal, chunk)) + ")"})
+    return queries
+
+
+def _legacy_call_count(game_ids, sg_ids, pb_lines):
+    """API calls the original four-step fetch (chunks of 20 and 50) would have made for one batch."""
+    calls = 1 + math.ceil(len(game_ids) / 20)
+    if sg_ids or pb_lines:
+        calls += math.ceil(len(sg_ids) / 50) + math.ceil(len(pb_lines) / 50)
+    return calls
+
+
+def keyset_params(params, limit, direction, cursor, table_alias=''):
+    """Adds keyset paging strictly after `cursor` in `direction` to a ScoreboardGames query."""
+    sort, cmp = ("ASC", ">") if direction == FORWARD else ("DESC", "<")
+    dt, gid = f"{table_alias}DateTime_UTC", f"{table_alias}GameId"
+    params = {**params, 'order_by': f"{dt} {sort}, {gid} {sort}", 'limit': limit}
+    if cursor:
+        ts, game_id = quote_literal(cursor[0]), quote_literal(cursor[1])
+        keyset = f"({dt} {cmp} {ts} OR ({dt} = {ts} AND {gid} {cmp} {game_id}))"
+        params['where'] = f"{params['where']} AND {keyset}" if params.get('where') else keyset
+    return params
+
+
+def trim_joined_page(page, limit):
+    """
+    A game with several PicksAndBansS7 rows may straddle the end of a full page of a joined
+    query; its rows are dropped here so the cursor stops before it and the next page fetches it whole.
+    """
+    if len(page) < limit or not page:
+        return page
+    last_game_id = page[-1].get('GameId')
+    trimmed = [row for row in page if row.get('GameId') != last_game_id]
+    return trimmed or page
+
+
+def first_games(page, count):
+    """The rows of the first `count` games of a page, for a run that may not go past them."""
+    game_ids = set()
+    for index, row in enumerate(page):
+        game_ids.add(row.get('GameId'))
+        if len(game_ids) > count:
+            return page[:index]
+    return page
+
+
+def cursor_after(rows):
+    """The keyset cursor after a page of rows: its last row with both sort keys set."""
+    for row in reversed(rows):
+        if row.get(SG_DATETIME_API_KEY) and row.get('GameId'):
+            return row[SG_DATETIME_API_KEY], row['GameId']
+    return None
+
+
+# --- Fetch Modes ---
+class SplitFetch:
+    """
+    The original fetch path: a page of ScoreboardGames refs, then PicksAndBansS7 refs,
+    full ScoreboardGames rows and full PicksAndBansS7 rows in IN-list chunks.
+    """
+    name = 'split'
+    page_size = BATCH_SIZE
+
+    def __init__(self):
+        self.sg_fields = ", ".join(col.name for col in ScoreboardGame.__table__.columns)
+        self.pb_fields = ", ".join(col.name for col in PicksAndBansS7Model.__table__.columns)
+
+    def page_params(self, limit, direction, cursor):
+        return keyset_params({'tables': "ScoreboardGames", 'fields': "GameId, DateTime_UTC"}, limit, direction, cursor)
+
+    def page_limit(self, games):
+        return min(self.page_size, games)
+
+    def trim_page(self, page, limit):
+        return page
+
+    def batch_rows(self, pool, fetch, stats, sg_references):
+        """Fetches the full SG and PB rows for one page of SG references, returning (sg_rows, pb_rows)."""
         current_batch_game_ids = list(set([item['GameId'] for item in sg_references if item.get('GameId')]))
         print(f"Fetched {len(sg_references)} SG refs, {len(current_batch_game_ids)} unique GameIDs.")
-
         if not current_batch_game_ids:
-            print("No GameIDs in current batch, advancing offset.")
-            offset += len(sg_references) if sg_references else current_batch_fetch_limit
-            if not sg_references or len(sg_references) < current_batch_fetch_limit:
-                 print("Assuming end of data due to empty/partial sg_references batch.")
-                 break
-            time.sleep(10)
-            continue
+            print("No GameIDs in current batch.")
+            return [], []
 
-        pb_references_for_game_ids = []
-        for idx, chunk in enumerate([current_batch_game_ids[i:i + 20] for i in range(0, len(current_batch_game_ids), 20)]):
-            if not chunk: continue
-            params = {'tables': "PicksAndBansS7", 'fields': "UniqueLine, GameId", 'where': f"GameId IN ('{ "','".join(chunk) }')"}
-            print(f"Querying PB refs (chunk {idx+1}): {params}")
-            try:
-                refs = site.cargo_client.query(**params)
-                if refs: pb_references_for_game_ids.extend(refs)
-            except Exception as e: print(f"API error fetching PB refs chunk. Error: {e}. Skipping."); time.sleep(5); continue
+        pb_references_for_game_ids = gather_rows([
+            pool.submit(fetch, params)
+            for params in in_queries({'tables': "PicksAndBansS7", 'fields': "UniqueLine, GameId"}, "GameId", current_batch_game_ids)
+        ])
 
         pb_unique_lines = list(set([r['UniqueLine'] for r in pb_references_for_game_ids if r.get('UniqueLine')]))
         game_ids_for_full_fetch = list(set([r['GameId'] for r in pb_references_for_game_ids if r.get('GameId')]))
         print(f"Found {len(pb_references_for_game_ids)} PB refs for {len(game_ids_for_full_fetch)} GameIDs, with {len(pb_unique_lines)} unique UniqueLines.")
+        stats.incr('legacy_api_calls', _legacy_call_count(current_batch_game_ids, game_ids_for_full_fetch, pb_unique_lines))
 
         if not game_ids_for_full_fetch and not pb_unique_lines:
-            print("No PB data for this SG batch. Advancing main offset.")
-            offset += len(sg_references)
-            if len(sg_references) < current_batch_fetch_limit: break
-            time.sleep(10)
-            continue
+            print("No PB data for this SG batch.")
+            return [], []
+
+        # Full SG and PB rows are independent, so all of their chunks go to the pool at once.
+        sg_futures = [
+            pool.submit(fetch, params)
+            for params in in_queries({'tables': "ScoreboardGames", 'fields': self.sg_fields}, "GameId", game_ids_for_full_fetch)
+        ]
+        pb_futures = [
+            pool.submit(fetch, params)
+            for params in in_queries({'tables': "PicksAndBansS7", 'fields': self.pb_fields}, "UniqueLine", pb_unique_lines)
+        ]
+        sg_api_data = gather_rows(sg_futures)
+        pb_api_data = gather_rows(pb_futures)
+        print(f"Fetched {len(sg_api_data)} full SG entries and {len(pb_api_data)} full PB entries.")
+        return sg_api_data, pb_api_data
+
+
+class JoinedFetch:
+    """
+    Fetches full ScoreboardGames and PicksAndBansS7 rows together: each page is a single
+    Cargo query joining the two tables on GameId, so a batch costs one API call.
+
+    PicksAndBansS7 fields are aliased with JOINED_PB_PREFIX to keep them apart from the
+    ScoreboardGames fields of the same name (Team1, Winner, UniqueLine...). Games without
+    pick/ban data are left out, like in the split path. The rows' Cargo `_ID`s come along,
+    as the games' fingerprint stamps.
+    """
+    name = 'joined'
+    page_size = CARGO_MAX_LIMIT
+
+    def __init__(self):
+        sg_fields = [f"SG.{col.name}={col.name}" for col in ScoreboardGame.__table__.columns]
+        pb_fields = [f"PB.{col.name}={JOINED_PB_PREFIX}{col.name}" for col in PicksAndBansS7Model.__table__.columns]
+        self.fields = ", ".join(sg_fields + pb_fields + [STAMP_FIELDS])
+
+    def page_params(self, limit, direction, cursor):
+        params = {
+            'tables': "ScoreboardGames=SG, PicksAndBansS7=PB", 'join_on': "SG.GameId=PB.GameId",
+            'fields': self.fields, 'where': "PB.UniqueLine IS NOT NULL",
+        }
+        params = keyset_params(params, limit, direction, cursor, table_alias='SG.')
+        params['order_by'] += ", PB.UniqueLine ASC"
+        return params
+
+    def page_limit(self, games):
+        # A game's rows can outnumber the games left: the page stays full and is cut to whole games instead
+        return self.page_size
+
+    def trim_page(self, page, limit):
+        return trim_joined_page(page, limit)
+
+    def batch_rows(self, pool, fetch, stats, page):
+        sg_rows_by_id, pb_rows = {}, []
+        for row in page:
+            sg_row, pb_row = {}, {}
+            for key, value in row.items():
+                if key.startswith(JOINED_PB_PREFIX):
+                    pb_row[key[len(JOINED_PB_PREFIX):]] = value
+                else:
+                    sg_row[key] = value
+            sg_rows_by_id.setdefault(sg_row.get('GameId'), sg_row)
+            pb_rows.append(pb_row)
+        sg_rows = list(sg_rows_by_id.values())
+        pb_unique_lines = {row.get('UniqueLine') for row in pb_rows if row.get('UniqueLine')}
+        stats.incr('legacy_api_calls', _legacy_call_count(sg_rows_by_id, sg_rows_by_id, pb_unique_lines))
+        print(f"Fetched {len(sg_rows)} full SG entries and {len(pb_rows)} full PB entries in one joined query.")
+        return sg_rows, pb_rows
+
+
+FETCH_MODES = {mode.name: mode for mode in (JoinedFetch, SplitFetch)}
+
+
+def live_cargo_client():
+    """
+    The Leaguepedia Cargo client. mwrogue is imported here rather than with this module: it
+    takes longer to import than the rest of the collector, and replayed or stand-in runs never use it.
+    """
+    from mwrogue.esports_client import EsportsClient
+    return EsportsClient('lol').cargo_client
+
+
+def add_cargo_source_arguments(parser):
+    """The --cargo-url, --record and --replay options choosing where Cargo queries go."""
+    parser.add_argument(
+        "--cargo-url",
+        help="api.php base URL to query instead of Leaguepedia, e.g. a local stand-in (python -m api.bin.cargo_standin)."
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--record", metavar="FIXTURE",
+        help="Save every Cargo response to this compressed fixture file for later --replay runs."
+    )
+    source.add_argument(
+        "--replay", metavar="FIXTURE",
+        help="Answer Cargo queries from a fixture recorded with --record instead of the network."
+    )
 
-        session = get_session()
-        try:
-            if game_ids_for_full_fetch:
-                sg_api_data = []
-                for idx, chunk in enumerate([game_ids_for_full_fetch[i:i + 50] for i in range(0, len(game_ids_for_full_fetch), 50)]):
-                    if not chunk: continue
-                    params = {'tables': "ScoreboardGames", 'fields': ", ".join(all_sg_fields_list), 'where': f"GameId IN ('{ "','".join(chunk) }')"}
-                    print(f"Querying full SG (chunk {idx+1}): {params}")
-                    try: data = site.cargo_client.query(**params); sg_api_data.extend(data if data else [])
-                    except Exception as e: print(f"API error full SG. Error: {e}. Skip."); time.sleep(5); continue
-                if sg_api_data: print(f"Debug Keys SG (first): {list(sg_api_data[0].keys()) if sg_api_data else 'N/A'}")
-                print(f"Fetched {len(sg_api_data)} full SG entries.")
-                count = insert_scoreboard_games_batch(session, sg_api_data); total_sg_fetched_this_run += count
-
-            if pb_unique_lines:
-                pb_api_data = []
-                for idx, chunk in enumerate([pb_unique_lines[i:i + 50] for i in range(0, len(pb_unique_lines), 50)]):
-                    if not chunk: continue
-                    params = {'tables': "PicksAndBansS7", 'fields': ", ".join(all_pb_fields_list), 'where': f"UniqueLine IN ('{ "','".join(chunk) }')"}
-                    print(f"Querying full PB (chunk {idx+1}): {params}")
-                    try: data = site.cargo_client.query(**params); pb_api_data.extend(data if data else [])
-                    except Exception as e: print(f"API error full PB. Error: {e}. Skip."); time.sleep(5); continue
-                if pb_api_data: print(f"Debug Keys PB (first): {list(pb_api_data[0].keys()) if pb_api_data else 'N/A'}")
-                print(f"Fetched {len(pb_api_data)} full PB entries.")
-                count = insert_picks_and_bans_batch(session, pb_api_data); total_pb_fetched_this_run += count
-
-            session.commit(); print("Committed batch.")
-        except Exception as e: print(f"Critical DB/processing error: {e}. Rollback."); session.rollback()
-        finally: session.close()
-
-        offset += len(sg_references)
-        if len(sg_references) < current_batch_fetch_limit:
-            print("Fetched fewer SG refs than batch limit, assuming end of relevant data.")
-            break
-
-        print("Waiting 10s before next main batch fetch...")
-        time.sleep(10)
-
-    print(f"\nCollection run complete. SG rows affected: {total_sg_fetched_this_run}, PB rows affected: {total_pb_fetched_this_run}")
+
+def cargo_client_from_args(args):
+    """The Cargo client the add_cargo_source_arguments() options select; call .save() on it after a --record run."""
+    if args.replay:
+        return ReplayCargoClient(args.replay)
+    if args.cargo_url:
+        from ..cargo_standin import http_cargo_client
+        cargo_client = http_cargo_client(args.cargo_url)
+    else:
+        cargo_client = live_cargo_client()
+    if args.record:
+        cargo_client = RecordingCargoClient(cargo_client, args.record)
+    return cargo_client
+
+
+# --- Main Data Collection Logic ---
+def collect_data(process_limit=0, concurrency=DEFAULT_CONCURRENCY, direction=BACKWARD, fetch_mode=JoinedFetch.name, bulk=False,
+                 cargo_client=None, limiter=None, metrics_file=None):
+    """
+    Collects games from `cargo_client` (default: the live Leaguepedia one) and returns the run's
+    CollectionStats, also written to `metrics_file` in the Prometheus text format if given.
+    Benchmarks pass a stand-in client and a limiter tuned for it.
+    """
+    if cargo_client is None:
+        cargo_client = live_cargo_client()
+    limiter = limiter or AdaptiveTokenBucket()
+    stats = CollectionStats()
+    mode = FETCH_MODES[fetch_mode]()
+
+    init_db() # Creates the checkpoint table on databases set up before it existed.
+    cursor = load_checkpoint(direction)
+    print(f"Starting {direction} collection ({mode.name} fetch{', bulk load' if bulk else ''}) with concurrency {concurrency}. Cursor: {cursor}")
+
+    def batch_limit(processed_count):
+        if process_limit > 0:
+            remaining = process_limit - processed_count
+            return mode.page_limit(remaining) if remaining > 0 else 0
+        return mode.page_size
+
+    with ExitStack() as stack:
+        if bulk:
+            stack.enter_context(bulk_load([ScoreboardGame.__table__, PicksAndBansS7Model.__table__, DraftAction.__table__]))
+        pool = ThreadPoolExecutor(max_workers=concurrency)
+        stack.callback(pool.shutdown, wait=True, cancel_futures=True)
+        fetch = partial(cargo_query, cargo_client, limiter, stats)
+
+        sg_references_processed_count = 0
+        current_batch_fetch_limit = batch_limit(0)
+        next_page = pool.submit(fetch, mode.page_params(current_batch_fetch_limit, direction, cursor))
+
+        while next_page is not None:
+            print(f"\nFetching SG page after {cursor}, batch_limit: {current_batch_fetch_limit}, processed_count: {sg_references_processed_count}/{process_limit if process_limit > 0 else 'unlimited'}")
+            try:
+                page = next_page.result()
+            except Exception as e:
+                print(f"API error fetching SG page: {e}. Stopping; the next run resumes from the last checkpoint.")
+                break
+            next_page = None
+
+            if not page:
+                print("No more ScoreboardGames data to fetch.")
+                break
+
+            reached_end = len(page) < current_batch_fetch_limit
+            page = mode.trim_page(page, current_batch_fetch_limit)
+            if process_limit > 0:
+                page = first_games(page, process_limit - sg_references_processed_count)
+            page_cursor = cursor_after(page)
+            if page_cursor is None:
+                print("SG page has no usable (DateTime_UTC, GameId) cursor. Stopping.")
+                break
+
+            # Pipeline: request the next page while this batch's rows are being fetched and inserted.
+            sg_references_processed_count += len({row.get('GameId') for row in page})
+            current_batch_fetch_limit = batch_limit(sg_references_processed_count)
+            if reached_end:
+                print("Fetched fewer SG rows than batch limit, assuming end of relevant data.")
+            elif current_batch_fetch_limit <= 0:
+                print(f"Process limit of {process_limit} ScoreboardGames references reached.")
+            else:
+                next_page = pool.submit(fetch, mode.page_params(current_batch_fetch_limit, direction, page_cursor))
+
+            try:
+                sg_api_data, pb_api_data = mode.batch_rows(pool, fetch, stats, page)
+            except Exception as e:
+                print(f"API error fetching batch rows: {e}. Stopping; the next run resumes from the last checkpoint.")
+                break
+
+            session = get_session()
+            try:
+                insert_started = time.monotonic()
+                batch_game_ids = store_batch(session, stats, sg_api_data, pb_api_data, game_stamps(page))
+                save_checkpoint(session, direction, page_cursor)
+                session.commit(); print(f"Committed batch, {direction} checkpoint now {page_cursor}.")
+                game_cache.invalidate(game_cache_key(game_id, format) for game_id in batch_game_ids for format in GAME_FORMATS)
+                stats.incr('inserted_rows', len(sg_api_data) + len(pb_api_data))
+                stats.incr('insert_seconds', time.monotonic() - insert_started)
+            except Exception as e:
+                print(f"Critical DB/processing error: {e}. Rollback; stopping at checkpoint {cursor}.")
+                session.rollback()
+                break
+            finally: session.close()
+            cursor = page_cursor
+
+    print(f"\nCollection run complete. SG rows affected: {stats.sg_rows}, PB rows affected: {stats.pb_rows}")
+    print(stats.summary(limiter))
+    if metrics_file:
+        stats.export_metrics(metrics_file, limiter)
+        print(f"Metrics written to {metrics_file}.")
+    return stats
 
 if __name__ == '__main__':
     import argparse
@@ -253,7 +669,35 @@ if __name__ == '__main__':
         "--limit", type=int, default=500,
         help="Max ScoreboardGames references to process. 0 for no limit. Default: 500."
     )
+    parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+        help=f"Max Cargo API calls in flight at once. Default: {DEFAULT_CONCURRENCY}."
+    )
+    parser.add_argument(
+        "--direction", choices=[BACKWARD, FORWARD], default=BACKWARD,
+        help="'backward' backfills older games, 'forward' picks up games newer than the forward checkpoint. Default: backward."
+    )
+    parser.add_argument(
+        "--fetch-mode", choices=list(FETCH_MODES), default=JoinedFetch.name,
+        help="'joined' fetches SG and PB rows in one joined Cargo query per batch, 'split' uses separate ref and row queries. Default: joined."
+    )
+    parser.add_argument(
+        "--bulk-load", action="store_true",
+        help="Backfill mode: WAL journal, relaxed sync and a large page cache during the run, indexes rebuilt at the end."
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="Write the run's metrics (API call latency histogram, rows/sec, retries, limiter sleep) to this Prometheus text file."
+    )
+    add_cargo_source_arguments(parser)
     args = parser.parse_args()
     print(f"Starting data collection (SQLAlchemy) with limit: {args.limit if args.limit > 0 else 'No limit'}")
-    collect_data(process_limit=args.limit)
+    cargo_client = cargo_client_from_args(args)
+    try:
+        collect_data(process_limit=args.limit, concurrency=max(1, args.concurrency), direction=args.direction,
+                     fetch_mode=args.fetch_mode, bulk=args.bulk_load, cargo_client=cargo_client,
+                     metrics_file=args.metrics_file)
+    finally:
+        if args.record:
+            cargo_client.save()
     print("Data collection process finished.")
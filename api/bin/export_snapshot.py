@@ -0,0 +1,125 @@
+import argparse
+import os
+import shutil
+import time
+
+from sqlalchemy import column, select
+
+from ..models_base import get_read_only_session
+from ..partitions import in_partition, season_router
+from ..picks_and_bans_model import PicksAndBansS7Model
+from ..scoreboard_game_model import ScoreboardGame
+from ..snapshot import SnapshotWriter
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'snapshot')
+CHUNK_SIZE = 50_000
+TABLES = (ScoreboardGame.__table__, PicksAndBansS7Model.__table__)
+
+
+def export_table(connection, writer, table, chunk_size=CHUNK_SIZE, schema=None):
+    """
+    Streams the rows added to `table` (in the main database, or the season partition
+    `schema`) since the snapshot's watermark for it, one part per chunk.
+
+    Rows are read in rowid (insertion) order with plain Core selects, so no ORM objects are
+    built and only one chunk is held in memory. Returns the number of rows exported.
+    """
+    rowid = column('rowid')
+    exported = 0
+    last_rowid = writer.last_rowid(table.name, schema)
+    while True:
+        rows = connection.execute(
+            select(rowid, *table.columns).select_from(table).where(rowid > last_rowid).order_by(rowid).limit(chunk_size)
+            .execution_options(**in_partition(schema))
+        ).all()
+        if not rows:
+            return exported
+        writer.append(table, [row[0] for row in rows], [row[1:] for row in rows], schema)
+        exported += len(rows)
+        last_rowid = rows[-1][0]
+        print(f"  {table.name}{f' ({schema})' if schema else ''}: {exported} rows exported (rowid {last_rowid}).")
+
+
+def replace_directory(source, destination):
+    """
+    Moves the directory `source` to `destination`, replacing the one there: the old directory
+    is renamed aside first, then deleted once the new one is in place.
+    """
+    old_dir = f"{destination}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.isdir(destination):
+        os.rename(destination, old_dir)
+    os.rename(source, destination)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def rewritten_rows(connection, writer, table, schema=None):
+    """
+    The number of rows past the snapshot's watermark for `table` whose key it already holds:
+    rows verify_data overwrote, which moves them to a new rowid (see RowMapper.upsert_sql).
+    Appending them would leave the old copies in the snapshot.
+    """
+    key = next(iter(table.primary_key.columns))
+    known = writer.known_values(table.name, key.name)
+    if not known:
+        return 0
+    keys = connection.execute(
+        select(key).select_from(table).where(column('rowid') > writer.last_rowid(table.name, schema)).execution_options(**in_partition(schema))
+    ).scalars()
+    return sum(1 for value in keys if value in known)
+
+
+def export_snapshot(path=DEFAULT_SNAPSHOT_DIR, incremental=False, chunk_size=CHUNK_SIZE):
+    """
+    Exports both tables to `path`; with `incremental`, only rows added since the last export
+    are appended, unless some stored rows were rewritten since (corrected games, see
+    rewritten_rows), in which case the snapshot is exported in full again.
+    """
+    started = time.monotonic()
+    session = get_read_only_session()
+    try:
+        if incremental and os.path.isdir(path):
+            writer = SnapshotWriter(path)
+            rewritten = sum(rewritten_rows(session.connection(), writer, table, schema)
+                            for schema in season_router.schemas(session) for table in TABLES)
+            if rewritten:
+                print(f"{rewritten} exported rows were rewritten since; exporting the snapshot in full.")
+                incremental = False
+        # A full export is written next to the snapshot, which readers keep using until it is swapped in
+        output_dir = path if incremental else f"{path}.tmp"
+        if not incremental:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        os.makedirs(output_dir, exist_ok=True)
+        writer = SnapshotWriter(output_dir)
+        counts = {table.name: 0 for table in TABLES}
+        # Every season partition has its own rowids, hence its own watermark
+        for schema in season_router.schemas(session):
+            connection = session.connection()
+            for table in TABLES:
+                counts[table.name] += export_table(connection, writer, table, chunk_size, schema)
+    finally:
+        session.close()
+    writer.commit()
+    if not incremental:
+        replace_directory(output_dir, path)
+    print(f"Snapshot {'updated' if incremental else 'written'} at {path} in {time.monotonic() - started:.1f}s: "
+          + ", ".join(f"{name} +{count} rows" for name, count in counts.items()))
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export ScoreboardGames and PicksAndBansS7 to a columnar .npy snapshot.")
+    parser.add_argument(
+        "--output", default=DEFAULT_SNAPSHOT_DIR,
+        help=f"Snapshot directory. Default: {DEFAULT_SNAPSHOT_DIR}."
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Append only the rows stored since the previous export instead of rewriting the snapshot."
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=CHUNK_SIZE,
+        help=f"Rows read and written per part. Default: {CHUNK_SIZE}."
+    )
+    args = parser.parse_args()
+    export_snapshot(args.output, incremental=args.incremental, chunk_size=max(1, args.chunk_size))
@@ -0,0 +1,24 @@
+import argparse
+import os
+import time
+
+from ..synthetic import write_database
+
+DEFAULT_GAMES = 500_000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a database of realistic synthetic games for benchmarks.")
+    parser.add_argument("--output", required=True, help="SQLite database file to create or extend.")
+    parser.add_argument("--games", type=int, default=DEFAULT_GAMES, help=f"Games to generate. Default: {DEFAULT_GAMES}.")
+    parser.add_argument("--seed", type=int, default=0, help="The same seed always gives the same games. Default: 0.")
+    parser.add_argument(
+        "--cargo-only", action="store_true",
+        help="Only write ScoreboardGames and PicksAndBansS7 (a Cargo stand-in source), not the derived tables (DraftActions, stats rollups, search index, game documents)."
+    )
+    args = parser.parse_args()
+    if os.path.exists(args.output):
+        print(f"{args.output} exists, adding the games it doesn't have yet.")
+    started = time.monotonic()
+    written = write_database(args.output, args.games, seed=args.seed, derived=not args.cargo_only)
+    print(f"Wrote {written} synthetic games to {args.output} in {time.monotonic() - started:.1f}s.")
@@ -0,0 +1,299 @@
+"""
+Live ingest daemon, for tournament days: `python -m api.bin.ingest`.
+
+Polls the wiki for games after the forward checkpoint with collect_data's fetch modes and
+store_batch(), on an adaptive interval: every MIN_INTERVAL seconds while games keep coming,
+backing off to MAX_INTERVAL when none do. Every write goes through one writer thread, in
+transactions of WRITE_CHUNK_GAMES games that each move the checkpoint, so other writers
+(verify_data, backfills) never wait long on SQLite's write lock and readers see new games
+as soon as their chunk commits. Each stored game gets an IngestEvents row in the same
+transaction, which the API pushes to GET /games/stream clients (see api/ingest_events.py).
+
+SIGINT and SIGTERM stop the daemon once the writes in flight are committed.
+"""
+import argparse
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+
+from ..cache import game_cache, game_cache_key
+from ..fingerprints import game_stamps
+from ..game_documents import GAME_FORMATS
+from ..ingest_events import prune_ingest_events, record_ingest_events
+from ..models_base import get_session, init_db
+from ..rate_limiter import AdaptiveTokenBucket
+from .collect_data import (
+    DEFAULT_CONCURRENCY, FETCH_MODES, FORWARD, SG_DATETIME_API_KEY, CollectionStats, JoinedFetch,
+    add_cargo_source_arguments, cargo_client_from_args, cargo_query, cursor_after, live_cargo_client, load_checkpoint,
+    save_checkpoint, store_batch,
+)
+
+# Seconds between polls while games are coming in, and at most once none are
+MIN_INTERVAL = 5.0
+MAX_INTERVAL = 300.0
+# Games per write transaction
+WRITE_CHUNK_GAMES = 20
+# Seconds between deletions of the events older than EVENT_RETENTION
+PRUNE_INTERVAL = 3600
+
+
+class IngestStats(CollectionStats):
+    """CollectionStats of the daemon's lifetime, plus its polls and the games they added."""
+
+    def __init__(self):
+        super().__init__()
+        self.polls = 0
+        self.failed_polls = 0
+        self.ingested_games = 0 # games stored for the first time, each with an event
+        self.interval = 0.0 # seconds until the next poll
+
+    def summary(self, limiter=None):
+        return "\n".join([
+            f"Polls: {self.polls} (failed: {self.failed_polls}), games ingested: {self.ingested_games}",
+            super().summary(limiter),
+        ])
+
+    def export_metrics(self, path, limiter=None):
+        for name, help, value in (
+            ('ingest_polls_total', "Polls since the daemon started.", self.polls),
+            ('ingest_failed_polls_total', "Polls that stopped on an API or database error.", self.failed_polls),
+            ('ingest_games_total', "Games stored for the first time, each published as an event.", self.ingested_games),
+            ('ingest_poll_interval_seconds', "Seconds until the next poll.", self.interval),
+        ):
+            self.metrics.gauge(name, help).set(value)
+        super().export_metrics(path, limiter)
+
+
+class AdaptiveInterval:
+    """
+    Seconds to wait between polls: `minimum` after a poll added games (during a live event,
+    more are about to follow), then `factor` times longer after each poll that added none
+    (or failed), up to `maximum`.
+    """
+
+    def __init__(self, minimum=MIN_INTERVAL, maximum=MAX_INTERVAL, factor=2.0):
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.factor = factor
+        self.seconds = minimum
+
+    def update(self, added) -> float:
+        """The wait after a poll that added `added` games."""
+        self.seconds = self.minimum if added else min(self.seconds * self.factor, self.maximum)
+        return self.seconds
+
+
+class SingleWriter:
+    """
+    The thread all the daemon's writes go through, one job at a time: a job is called with a
+    fresh session and committed as soon as it returns (rolled back if it raises), so writes
+    never wait on each other for SQLite's lock and each holds it for one short transaction.
+    """
+
+    def __init__(self, open_session=get_session):
+        self._open_session = open_session
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='ingest-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, job, after=None) -> Future:
+        """
+        Queues `job(session)` and returns the Future of its result. Given `after`, the Future
+        of an earlier job, the job is skipped, failing with the same error, if that one failed:
+        jobs run in order, so it's done by then.
+        """
+        future = Future()
+        self._jobs.put((job, after, future))
+        return future
+
+    def _run(self):
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                return
+            job, after, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            if after is not None and (after.cancelled() or after.exception() is not None):
+                future.set_exception(after.exception() if not after.cancelled() else RuntimeError("An earlier write was cancelled"))
+                continue
+            session = self._open_session()
+            try:
+                result = job(session)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                session.close()
+
+    def close(self):
+        """Runs the jobs already queued, then stops the thread."""
+        self._jobs.put(None)
+        self._thread.join()
+
+
+def chunk_batch(sg_rows, pb_rows, page_cursor, size=WRITE_CHUNK_GAMES):
+    """
+    Splits a page's rows into (sg_rows, pb_rows, cursor) chunks of `size` games, in keyset
+    order, the cursor being the one to checkpoint once the chunk is stored: its last game's,
+    and `page_cursor` for the last chunk, since the page can end with games missing from the
+    rows (e.g. without picks and bans).
+    """
+    sg_rows = sorted(sg_rows, key=lambda row: (row.get(SG_DATETIME_API_KEY) or '', row.get('GameId') or ''))
+    pb_by_game = {}
+    for row in pb_rows:
+        pb_by_game.setdefault(row.get('GameId'), []).append(row)
+    chunks = []
+    for start in range(0, len(sg_rows), size):
+        sg_chunk = sg_rows[start:start + size]
+        pb_chunk = [row for sg_row in sg_chunk for row in pb_by_game.pop(sg_row.get('GameId'), [])]
+        chunks.append((sg_chunk, pb_chunk, cursor_after(sg_chunk)))
+    sg_chunk, pb_chunk, _ = chunks.pop() if chunks else ([], [], None)
+    # PicksAndBansS7 rows whose game has no ScoreboardGames row go with the last chunk
+    chunks.append((sg_chunk, pb_chunk + [row for rows in pb_by_game.values() for row in rows], page_cursor))
+    return chunks
+
+
+def write_chunk(stats, sg_rows, pb_rows, stamps, cursor, session):
+    """
+    A writer job: stores a chunk of games, moves the forward checkpoint to `cursor` and adds
+    an event for each game stored for the first time. Returns (the chunk's GameIds, the added ones).
+    """
+    started, added = time.monotonic(), set()
+    game_ids = store_batch(session, stats, sg_rows, pb_rows, stamps, added)
+    if cursor:
+        save_checkpoint(session, FORWARD, cursor)
+    record_ingest_events(session, [(row['GameId'], row.get('Tournament'), row.get(SG_DATETIME_API_KEY))
+                                   for row in sg_rows if row.get('GameId') in added])
+    stats.incr('inserted_rows', len(sg_rows) + len(pb_rows))
+    stats.incr('insert_seconds', time.monotonic() - started)
+    return game_ids, added
+
+
+def _invalidate_cached_games(future):
+    if not future.cancelled() and future.exception() is None:
+        game_ids, _ = future.result()
+        game_cache.invalidate(game_cache_key(game_id, format) for game_id in game_ids for format in GAME_FORMATS)
+
+
+def poll(mode, pool, fetch, stats, writer, cursor):
+    """
+    Fetches every game after `cursor` and hands them to `writer` in chunks, fetching the next
+    page while the previous one is written. Returns (games added, the new cursor) once every
+    chunk is committed; raises the first API or write error, the checkpoint then being at the
+    last chunk committed.
+    """
+    written, last_write = [], None
+    try:
+        while True:
+            page = fetch(mode.page_params(mode.page_size, FORWARD, cursor))
+            if not page:
+                break
+            reached_end = len(page) < mode.page_size
+            page = mode.trim_page(page, mode.page_size)
+            page_cursor = cursor_after(page)
+            if page_cursor is None:
+                print("SG page has no usable (DateTime_UTC, GameId) cursor. Waiting for the next poll.")
+                break
+            sg_rows, pb_rows = mode.batch_rows(pool, fetch, stats, page)
+            stamps = game_stamps(page)
+            # Chained: once a chunk fails, the later ones are skipped, so the checkpoint never passes it
+            for sg_chunk, pb_chunk, chunk_cursor in chunk_batch(sg_rows, pb_rows, page_cursor):
+                last_write = writer.submit(partial(write_chunk, stats, sg_chunk, pb_chunk, stamps, chunk_cursor), after=last_write)
+                last_write.add_done_callback(_invalidate_cached_games)
+                written.append(last_write)
+            cursor = page_cursor
+            if reached_end or (last_write.done() and last_write.exception() is not None):
+                break
+    finally:
+        wait(written)
+    added = sum(len(future.result()[1]) for future in written)
+    return added, cursor
+
+
+def ingest(min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, concurrency=DEFAULT_CONCURRENCY, fetch_mode=JoinedFetch.name,
+           cargo_client=None, limiter=None, metrics_file=None, stop=None, max_polls=None):
+    """
+    Polls `cargo_client` (default: the live Leaguepedia one) for new games until `stop`, a
+    threading.Event, is set, or `max_polls` polls were made. Returns the daemon's IngestStats,
+    also written to `metrics_file` in the Prometheus text format after every poll if given.
+    """
+    if cargo_client is None:
+        cargo_client = live_cargo_client()
+    limiter = limiter or AdaptiveTokenBucket()
+    stop = stop or threading.Event()
+    stats = IngestStats()
+    mode = FETCH_MODES[fetch_mode]()
+    interval = AdaptiveInterval(min_interval, max_interval)
+
+    init_db() # Creates the IngestEvents table on databases set up before it existed.
+    cursor = load_checkpoint(FORWARD)
+    print(f"Ingesting games after {cursor} ({mode.name} fetch), polling every {interval.minimum:g}-{interval.maximum:g}s.")
+    writer = SingleWriter()
+    pruned_at = None
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            fetch = partial(cargo_query, cargo_client, limiter, stats)
+            while not stop.is_set():
+                stats.incr('polls')
+                try:
+                    added, cursor = poll(mode, pool, fetch, stats, writer, cursor)
+                except Exception as e:
+                    print(f"Poll failed: {e}. Retrying from the last checkpoint.")
+                    stats.incr('failed_polls')
+                    added, cursor = 0, load_checkpoint(FORWARD)
+                stats.incr('ingested_games', added)
+                if pruned_at is None or time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                    writer.submit(prune_ingest_events)
+                    pruned_at = time.monotonic()
+                stats.interval = interval.update(added)
+                if metrics_file:
+                    stats.export_metrics(metrics_file, limiter)
+                if max_polls and stats.polls >= max_polls:
+                    break
+                print(f"{added} games ingested, checkpoint {cursor}. Next poll in {stats.interval:g}s.")
+                stop.wait(stats.interval)
+    finally:
+        writer.close()
+    print(f"\nIngest daemon stopped.\n{stats.summary(limiter)}")
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Continuously ingest new games from Leaguepedia, publishing an event for each.")
+    parser.add_argument(
+        "--min-interval", type=float, default=MIN_INTERVAL,
+        help=f"Seconds between polls while new games keep coming. Default: {MIN_INTERVAL:g}."
+    )
+    parser.add_argument(
+        "--max-interval", type=float, default=MAX_INTERVAL,
+        help=f"Seconds between polls once none do (the interval doubles after each empty poll). Default: {MAX_INTERVAL:g}."
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+        help=f"Max Cargo API calls in flight at once. Default: {DEFAULT_CONCURRENCY}."
+    )
+    parser.add_argument(
+        "--fetch-mode", choices=list(FETCH_MODES), default=JoinedFetch.name,
+        help="'joined' fetches SG and PB rows in one joined Cargo query per page, 'split' uses separate ref and row queries. Default: joined."
+    )
+    parser.add_argument("--metrics-file", help="Write the daemon's metrics to this Prometheus text file after every poll.")
+    add_cargo_source_arguments(parser)
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    cargo_client = cargo_client_from_args(args)
+    try:
+        ingest(min_interval=args.min_interval, max_interval=args.max_interval, concurrency=max(1, args.concurrency),
+               fetch_mode=args.fetch_mode, cargo_client=cargo_client, metrics_file=args.metrics_file, stop=stop)
+    finally:
+        if args.record:
+            cargo_client.save()
@@ -0,0 +1,113 @@
+import argparse
+
+from ..models_base import get_session, init_db
+from ..partitions import PARTITIONED_TABLES, compact_season, reopen_season, season_of, season_router
+from ..scoreboard_game_model import ScoreboardGame
+
+
+def list_partitions(router, session):
+    print(f"Season partitions in {router.directory}:")
+    for partition in router.catalog(session):
+        print(f"  {partition.Season:8} {partition.Games:8} games  {partition.FirstDate or '-'} .. {partition.LastDate or '-'}"
+              f"{'  (compacted)' if partition.Immutable else ''}")
+
+
+def _columns(table):
+    return ", ".join(f'"{column.name}"' for column in table.columns)
+
+
+def _split_connection(session, split):
+    """
+    The session's connection, with the season_of() SQL function and a temp.GameSeasons table
+    of the main database's games for the `split` in progress. Both belong to the DBAPI
+    connection, and committing returns it to the pool: the next one may have to build them.
+    """
+    connection = session.connection()
+    if connection.info.get('split_in_progress') is not split:
+        connection.connection.driver_connection.create_function('season_of', 2, season_of, deterministic=True)
+        connection.exec_driver_sql("DROP TABLE IF EXISTS temp.GameSeasons")
+        connection.exec_driver_sql(
+            'CREATE TEMP TABLE GameSeasons (GameId TEXT PRIMARY KEY, Season TEXT NOT NULL) WITHOUT ROWID')
+        connection.exec_driver_sql(
+            f'INSERT INTO temp.GameSeasons SELECT GameId, season_of(OverviewPage, DateTime_UTC) FROM main."{ScoreboardGame.__tablename__}"')
+        connection.info['split_in_progress'] = split
+    return connection
+
+
+def split_main_database(router, session, delete=False):
+    """
+    Copies the per-game rows of the main database into their season partitions (rows already
+    there are left alone), and with `delete`, removes them from the main database. A game's
+    rows all go to its ScoreboardGames row's season; PicksAndBansS7 rows without one go by
+    their own OverviewPage. Each season is copied in its own transaction, a transaction
+    holding on to every partition it wrote until it commits, and the rows are only deleted
+    once all of them are copied: an interrupted split can be run again. Returns {season: games copied}.
+    """
+    split = object()
+    connection = _split_connection(session, split)
+    seasons = [row[0] for row in connection.exec_driver_sql("""
+        SELECT Season FROM temp.GameSeasons
+        UNION SELECT season_of(OverviewPage, NULL) FROM main."PicksAndBansS7"
+        WHERE GameId IS NULL OR GameId NOT IN (SELECT GameId FROM temp.GameSeasons)""")]
+
+    copied = {}
+    for season in sorted(seasons):
+        connection = _split_connection(session, split)
+        schema = router.writable(session, season)
+        for table in PARTITIONED_TABLES:
+            where = "GameId IN (SELECT GameId FROM temp.GameSeasons WHERE Season = :season)"
+            if table.name == "PicksAndBansS7":
+                where += (" OR ((GameId IS NULL OR GameId NOT IN (SELECT GameId FROM temp.GameSeasons))"
+                          " AND season_of(OverviewPage, NULL) = :season)")
+            result = connection.exec_driver_sql(
+                f'INSERT OR IGNORE INTO "{schema}"."{table.name}" ({_columns(table)}) '
+                f'SELECT {_columns(table)} FROM main."{table.name}" WHERE {where}', {'season': season})
+            if table is ScoreboardGame.__table__:
+                copied[season] = result.rowcount
+        first, last = connection.exec_driver_sql(
+            f'SELECT MIN(DateTime_UTC), MAX(DateTime_UTC) FROM "{schema}"."{ScoreboardGame.__tablename__}"').one()
+        router.record_games(session, season, [first, last], copied[season])
+        session.commit()
+        print(f"  Season {season}: {copied[season]} games copied.")
+
+    connection = session.connection()
+    if delete:
+        # Children first, for the foreign keys to ScoreboardGames
+        for table in reversed(PARTITIONED_TABLES):
+            connection.exec_driver_sql(f'DELETE FROM main."{table.name}"')
+    connection.exec_driver_sql("DROP TABLE IF EXISTS temp.GameSeasons")
+    connection.info.pop('split_in_progress', None)
+    session.commit()
+    return copied
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Manage the season partitions of the per-game tables (see api/partitions.py).")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List the partitions, their game counts and date ranges.")
+    split = commands.add_parser("split", help="Move the per-game rows of the main database into season partitions.")
+    split.add_argument("--delete", action="store_true", help="Delete the rows from the main database once copied.")
+    compact = commands.add_parser("compact", help="Rewrite a closed season into a read-only, immutable file.")
+    compact.add_argument("season")
+    reopen = commands.add_parser("reopen", help="Make a compacted season writable again.")
+    reopen.add_argument("season")
+    args = parser.parse_args()
+
+    if not season_router.enabled:
+        parser.error("Set LEAGUE_PARTITION_DIR to the directory of the partition files.")
+    init_db()
+    session = get_session()
+    try:
+        if args.command == "list":
+            list_partitions(season_router, session)
+        elif args.command == "split":
+            copied = split_main_database(season_router, session, delete=args.delete)
+            print(f"Split {sum(copied.values())} games into {len(copied)} season partitions.")
+        elif args.command == "compact":
+            done = compact_season(season_router, session, args.season)
+            print(f"Season {args.season} {'compacted' if done else 'was already compacted'}.")
+        else:
+            done = reopen_season(season_router, session, args.season)
+            print(f"Season {args.season} {'reopened' if done else 'was not compacted'}.")
+    finally:
+        session.close()
@@ -0,0 +1,283 @@
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from sqlalchemy import delete, select
+
+from ..cache import game_cache, game_cache_key
+from ..draft_action_model import DraftAction
+from ..fingerprints import STAMP_FIELDS, game_stamps, save_stamps, stored_stamps
+from ..game_documents import GAME_FORMATS, write_game_documents
+from ..models_base import get_session, init_db
+from ..partitions import in_partition, schema_name, season_router
+from ..picks_and_bans_model import PicksAndBansS7Model
+from ..rate_limiter import AdaptiveTokenBucket
+from ..scoreboard_game_model import ScoreboardGame
+from ..search_index import remove_from_search_index, update_search_index
+from ..stats_rollup import remove_from_rollups, update_rollups
+from .collect_data import (
+    CARGO_MAX_LIMIT, DEFAULT_CONCURRENCY, FORWARD, PB_ROW_MAPPER, SG_DATETIME_API_KEY, SG_ROW_MAPPER, CollectionStats,
+    JoinedFetch, add_cargo_source_arguments, cargo_client_from_args, cargo_query, cursor_after, gather_rows, in_queries,
+    insert_draft_actions_batch, keyset_params, live_cargo_client, quote_literal, store_batch, trim_joined_page,
+)
+
+# Games per full-row query: a joined query returns a row per PicksAndBansS7 row, at most CARGO_MAX_LIMIT
+FULL_ROWS_CHUNK = 100
+
+_SG_KEY = SG_ROW_MAPPER.columns.index('GameId')
+_PB_KEY = PB_ROW_MAPPER.columns.index('UniqueLine')
+_PB_GAME = PB_ROW_MAPPER.columns.index('GameId')
+
+
+class VerificationStats(CollectionStats):
+    """CollectionStats of a verification run, plus how many games were compared and rewritten."""
+
+    def __init__(self):
+        super().__init__()
+        self.verified_games = 0 # stamps compared
+        self.changed_stamps = 0 # games re-fetched
+        self.corrected_games = 0 # games whose rows differed, rewritten
+        self.added_games = 0 # games missing locally, added
+        self.skipped_games = 0 # games differing in a compacted season
+
+    def summary(self, limiter=None):
+        share = f" ({self.changed_stamps / self.verified_games:.1%})" if self.verified_games else ""
+        return "\n".join([
+            f"Games verified: {self.verified_games}, re-fetched: {self.changed_stamps}{share}, "
+            f"corrected: {self.corrected_games}, added: {self.added_games}, skipped (compacted): {self.skipped_games}",
+            super().summary(limiter),
+        ])
+
+
+def fingerprint_params(window, cursor, limit=CARGO_MAX_LIMIT):
+    """A page of the stamps of the games dated within `window`, oldest first: GameIds and row `_ID`s only."""
+    first, last = window
+    where = ["PB.UniqueLine IS NOT NULL"]
+    if first:
+        where.append(f"SG.DateTime_UTC >= {quote_literal(first)}")
+    if last:
+        where.append(f"SG.DateTime_UTC <= {quote_literal(last)}")
+    params = {
+        'tables': "ScoreboardGames=SG, PicksAndBansS7=PB", 'join_on': "SG.GameId=PB.GameId",
+        'fields': f"SG.GameId=GameId, SG.DateTime_UTC=DateTime_UTC, {STAMP_FIELDS}", 'where': " AND ".join(where),
+    }
+    params = keyset_params(params, limit, FORWARD, cursor, table_alias='SG.')
+    params['order_by'] += ", PB.UniqueLine ASC"
+    return params
+
+
+def full_rows_queries(mode, game_ids):
+    """Joined queries for the full rows (and stamps) of `game_ids`."""
+    base = {'tables': "ScoreboardGames=SG, PicksAndBansS7=PB", 'join_on': "SG.GameId=PB.GameId", 'fields': mode.fields}
+    return in_queries(base, "SG.GameId", sorted(game_ids), max_values=FULL_ROWS_CHUNK)
+
+
+def stored_rows(session, game_ids):
+    """
+    {GameId: (schema, ScoreboardGames tuple, {UniqueLine: PicksAndBansS7 tuple})} of the stored
+    games among `game_ids`, in the mappers' column order, from whichever partitions hold them.
+    """
+    sg_table, pb_table = ScoreboardGame.__table__, PicksAndBansS7Model.__table__
+    sg_select = select(*(sg_table.c[name] for name in SG_ROW_MAPPER.columns))
+    pb_select = select(*(pb_table.c[name] for name in PB_ROW_MAPPER.columns))
+    found = {}
+    missing = set(game_ids)
+    for schema, candidates in season_router.for_games(session, list(missing)):
+        wanted = missing if candidates is None else missing & candidates
+        if wanted:
+            connection = session.connection()
+            options = in_partition(schema)
+            for row in connection.execute(sg_select.where(sg_table.c.GameId.in_(wanted)), execution_options=options):
+                found[row[_SG_KEY]] = (schema, tuple(row), {})
+            for row in connection.execute(pb_select.where(pb_table.c.GameId.in_(wanted)), execution_options=options):
+                if row[_PB_GAME] in found:
+                    found[row[_PB_GAME]][2][row[_PB_KEY]] = tuple(row)
+            missing -= found.keys()
+        if not missing:
+            break
+    return found
+
+
+def changed_columns(stored, fetched):
+    """Names of the columns whose value differs between a stored and a fetched game."""
+    (_, sg_stored, pb_stored), (sg_fetched, pb_fetched) = stored, fetched
+    columns = {name for name, a, b in zip(SG_ROW_MAPPER.columns, sg_stored, sg_fetched) if a != b}
+    for line in pb_stored.keys() | pb_fetched.keys():
+        a, b = pb_stored.get(line), pb_fetched.get(line)
+        if a is None or b is None:
+            columns.add('PicksAndBansS7')
+        else:
+            columns.update(f"PB.{name}" for name, x, y in zip(PB_ROW_MAPPER.columns, a, b) if x != y)
+    return sorted(columns)
+
+
+def rewrite_games(session, stats, schema, sg_api_rows, pb_api_rows):
+    """
+    Overwrites stored games with their fetched rows (upserted by key, PicksAndBansS7 lines gone
+    from the wiki deleted) and rebuilds what is derived from them: the games are taken out of
+    the rollups and search index from their old rows, and counted again from the new ones.
+    Errors propagate, so the caller rolls the page back with the games' DraftActions still in it.
+    """
+    game_ids = [row['GameId'] for row in sg_api_rows]
+    remove_from_rollups(session, game_ids, schema)
+    remove_from_search_index(session, game_ids, schema)
+    connection = session.connection()
+    options = in_partition(schema)
+    connection.execute(delete(DraftAction.__table__).where(DraftAction.__table__.c.GameId.in_(game_ids)), execution_options=options)
+    pb_rows = PB_ROW_MAPPER.map_rows(pb_api_rows)
+    pb_table = PicksAndBansS7Model.__table__
+    connection.execute(delete(pb_table).where(pb_table.c.GameId.in_(game_ids), pb_table.c.UniqueLine.not_in([row[_PB_KEY] for row in pb_rows])),
+                       execution_options=options)
+    stats.incr('sg_rows', SG_ROW_MAPPER.upsert(session, SG_ROW_MAPPER.map_rows(sg_api_rows), schema))
+    if pb_rows:
+        stats.incr('pb_rows', PB_ROW_MAPPER.upsert(session, pb_rows, schema))
+    stats.incr('draft_actions', insert_draft_actions_batch(session, sg_api_rows, pb_api_rows, schema))
+    update_rollups(session, game_ids, schema)
+    update_search_index(session, game_ids, schema)
+    write_game_documents(session, game_ids, schema)
+
+
+def apply_corrections(session, stats, sg_api_data, pb_api_data, dry_run=False):
+    """
+    Compares fetched games with their stored rows: games that differ are rewritten (see
+    rewrite_games), games not stored yet are added like the collector does, and games in a
+    compacted season are left alone. Doesn't commit. Returns the GameIds not written, for
+    their stamps to stay stale.
+    """
+    fetched = {row[_SG_KEY]: (row, {}) for row in SG_ROW_MAPPER.map_rows(sg_api_data)}
+    for row in PB_ROW_MAPPER.map_rows(pb_api_data):
+        if row[_PB_GAME] in fetched:
+            fetched[row[_PB_GAME]][1][row[_PB_KEY]] = row
+    stored = stored_rows(session, fetched)
+    partitions = {schema_name(p.Season): p for p in season_router.catalog(session)} if season_router.enabled else {}
+
+    changed, skipped = defaultdict(list), set()
+    for game_id, game in stored.items():
+        columns = changed_columns(game, fetched[game_id])
+        if not columns:
+            continue
+        schema = game[0]
+        if schema is not None and partitions[schema].Immutable:
+            print(f"{game_id} differs ({', '.join(columns)}) but season {partitions[schema].Season} is compacted; reopen it to correct the game.")
+            skipped.add(game_id)
+            continue
+        print(f"{'Would correct' if dry_run else 'Correcting'} {game_id}: {', '.join(columns)}")
+        changed[schema].append(game_id)
+    if not dry_run:
+        for schema in [schema for schema in changed if schema is not None]:
+            season = partitions[schema].Season
+            try:
+                # The catalog may predate a compaction: writable() reads the flag again, under the write lock
+                season_router.writable(session, season)
+            except RuntimeError:
+                print(f"Season {season} was compacted meanwhile; its games are left for the next run.")
+                skipped.update(changed.pop(schema))
+    added = fetched.keys() - stored.keys()
+    stats.incr('corrected_games', sum(map(len, changed.values())))
+    stats.incr('added_games', len(added))
+    stats.incr('skipped_games', len(skipped))
+    if dry_run:
+        return skipped
+
+    rows_of = lambda rows, game_ids: [row for row in rows if row.get('GameId') in game_ids]
+    for schema, game_ids in changed.items():
+        game_ids = set(game_ids)
+        rewrite_games(session, stats, schema, rows_of(sg_api_data, game_ids), rows_of(pb_api_data, game_ids))
+        if schema is not None:
+            dates = [row.get(SG_DATETIME_API_KEY) for row in rows_of(sg_api_data, game_ids)]
+            season_router.record_games(session, partitions[schema].Season, dates, 0)
+    if added:
+        store_batch(session, stats, rows_of(sg_api_data, added), rows_of(pb_api_data, added))
+    return skipped
+
+
+def verify_data(first=None, last=None, concurrency=DEFAULT_CONCURRENCY, dry_run=False, cargo_client=None, limiter=None,
+                metrics_file=None):
+    """
+    Verifies the stored games dated between `first` and `last` (DateTime_UTC bounds, either may
+    be None) against the wiki. Only the games' stamps are fetched, a page of CARGO_MAX_LIMIT
+    per call; games whose stamp differs from the stored one are fetched in full and corrected
+    if their rows changed. Games never stamped (collected before stamps were) are fetched once.
+    With `dry_run`, differences are reported but nothing is written. Returns the run's
+    VerificationStats.
+    """
+    if cargo_client is None:
+        cargo_client = live_cargo_client()
+    limiter = limiter or AdaptiveTokenBucket()
+    stats = VerificationStats()
+    mode = JoinedFetch()
+    init_db() # Creates GameFingerprints on databases set up before it existed.
+    print(f"Verifying games from {first or 'the first'} to {last or 'the last'}{' (dry run)' if dry_run else ''}.")
+
+    cursor = None
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        fetch = partial(cargo_query, cargo_client, limiter, stats)
+        while True:
+            try:
+                page = fetch(fingerprint_params((first, last), cursor))
+            except Exception as e:
+                print(f"API error fetching stamps: {e}. Stopping.")
+                break
+            reached_end = len(page) < CARGO_MAX_LIMIT
+            page = trim_joined_page(page, CARGO_MAX_LIMIT)
+            page_cursor = cursor_after(page)
+            if page_cursor is None:
+                break
+
+            stamps = game_stamps(page)
+            session = get_session()
+            try:
+                stored = stored_stamps(session, stamps)
+                candidates = [game_id for game_id, stamp in stamps.items() if stored.get(game_id) != stamp]
+                stats.incr('verified_games', len(stamps))
+                stats.incr('changed_stamps', len(candidates))
+                print(f"Up to {page_cursor[0]}: {len(candidates)} of {len(stamps)} games with a new stamp.")
+                if candidates:
+                    rows = gather_rows([pool.submit(fetch, params) for params in full_rows_queries(mode, candidates)])
+                    sg_api_data, pb_api_data = mode.batch_rows(pool, fetch, stats, rows)
+                    stale = apply_corrections(session, stats, sg_api_data, pb_api_data, dry_run)
+                    if not dry_run:
+                        # The stamps of the rows just compared, which may be newer than the page's
+                        save_stamps(session, {game_id: stamp for game_id, stamp in game_stamps(rows).items() if game_id not in stale})
+                        session.commit()
+                        game_cache.invalidate(game_cache_key(game_id, format) for game_id in candidates for format in GAME_FORMATS)
+            except Exception as e:
+                print(f"Error verifying games up to {page_cursor}: {e}. Rollback; stopping.")
+                session.rollback()
+                break
+            finally:
+                session.close()
+            if reached_end:
+                break
+            cursor = page_cursor
+
+    print(stats.summary(limiter))
+    if metrics_file:
+        stats.export_metrics(metrics_file, limiter)
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-fetch and correct the stored games edited on the wiki since they were collected.")
+    parser.add_argument("--from", dest="first", help="First game date to verify (DateTime_UTC, e.g. 2025-01-01). Default: the first.")
+    parser.add_argument("--to", dest="last", help="Last game date to verify; a bare date includes the whole day. Default: the last.")
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Report the games whose rows changed without writing anything."
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+        help=f"Max Cargo API calls in flight at once. Default: {DEFAULT_CONCURRENCY}."
+    )
+    parser.add_argument("--metrics-file", help="Write the run's metrics to this Prometheus text file.")
+    add_cargo_source_arguments(parser)
+    args = parser.parse_args()
+    cargo_client = cargo_client_from_args(args)
+    last = args.last + ' 23:59:59' if args.last and len(args.last) == 10 else args.last
+    try:
+        verify_data(args.first, last, concurrency=max(1, args.concurrency), dry_run=args.dry_run,
+                    cargo_client=cargo_client, metrics_file=args.metrics_file)
+    finally:
+        if args.record:
+            cargo_client.save()
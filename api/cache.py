@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+GAME_CACHE_SIZE = int(os.environ.get('GAME_CACHE_SIZE', 1024))
+GAME_CACHE_TTL = float(os.environ.get('GAME_CACHE_TTL', 300))
+# e.g. redis://cache:6379/0 to share cached responses between API workers
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+
+
+class LRUCache:
+    """Thread-safe in-process cache bounded by entry count, with a TTL per entry."""
+
+    def __init__(self, maxsize=GAME_CACHE_SIZE, ttl=GAME_CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict() # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DictBackend:
+    """Stand-in for a shared backend, keeping bytes in a local dict (tests, single-process setups)."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ttl):
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+class RedisBackend:
+    """Shared backend on Redis, so every API worker (and the collector's invalidations) see the same entries."""
+
+    def __init__(self, url):
+        import redis # Optional dependency, only needed when CACHE_REDIS_URL is set
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, ex=max(1, int(ttl)))
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*keys)
+
+
+class ResponseCache:
+    """
+    Serialized responses keyed by string: an in-process LRU in front of an optional shared backend.
+
+    Values are (etag, body) pairs. A shared backend failure is logged and treated as a miss,
+    so the cache can never take the API down.
+    """
+
+    def __init__(self, local=None, shared=None):
+        self.local = local if local is not None else LRUCache()
+        self.shared = shared
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+        try:
+            raw = self.shared.get(key)
+        except Exception as e:
+            print(f"Shared cache error on get({key}): {e}")
+            return None
+        if raw is None:
+            return None
+        etag, _, body = raw.partition(b'\n')
+        value = (etag.decode(), body)
+        self.local.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        if self.shared is not None:
+            etag, body = value
+            try:
+                self.shared.set(key, etag.encode() + b'\n' + body, self.local.ttl)
+            except Exception as e:
+                print(f"Shared cache error on set({key}): {e}")
+
+    def invalidate(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        self.local.delete(*keys)
+        if self.shared is not None:
+            try:
+                self.shared.delete(*keys)
+            except Exception as e:
+                print(f"Shared cache error on invalidate: {e}")
+
+
+def game_cache_key(game_id, format='json'):
+    return f"game:{format}:{game_id}"
+
+
+# Cache of GET /games/<game_id> responses. The collector invalidates it for the games it
+# commits; without a shared backend, other processes only see changes once the TTL expires.
+game_cache = ResponseCache(LRUCache(), RedisBackend(CACHE_REDIS_URL) if CACHE_REDIS_URL else None)
@@ -0,0 +1,77 @@
+"""
+Record/replay of Cargo queries, so the collector can run offline and reproducibly.
+
+A fixture is a gzip-compressed JSON Lines file with one {"params", "response"} entry per
+distinct query. RecordingCargoClient wraps a live `site.cargo_client` and saves what it
+returns; ReplayCargoClient answers the same queries from the file, without network.
+"""
+import gzip
+import json
+import os
+import threading
+
+
+class FixtureMissError(KeyError):
+    """A replayed query that isn't in the fixture."""
+
+
+def fixture_key(params):
+    """Canonical form of a query's parameters; None values are dropped like CargoClient does."""
+    return json.dumps({name: value for name, value in params.items() if value is not None}, sort_keys=True)
+
+
+def load_fixture(path):
+    """{fixture_key: response rows} of a fixture file."""
+    responses = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                responses[fixture_key(entry['params'])] = entry['response']
+    return responses
+
+
+def save_fixture(path, entries):
+    """Writes (params, response) pairs, through a temporary file so a fixture is never left half-written."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with gzip.open(f'{path}.tmp', 'wt', encoding='utf-8') as f:
+        for params, response in entries:
+            f.write(json.dumps({'params': params, 'response': response}) + '\n')
+    os.replace(f'{path}.tmp', path)
+
+
+class RecordingCargoClient:
+    """Passes queries to `client` and keeps their responses; call save() to write the fixture."""
+
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def query(self, **params):
+        response = self.client.query(**params)
+        with self._lock:
+            self._entries[fixture_key(params)] = (params, response)
+        return response
+
+    def save(self):
+        with self._lock:
+            entries = list(self._entries.values())
+        save_fixture(self.path, entries)
+        print(f"Recorded {len(entries)} Cargo responses to {self.path}.")
+        return len(entries)
+
+
+class ReplayCargoClient:
+    """Answers queries from a fixture; raises FixtureMissError for queries it wasn't recorded with."""
+
+    def __init__(self, path):
+        self.path = path
+        self.responses = load_fixture(path)
+
+    def query(self, **params):
+        key = fixture_key(params)
+        if key not in self.responses:
+            raise FixtureMissError(f"Query not in fixture {self.path}: {key}")
+        return self.responses[key]
@@ -0,0 +1,174 @@
+"""
+A local stand-in for the Leaguepedia Cargo API, for benchmarking and testing the collector.
+
+Queries are answered by a source: SqliteCargo runs them against a SQLite database holding
+ScoreboardGames / PicksAndBansS7 tables (e.g. one written by synthetic.write_database), and
+cargo_replay.ReplayCargoClient serves a recorded fixture. CargoStandIn adds latency and
+throttling errors on top, in process or over HTTP through serve_http().
+"""
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from mwcleric.clients.cargo_client import CargoClient
+from mwclient import Site
+from mwclient.errors import APIError
+
+# Cargo caps a single query at 500 rows, whatever limit is asked for
+MAX_LIMIT = 500
+# The APIError code the wiki answers with when a client goes too fast
+THROTTLE_CODE = 'ratelimited'
+THROTTLE_INFO = "You've exceeded your rate limit. Please wait some time and try again."
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_ROW_ID = re.compile(r'\b_ID\b')
+
+
+def _field_name(alias):
+    # Cargo returns fields with spaces in place of underscores
+    return alias.replace('_', ' ')
+
+
+class SqliteCargo:
+    """Translates Cargo query parameters to SQL over a read-only SQLite database, Cargo's response shape included."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        return connection
+
+    @staticmethod
+    def _from_clause(tables, join_on):
+        aliases = []
+        for table in tables.split(','):
+            name, _, alias = table.strip().partition('=')
+            if not _IDENTIFIER.match(name) or (alias and not _IDENTIFIER.match(alias)):
+                raise ValueError(f"Invalid table '{table.strip()}'")
+            aliases.append(f'"{name}" AS {alias}' if alias else f'"{name}"')
+        conditions = [condition.strip() for condition in (join_on or '').split(',') if condition.strip()]
+        if len(conditions) != len(aliases) - 1:
+            raise ValueError("join_on needs one condition per joined table")
+        clause = aliases[0]
+        for table, condition in zip(aliases[1:], conditions):
+            clause += f" LEFT JOIN {table} ON {condition}"
+        return clause
+
+    @staticmethod
+    def _select_clause(fields):
+        columns, names = [], []
+        for field in fields.split(','):
+            source, _, alias = field.strip().partition('=')
+            alias = alias or source.split('.')[-1]
+            # Cargo's `_ID` row ids are SQLite's rowids here: a row written again gets a new one, like a re-saved page's
+            columns.append(f'{_ROW_ID.sub("rowid", source)} AS "{alias}"')
+            names.append(_field_name(alias))
+        return ", ".join(columns), names
+
+    def query(self, *, tables, fields, where=None, join_on=None, group_by=None, order_by=None, limit=None, offset=None, **_):
+        select, names = self._select_clause(fields)
+        sql = f"SELECT {select} FROM {self._from_clause(tables, join_on)}"
+        if where:
+            sql += f" WHERE {where}"
+        if group_by:
+            sql += f" GROUP BY {group_by}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        limit = MAX_LIMIT if limit in (None, 'max') else min(int(limit), MAX_LIMIT)
+        sql += f" LIMIT {limit} OFFSET {int(offset or 0)}"
+        rows = self._connection().execute(sql).fetchall()
+        return [{name: '' if value is None else str(value) for name, value in zip(names, row)} for row in rows]
+
+
+class CargoStandIn:
+    """
+    Serves `source` queries like the live API would: after `latency` seconds (plus up to
+    `jitter`), and failing a `throttle_rate` fraction of calls with a rate-limit error.
+    """
+
+    def __init__(self, source, latency=0.0, jitter=0.0, throttle_rate=0.0, seed=0):
+        self.source = source
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.calls = 0
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def query(self, **params):
+        with self._lock:
+            self.calls += 1
+            throttle = self._random.random() < self.throttle_rate
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            if throttle:
+                self.throttled += 1
+        if delay:
+            time.sleep(delay)
+        if throttle:
+            raise APIError(THROTTLE_CODE, THROTTLE_INFO, {})
+        return self.source.query(**params)
+
+
+def _api_response(standin, params):
+    """(HTTP status, MediaWiki api.php JSON body) for one request."""
+    if params.get('action') != 'cargoquery':
+        return 400, {'error': {'code': 'badvalue', 'info': "Only action=cargoquery is served."}}
+    query = {name: params[name] for name in
+             ('tables', 'fields', 'where', 'join_on', 'group_by', 'order_by', 'limit', 'offset') if params.get(name)}
+    try:
+        rows = standin.query(**query)
+    except APIError as e:
+        return 200, {'error': {'code': e.code, 'info': e.info}}
+    except Exception as e:
+        return 200, {'error': {'code': 'MWException', 'info': str(e)}}
+    limit = MAX_LIMIT if query.get('limit') in (None, 'max') else min(int(query['limit']), MAX_LIMIT)
+    return 200, {'limits': {'cargoquery': limit}, 'cargoquery': [{'title': row} for row in rows]}
+
+
+def serve_http(standin, host='127.0.0.1', port=0):
+    """
+    Starts an api.php endpoint for `standin` on a daemon thread and returns the server;
+    its URL is f"http://{host}:{server.server_port}/". Call server.shutdown() to stop it.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def _respond(self, params):
+            status, body = _api_response(standin, params)
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self._respond(dict(parse_qsl(urlsplit(self.path).query)))
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode()
+            self._respond({**dict(parse_qsl(urlsplit(self.path).query)), **dict(parse_qsl(body))})
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def http_cargo_client(url):
+    """A mwcleric CargoClient talking to a stand-in (or any api.php) at `url`, e.g. http://127.0.0.1:8765/."""
+    parts = urlsplit(url)
+    site = Site(parts.netloc, path=parts.path or '/', scheme=parts.scheme or 'http', do_init=False, max_retries=0)
+    return CargoClient(site)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, Text
+from .models_base import Base
+
+class CollectionCheckpoint(Base):
+    __tablename__ = "CollectionCheckpoints"
+
+    # "forward" walks towards newer games, "backward" backfills older ones.
+    Direction = Column(String, primary_key=True)
+    # Keyset cursor: the (DateTime_UTC, GameId) of the last ScoreboardGames reference committed.
+    DateTime_UTC = Column(Text)
+    GameId = Column(String)
+    UpdatedAt = Column(Text) # ISO8601, UTC
+
+    def __repr__(self):
+        return f"<CollectionCheckpoint(Direction='{self.Direction}', DateTime_UTC='{self.DateTime_UTC}', GameId='{self.GameId}')>"
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, Index
+from .models_base import Base
+
+class DraftAction(Base):
+    """
+    One pick or ban of a game, normalized out of the comma-separated ScoreboardGames
+    columns and the wide PicksAndBansS7 columns so drafts can be queried by index.
+    """
+    __tablename__ = "DraftActions"
+    __table_args__ = (
+        Index('ix_DraftActions_Champion_Patch', 'Champion', 'Patch', 'ActionType'),
+        Index('ix_DraftActions_Team_Patch', 'Team', 'Patch'),
+        Index('ix_DraftActions_Patch_Champion', 'Patch', 'Champion'),
+        Index('ix_DraftActions_Tournament_Champion', 'Tournament', 'Champion'),
+    )
+
+    GameId = Column(String, ForeignKey("ScoreboardGames.GameId"), primary_key=True)
+    Side = Column(Integer, primary_key=True) # 1 for Team1 (blue), 2 for Team2 (red)
+    ActionType = Column(String, primary_key=True) # "pick" or "ban"
+    Slot = Column(Integer, primary_key=True) # 1-5, e.g. Team1Pick3 is slot 3 of side 1's picks
+    DraftOrder = Column(Integer) # 1-20 position in the tournament draft, NULL without PicksAndBansS7 data
+    Phase = Column(Integer) # 1: ban phase 1, 2: pick phase 1, 3: ban phase 2, 4: pick phase 2; NULL if unknown
+    Champion = Column(String)
+    Role = Column(String) # picks only
+    Player = Column(String) # picks only, when the champion can be matched to the roster
+
+    # Denormalized from ScoreboardGames so filters don't need a join
+    Team = Column(String)
+    Tournament = Column(Text)
+    Patch = Column(Text)
+    DateTime_UTC = Column(Text)
+    Won = Column(Boolean) # whether this action's side won the game
+
+    def __repr__(self):
+        return f"<DraftAction(GameId='{self.GameId}', Side={self.Side}, ActionType='{self.ActionType}', Slot={self.Slot}, Champion='{self.Champion}')>"
@@ -0,0 +1,90 @@
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .draft_action_model import DraftAction
+from .partitions import in_partition
+
+PICK = 'pick'
+BAN = 'ban'
+
+# Role order of the comma-separated ScoreboardGames picks and players
+ROLES = ('Top', 'Jungle', 'Mid', 'Bot', 'Support')
+
+# Tournament draft order: (PicksAndBansS7 column, side, action type, slot, phase)
+DRAFT_SEQUENCE = tuple(
+    (f"Team{side}{action.capitalize()}{slot}", side, action, slot, phase)
+    for phase, steps in (
+        (1, ((1, BAN, 1), (2, BAN, 1), (1, BAN, 2), (2, BAN, 2), (1, BAN, 3), (2, BAN, 3))),
+        (2, ((1, PICK, 1), (2, PICK, 1), (2, PICK, 2), (1, PICK, 2), (1, PICK, 3), (2, PICK, 3))),
+        (3, ((2, BAN, 4), (1, BAN, 4), (2, BAN, 5), (1, BAN, 5))),
+        (4, ((2, PICK, 4), (1, PICK, 4), (1, PICK, 5), (2, PICK, 5))),
+    )
+    for side, action, slot in steps
+)
+
+
+def split_comma_separated(cs_string):
+    if not cs_string:
+        return []
+    return [item.strip() for item in cs_string.split(',')]
+
+
+def build_draft_actions(sg_row, pb_row=None):
+    """
+    Returns the DraftActions rows (as dicts) of one game.
+
+    `sg_row` and `pb_row` are ScoreboardGames / PicksAndBansS7 values keyed by column name.
+    PicksAndBansS7 gives the draft order and pick roles; without it the actions come
+    from the ScoreboardGames lists, whose picks are in role order.
+    """
+    game_id = sg_row.get('GameId')
+    if not game_id:
+        return []
+
+    rosters = {}
+    for side in (1, 2):
+        picks = split_comma_separated(sg_row.get(f'Team{side}Picks'))
+        players = split_comma_separated(sg_row.get(f'Team{side}Players'))
+        rosters[side] = {champion: (ROLES[i] if i < len(ROLES) else None, players[i] if i < len(players) else None)
+                         for i, champion in enumerate(picks)}
+
+    def action(side, action_type, slot, champion, draft_order=None, phase=None, role=None):
+        player = None
+        if action_type == PICK:
+            roster_role, player = rosters[side].get(champion, (None, None))
+            role = role or roster_role
+        return {
+            'GameId': game_id, 'Side': side, 'ActionType': action_type, 'Slot': slot,
+            'DraftOrder': draft_order, 'Phase': phase, 'Champion': champion, 'Role': role, 'Player': player,
+            'Team': sg_row.get(f'Team{side}') or (pb_row or {}).get(f'Team{side}'),
+            'Tournament': sg_row.get('Tournament'), 'Patch': sg_row.get('Patch'),
+            'DateTime_UTC': sg_row.get('DateTime_UTC'),
+            'Won': None if sg_row.get('Winner') in (None, '') else int(sg_row['Winner']) == side,
+        }
+
+    actions = []
+    if pb_row:
+        for draft_order, (column, side, action_type, slot, phase) in enumerate(DRAFT_SEQUENCE, start=1):
+            champion = pb_row.get(column)
+            if not champion:
+                continue
+            role = pb_row.get(f'Team{side}Role{slot}') if action_type == PICK else None
+            actions.append(action(side, action_type, slot, champion, draft_order, phase, role or None))
+        return actions
+
+    for side in (1, 2):
+        for action_type, column in ((BAN, f'Team{side}Bans'), (PICK, f'Team{side}Picks')):
+            for slot, champion in enumerate(split_comma_separated(sg_row.get(column)), start=1):
+                if champion:
+                    actions.append(action(side, action_type, slot, champion))
+    return actions
+
+
+def insert_draft_actions(session, actions, schema=None):
+    """
+    Inserts DraftActions rows, skipping actions already stored, into the main database or the
+    season partition `schema`. Returns the number inserted.
+    """
+    if not actions:
+        return 0
+    stmt = sqlite_insert(DraftAction).on_conflict_do_nothing()
+    return session.connection().execute(stmt, actions, execution_options=in_partition(schema)).rowcount
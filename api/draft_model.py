@@ -0,0 +1,206 @@
+import json
+import os
+
+import numpy as np
+
+from .draft_actions import DRAFT_SEQUENCE, PICK
+
+# Built by `python -m api.bin.build_draft_tables`, memory-mapped by the API
+DRAFT_TABLES_DIR = os.environ.get(
+    'DRAFT_TABLES_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'draft_tables'))
+# Pseudo-games at a 50% win rate added to every count, so rare champions and pairs stay near even
+SMOOTHING = 10
+# Pair terms are summed over up to 10 same-team pairs and 25 opposing pairs; scaled down to keep them secondary
+PAIR_WEIGHT = 0.2
+ALL_PATCHES = 'all'
+# Games whose champion indices build_tables() gathers at a time
+BUILD_CHUNK_GAMES = 10000
+
+_ARRAYS = ('pick_games', 'champion_logit', 'synergy', 'counter')
+
+
+def patch_key(patch):
+    """Sortable key of a patch string such as '25.13', or None if it isn't one."""
+    try:
+        return tuple(int(part) for part in str(patch).split('.'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _logit(wins, games):
+    rate = (wins + 0.5 * SMOOTHING) / (games + SMOOTHING)
+    return np.log(rate / (1 - rate)).astype(np.float32)
+
+
+def _chunk_indices(games, index):
+    """
+    The champion indices of a chunk of games, each with whether it counts as a win:
+    (champion, won) picks, (row, column, won) same-team pairs and (champion, opponent, won) matchups.
+    """
+    picks, pairs, versus = ([], []), ([], [], []), ([], [], [])
+    for blue_picks, red_picks, winner in games:
+        blue = np.unique([index[name] for name in blue_picks if name in index]).astype(np.intp)
+        red = np.unique([index[name] for name in red_picks if name in index]).astype(np.intp)
+        for own, opponents, won in ((blue, red, winner == 1), (red, blue, winner != 1)):
+            picks[0].append(own)
+            picks[1].append(np.full(len(own), won))
+            pairs[0].append(np.repeat(own, len(own)))
+            pairs[1].append(np.tile(own, len(own)))
+            pairs[2].append(np.full(len(own) ** 2, won))
+            versus[0].append(np.repeat(own, len(opponents)))
+            versus[1].append(np.tile(opponents, len(own)))
+            versus[2].append(np.full(len(own) * len(opponents), won))
+    return tuple(tuple(np.concatenate(part) for part in parts) for parts in (picks, pairs, versus))
+
+
+def build_tables(games, champions):
+    """
+    Computes the model arrays from (blue picks, red picks, winner) games, winner being 1 or 2.
+
+    Returns a dict of arrays indexed by `champions` positions:
+    - pick_games (C,): games each champion was picked in
+    - champion_logit (C,): log-odds of winning when picked
+    - synergy (C, C): extra log-odds of picking both champions on one team
+    - counter (C, C): extra log-odds of row champion facing column champion
+    """
+    index = {name: i for i, name in enumerate(champions)}
+    count = len(champions)
+    pick_games, pick_wins = np.zeros(count), np.zeros(count)
+    pair_games, pair_wins = np.zeros((count, count)), np.zeros((count, count))
+    versus_games, versus_wins = np.zeros((count, count)), np.zeros((count, count))
+    # Counts are accumulated from each chunk's champion indices rather than (games, C) matrices
+    for start in range(0, len(games), BUILD_CHUNK_GAMES):
+        picks, pairs, versus = _chunk_indices(games[start:start + BUILD_CHUNK_GAMES], index)
+        np.add.at(pick_games, picks[0], 1)
+        np.add.at(pick_wins, picks[0], picks[1])
+        np.add.at(pair_games, pairs[:2], 1)
+        np.add.at(pair_wins, pairs[:2], pairs[2])
+        np.add.at(versus_games, versus[:2], 1)
+        np.add.at(versus_wins, versus[:2], versus[2])
+
+    champion_logit = _logit(pick_wins, pick_games)
+    synergy = _logit(pair_wins, pair_games) - champion_logit[:, None] - champion_logit[None, :]
+    np.fill_diagonal(synergy, 0)
+    counter = _logit(versus_wins, versus_games) - (champion_logit[:, None] - champion_logit[None, :])
+    return {
+        'pick_games': pick_games.astype(np.int32),
+        'champion_logit': champion_logit,
+        'synergy': synergy.astype(np.float32),
+        'counter': counter.astype(np.float32),
+    }
+
+
+def save_tables(directory, name, tables, champions, patches, game_count):
+    """Writes one patch range's arrays as .npy files (memory-mappable) plus a meta.json."""
+    path = os.path.join(directory, name)
+    os.makedirs(path, exist_ok=True)
+    for array_name in _ARRAYS:
+        np.save(os.path.join(path, f'{array_name}.npy'), tables[array_name])
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'champions': champions, 'patches': patches, 'games': game_count}, f)
+
+
+def _sigmoid(logit):
+    return 1 / (1 + np.exp(-logit))
+
+
+class DraftTables:
+    """One patch range's model arrays, memory-mapped read-only."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.name = os.path.basename(path)
+        self.champions = meta['champions']
+        self.patches = meta['patches'] # [first, last] patch, or None for every patch
+        self.games = meta['games']
+        self.index = {name: i for i, name in enumerate(self.champions)}
+        for array_name in _ARRAYS:
+            setattr(self, array_name, np.load(os.path.join(path, f'{array_name}.npy'), mmap_mode='r'))
+
+    def covers(self, patch):
+        if self.patches is None:
+            return True
+        key = patch_key(patch)
+        return key is not None and patch_key(self.patches[0]) <= key <= patch_key(self.patches[1])
+
+    def _indices(self, names):
+        return [self.index[name] for name in names if name in self.index]
+
+    def _side_logit(self, own, opponents):
+        """Log-odds contribution of one side's picks (champion indices) against the other's."""
+        own = np.asarray(own, dtype=np.intp)
+        opponents = np.asarray(opponents, dtype=np.intp)
+        logit = float(self.champion_logit[own].sum())
+        logit += PAIR_WEIGHT * float(np.triu(self.synergy[np.ix_(own, own)], 1).sum())
+        logit += PAIR_WEIGHT * float(self.counter[np.ix_(own, opponents)].sum())
+        return logit
+
+    def predict(self, draft, top=10):
+        """
+        Blue side's win probability for a partial `draft` ({PicksAndBansS7 column: champion}),
+        and the best champions for the next action of DRAFT_SEQUENCE.
+        """
+        picks = {side: [draft[column] for column, column_side, action, _, _ in DRAFT_SEQUENCE
+                        if column_side == side and action == PICK and draft.get(column)] for side in (1, 2)}
+        taken = {champion for champion in draft.values() if champion}
+        blue, red = self._indices(picks[1]), self._indices(picks[2])
+        # The counter terms are antisymmetric, so blue's counters already account for red's
+        blue_logit = self._side_logit(blue, red) - self._side_logit(red, [])
+
+        result = {
+            "patches": self.name,
+            "blue_win_probability": round(float(_sigmoid(blue_logit)), 4),
+            "next": None,
+            "candidates": [],
+        }
+        next_step = next((step for step in DRAFT_SEQUENCE if not draft.get(step[0])), None)
+        if next_step is None:
+            return result
+        column, side, action, _, _ = next_step
+        result["next"] = {"column": column, "side": "blue" if side == 1 else "red", "action": action}
+
+        # Score every champion as the next pick of `picker`: a pick for the side to play,
+        # or, for a ban, the opponent's pick the ban would deny.
+        picker = side if action == PICK else 3 - side
+        own, opponents = (blue, red) if picker == 1 else (red, blue)
+        own_logit = blue_logit if picker == 1 else -blue_logit
+        delta = np.array(self.champion_logit, dtype=np.float32)
+        if own:
+            delta += PAIR_WEIGHT * self.synergy[:, own].sum(axis=1)
+        if opponents:
+            delta += PAIR_WEIGHT * self.counter[:, opponents].sum(axis=1)
+        probability = _sigmoid(own_logit + delta)
+        available = np.ones(len(self.champions), dtype=bool)
+        available[self._indices(taken)] = False
+        available &= np.asarray(self.pick_games) > 0
+        order = np.argsort(-np.where(available, probability, -1), kind='stable')[:min(top, int(available.sum()))]
+        result["candidates"] = [{
+            "champion": self.champions[i],
+            # For a pick: the picking side's win probability after it. For a ban: the
+            # opponent's if they got the champion, i.e. what banning it denies.
+            "win_probability": round(float(probability[i]), 4),
+            "games": int(self.pick_games[i]),
+        } for i in order]
+        return result
+
+
+class DraftModel:
+    """Every patch range's DraftTables; picks the narrowest range covering a patch."""
+
+    def __init__(self, tables):
+        # Narrowest ranges first, the all-patches table last
+        self.tables = sorted(tables, key=lambda t: (t.patches is None, t.games))
+
+    @classmethod
+    def load(cls, directory=DRAFT_TABLES_DIR):
+        if not os.path.isdir(directory):
+            return cls([])
+        return cls([DraftTables(os.path.join(directory, name)) for name in sorted(os.listdir(directory))
+                    if os.path.isfile(os.path.join(directory, name, 'meta.json'))])
+
+    def tables_for(self, patch=None):
+        for tables in self.tables:
+            if tables.patches is None or (patch is not None and tables.covers(patch)):
+                return tables
+        return None
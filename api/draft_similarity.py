@@ -0,0 +1,186 @@
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import column, select, table
+
+from .draft_actions import split_comma_separated
+from .partitions import in_partition
+
+# Seconds between checks for newly collected games
+REFRESH_INTERVAL = 60
+PICKS_WEIGHT = 0.75
+BANS_WEIGHT = 0.25
+
+_GAMES = table('ScoreboardGames', column('rowid'), column('GameId'),
+               column('Team1Picks'), column('Team2Picks'), column('Team1Bans'), column('Team2Bans'))
+
+
+class DraftIndex:
+    """
+    In-memory index of every game's draft for similarity search.
+
+    Each game's picks (both sides) and bans are champion bitsets packed into uint64
+    words, stored word-major (one contiguous array per 64 champions) so a query scans
+    each word sequentially. Similarity is a vectorized weighted Jaccard over all games:
+    popcount(game & query) / (|game| + |query| - popcount(game & query)).
+
+    Games are appended incrementally by ScoreboardGames rowid, so a refresh only reads
+    the rows collected since the previous one; with season partitions, each partition
+    has its own rowid watermark.
+    """
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL, clock=time.monotonic):
+        self.refresh_interval = refresh_interval
+        self.champions = {} # name -> bit
+        self.game_ids = []
+        self._positions = {} # GameId -> row
+        self.watermarks = {} # schema (None: main) -> highest ScoreboardGames rowid indexed
+        self._clock = clock
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self._words = 1
+        self._size = 0
+        self._picks = np.zeros((1, 0), dtype=np.uint64) # (words, capacity)
+        self._bans = np.zeros((1, 0), dtype=np.uint64)
+        self._pick_counts = np.zeros(0, dtype=np.int16)
+        self._ban_counts = np.zeros(0, dtype=np.int16)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def watermark(self):
+        """The main database's watermark."""
+        return self.watermarks.get(None, 0)
+
+    def _bits(self, names, add=False):
+        """Champion bits of `names`; unknown champions get a new bit with `add`, else are skipped."""
+        champions = self.champions
+        if add:
+            for name in names:
+                if name and name not in champions:
+                    champions[name] = len(champions)
+        return [champions[name] for name in names if name in champions]
+
+    def _encode(self, bit_lists, words):
+        """Packs lists of bits into a (words, len(bit_lists)) uint64 array."""
+        encoded = np.zeros((len(bit_lists), words * 64), dtype=bool)
+        rows = np.repeat(np.arange(len(bit_lists)), [len(bits) for bits in bit_lists])
+        encoded[rows, [bit for bits in bit_lists for bit in bits]] = True
+        return np.packbits(encoded, axis=1, bitorder='little').view(np.uint64).T
+
+    def _reserve(self, rows, words):
+        """Grows the arrays (doubling rows, padding words for new champions) so `rows` rows fit."""
+        capacity = self._picks.shape[1]
+        if rows <= capacity and words <= self._words:
+            return
+        new_capacity = max(rows, capacity * 2, 1024) if rows > capacity else capacity
+        for name in ('_picks', '_bans'):
+            grown = np.zeros((words, new_capacity), dtype=np.uint64)
+            grown[:self._words, :self._size] = getattr(self, name)[:, :self._size]
+            setattr(self, name, grown)
+        for name in ('_pick_counts', '_ban_counts'):
+            grown = np.zeros(new_capacity, dtype=np.int16)
+            grown[:self._size] = getattr(self, name)[:self._size]
+            setattr(self, name, grown)
+        self._words = words
+
+    def add_games(self, rows, schema=None):
+        """
+        Appends (rowid, GameId, Team1Picks, Team2Picks, Team1Bans, Team2Bans) rows of `schema`, in
+        rowid order. A game already indexed (its row was corrected, and so moved to a new rowid)
+        has its draft replaced in place.
+        """
+        if not rows:
+            return 0
+        picks, bans = [], []
+        for _, _, team1_picks, team2_picks, team1_bans, team2_bans in rows:
+            picks.append(set(self._bits(split_comma_separated(team1_picks) + split_comma_separated(team2_picks), add=True)))
+            bans.append(set(self._bits(split_comma_separated(team1_bans) + split_comma_separated(team2_bans), add=True)))
+        positions = []
+        end = self._size
+        for row in rows:
+            position = self._positions.get(row[1])
+            if position is None:
+                position = self._positions[row[1]] = end
+                self.game_ids.append(row[1])
+                end += 1
+            positions.append(position)
+        words = max(self._words, -(-len(self.champions) // 64))
+        self._reserve(end, words)
+        self._picks[:, positions] = self._encode([list(p) for p in picks], words)
+        self._bans[:, positions] = self._encode([list(b) for b in bans], words)
+        self._pick_counts[positions] = [len(p) for p in picks]
+        self._ban_counts[positions] = [len(b) for b in bans]
+        self._size = end
+        self.watermarks[schema] = rows[-1][0]
+        return len(rows)
+
+    def refresh(self, session, schemas=(None,)):
+        """
+        Indexes the games stored since the last refresh, in the main database or the given
+        season partition schemas. Returns how many were added.
+        """
+        added = 0
+        for schema in schemas:
+            watermark = self.watermarks.get(schema, 0)
+            rows = session.execute(
+                select(_GAMES).where(_GAMES.c.rowid > watermark).order_by(_GAMES.c.rowid),
+                execution_options=in_partition(schema),
+            ).all()
+            with self._lock:
+                # A concurrent refresh may have indexed some of these rows already
+                watermark = self.watermarks.get(schema, 0)
+                added += self.add_games([row for row in rows if row[0] > watermark], schema)
+        with self._lock:
+            self._refreshed_at = self._clock()
+        return added
+
+    def refresh_if_stale(self, session, schemas=(None,)):
+        if self._refreshed_at is None or self._clock() - self._refreshed_at >= self.refresh_interval:
+            return self.refresh(session, schemas)
+        return 0
+
+    def similar(self, picks, bans=(), k=10, exclude=()):
+        """
+        The `k` games whose draft is most similar to `picks` / `bans` (champion names),
+        as (GameId, similarity, picks similarity, bans similarity) tuples, best first.
+        """
+        with self._lock:
+            return self._similar(set(picks), set(bans), k, exclude)
+
+    def _similar(self, picks, bans, k, exclude):
+        size = self._size
+        if size == 0 or k <= 0:
+            return []
+        words = self._words
+        scores = np.zeros(size, dtype=np.float32)
+        components = []
+        for names, matrix, counts, weight in (
+            (picks, self._picks, self._pick_counts, PICKS_WEIGHT),
+            (bans, self._bans, self._ban_counts, BANS_WEIGHT),
+        ):
+            query = self._encode([self._bits(names)], words)[:, 0]
+            inter = np.zeros(size, dtype=np.int16)
+            for word in range(words):
+                if query[word]:
+                    inter += np.bitwise_count(matrix[word, :size] & query[word])
+            # Unknown champions still count in the query's size, so they lower the similarity
+            union = counts[:size] + len(names) - inter
+            jaccard = np.divide(inter, union, out=np.zeros(size, dtype=np.float32), where=union > 0)
+            components.append(jaccard)
+            scores += weight * jaccard
+
+        for game_id in exclude:
+            if game_id in self._positions:
+                scores[self._positions[game_id]] = -1
+        k = min(k, size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.game_ids[i], float(scores[i]), float(components[0][i]), float(components[1][i]))
+                for i in top if scores[i] >= 0]
+
+
+# Shared by the API's request handlers; refreshed from the database at most every REFRESH_INTERVAL seconds.
+draft_index = DraftIndex()
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Text
+from .models_base import Base
+
+class GameFingerprint(Base):
+    """
+    The Cargo row stamp a game's stored rows were fetched at (see fingerprints.py): when the
+    wiki's stamp differs, the game was edited since and is fetched again by api.bin.verify_data.
+    """
+    __tablename__ = "GameFingerprints"
+
+    GameId = Column(String, primary_key=True)
+    Stamp = Column(Text, nullable=False) # '<ScoreboardGames _ID>:<PicksAndBansS7 _IDs, comma-separated>'
+    VerifiedAt = Column(Text) # ISO8601, UTC: when the stored rows were last found to match the wiki
+
+    def __repr__(self):
+        return f"<GameFingerprint(GameId='{self.GameId}', Stamp='{self.Stamp}', VerifiedAt='{self.VerifiedAt}')>"
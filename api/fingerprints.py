@@ -0,0 +1,57 @@
+"""
+Change detection for stored games.
+
+Cargo keeps no modification time or hash per row, but it rewrites every row of a wiki page
+whenever the page is saved, under new `_ID`s. A game's stamp, the `_ID` of its
+ScoreboardGames row plus those of its PicksAndBansS7 rows, therefore changes whenever the
+game may have been corrected. The collector fetches the stamps along with the rows and
+keeps them in GameFingerprints; api.bin.verify_data later fetches only the stamps of a date
+window and re-fetches the games whose stamp moved.
+
+A page save rewrites all of the page's games, edited or not, so a changed stamp only makes a
+game a candidate: its rows are compared with the stored ones before anything is rewritten.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .fingerprint_model import GameFingerprint
+
+# Aliases of the `_ID` fields in joined ScoreboardGames / PicksAndBansS7 queries
+SG_STAMP_FIELD = 'SGRowId'
+PB_STAMP_FIELD = 'PBRowId'
+STAMP_FIELDS = f"SG._ID={SG_STAMP_FIELD}, PB._ID={PB_STAMP_FIELD}"
+
+
+def game_stamps(rows) -> dict[str, str]:
+    """{GameId: stamp} of joined query rows carrying the STAMP_FIELDS; {} for rows without them."""
+    ids = {}
+    for row in rows:
+        game_id, sg_id = row.get('GameId'), row.get(SG_STAMP_FIELD)
+        if game_id and sg_id:
+            sg_ids, pb_ids = ids.setdefault(game_id, (set(), set()))
+            sg_ids.add(sg_id)
+            if row.get(PB_STAMP_FIELD):
+                pb_ids.add(row[PB_STAMP_FIELD])
+    # Sorted numerically so the same rows always give the same stamp, whatever their order
+    key = lambda value: (len(value), value)
+    return {game_id: f"{','.join(sorted(sg_ids, key=key))}:{','.join(sorted(pb_ids, key=key))}"
+            for game_id, (sg_ids, pb_ids) in ids.items()}
+
+
+def stored_stamps(session, game_ids) -> dict[str, str]:
+    game_ids = list(set(game_ids))
+    if not game_ids:
+        return {}
+    return dict(session.query(GameFingerprint.GameId, GameFingerprint.Stamp).filter(GameFingerprint.GameId.in_(game_ids)))
+
+
+def save_stamps(session, stamps):
+    """Records `stamps` ({GameId: stamp}) as verified now, replacing the games' previous ones."""
+    if not stamps:
+        return
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    stmt = sqlite_insert(GameFingerprint)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['GameId'], set_={'Stamp': stmt.excluded.Stamp, 'VerifiedAt': stmt.excluded.VerifiedAt})
+    session.connection().execute(stmt, [{'GameId': game_id, 'Stamp': stamp, 'VerifiedAt': now} for game_id, stamp in stamps.items()])
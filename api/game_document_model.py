@@ -0,0 +1,16 @@
+from sqlalchemy import Column, ForeignKey, LargeBinary, String
+from .models_base import Base
+
+class GameDocument(Base):
+    """
+    The ready-to-serve GET /games/<game_id> body of a game (default fields), in every
+    format the API serves, written by the collector so reads skip the ORM and encoding.
+    """
+    __tablename__ = "GameDocuments"
+
+    GameId = Column(String, ForeignKey("ScoreboardGames.GameId"), primary_key=True)
+    Json = Column(LargeBinary, nullable=False) # compact JSON, keys sorted
+    Msgpack = Column(LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f"<GameDocument(GameId='{self.GameId}', Json={len(self.Json or b'')} bytes, Msgpack={len(self.Msgpack or b'')} bytes)>"
@@ -0,0 +1,152 @@
+"""
+The response shape of a game, and its materialized documents.
+
+A game rarely changes once ingested, so the collector serializes its default GET
+/games/<game_id> body once, in every format in GAME_FORMATS, into GameDocuments. The API
+then serves those bytes as stored; games without a document (collected before the table
+existed, or other field projections) are serialized from ScoreboardGames as before. When
+verify_data corrects a game from an edited wiki page, it writes the game's documents again.
+"""
+import json
+
+import msgpack
+from sqlalchemy import inspect, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload, load_only
+
+from .draft_actions import split_comma_separated
+from .game_document_model import GameDocument
+from .partitions import in_partition
+from .scoreboard_game_model import ScoreboardGame
+from .stats_rollup import SIDES
+
+# Response fields of a game and the ScoreboardGames columns each one reads.
+# `draft` comes from the picks_and_bans relationship, joined into the same query.
+GAME_FIELDS = {
+    "id": ("GameId",),
+    "match": ("MatchId",),
+    "tournament": ("Tournament",),
+    "date": ("DateTime_UTC",),
+    "patch": ("Patch",),
+    "blue": ("Team1", "Team1Players", "Team1Bans", "Team1Picks"),
+    "red": ("Team2", "Team2Players", "Team2Bans", "Team2Picks"),
+    "winner": ("Winner",),
+    "vod": ("VOD",),
+    "draft": (),
+}
+DEFAULT_GAME_FIELDS = ("id", "match", "tournament", "date", "blue", "red", "winner")
+
+# Serving formats: media type, and the GameDocuments column holding the body
+GAME_FORMATS = {
+    'json': ('application/json', 'Json'),
+    'msgpack': ('application/msgpack', 'Msgpack'),
+}
+# Accept header media types -> format; the first one is the default
+ACCEPTED_MEDIA_TYPES = {
+    'application/json': 'json',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+}
+
+
+def game_load_options(fields):
+    """Loads only the columns `fields` need (plus the keyset columns), and the draft eagerly if asked for."""
+    columns = {"GameId", "DateTime_UTC"}.union(*(GAME_FIELDS[field] for field in fields))
+    options = [load_only(*(getattr(ScoreboardGame, column) for column in sorted(columns)))]
+    if "draft" in fields:
+        options.append(joinedload(ScoreboardGame.picks_and_bans))
+    return options
+
+def _serialize_side(game: ScoreboardGame, side: int) -> dict:
+    team_name = getattr(game, f"Team{side}")
+    return {
+        "team": {
+            "name": team_name if team_name else ("Blue Team" if side == 1 else "Red Team"),
+            "logo": "<url_placeholder>",
+            "players": split_comma_separated(getattr(game, f"Team{side}Players")),
+        },
+        "bans": split_comma_separated(getattr(game, f"Team{side}Bans")),
+        "picks": split_comma_separated(getattr(game, f"Team{side}Picks")),
+    }
+
+def _serialize_draft(game: ScoreboardGame) -> dict | None:
+    """Slot-ordered picks, bans and pick roles from PicksAndBansS7, or None if the game has none."""
+    if not game.picks_and_bans:
+        return None
+    pb = min(game.picks_and_bans, key=lambda row: row.UniqueLine)
+    return {
+        side_name: {
+            "bans": [getattr(pb, f"Team{side}Ban{slot}") for slot in range(1, 6)],
+            "picks": [getattr(pb, f"Team{side}Pick{slot}") for slot in range(1, 6)],
+            "roles": [getattr(pb, f"Team{side}Role{slot}") for slot in range(1, 6)],
+        }
+        for side, side_name in SIDES.items()
+    }
+
+def serialize_game(game: ScoreboardGame, fields=DEFAULT_GAME_FIELDS) -> dict:
+    """The JSON shape of a game, shared by the single game and listing endpoints."""
+    # If an error occurs here or in split_comma_separated,
+    # Flask's default error handling will take over (usually resulting in a 500).
+    serializers = {
+        "id": lambda: game.GameId,
+        "match": lambda: game.MatchId,
+        "tournament": lambda: game.Tournament,
+        "date": lambda: game.DateTime_UTC,
+        "patch": lambda: game.Patch,
+        "blue": lambda: _serialize_side(game, 1),
+        "red": lambda: _serialize_side(game, 2),
+        "winner": lambda: "blue" if game.Winner == 1 else "red" if game.Winner == 2 else "unknown",
+        "vod": lambda: game.VOD,
+        "draft": lambda: _serialize_draft(game),
+    }
+    return {field: serializers[field]() for field in fields}
+
+
+def encode_game(data: dict, format='json') -> bytes:
+    """A serialized game in `format`: compact JSON (sorted keys, UTF-8, trailing newline) or msgpack."""
+    if format == 'msgpack':
+        return msgpack.packb(data, use_bin_type=True)
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode() + b"\n"
+
+
+def write_game_documents(session, game_ids, schema=None):
+    """
+    Writes (or rewrites) the GameDocuments of the given games from their stored rows, in the
+    main database or the season partition `schema`. Call it once the games' ScoreboardGames
+    rows are written, in the same transaction. Returns the number of documents written.
+    """
+    game_ids = set(game_ids)
+    if not game_ids:
+        return 0
+    games = session.query(ScoreboardGame).options(*game_load_options(DEFAULT_GAME_FIELDS)) \
+        .filter(ScoreboardGame.GameId.in_(game_ids)).execution_options(**in_partition(schema)).all()
+    rows = []
+    for game in games:
+        data = serialize_game(game)
+        rows.append(dict({'GameId': game.GameId},
+                         **{column: encode_game(data, format) for format, (_, column) in GAME_FORMATS.items()}))
+    if rows:
+        stmt = sqlite_insert(GameDocument)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['GameId'], set_={column: stmt.excluded[column] for _, column in GAME_FORMATS.values()})
+        session.connection().execute(stmt, rows, execution_options=in_partition(schema))
+    return len(rows)
+
+
+# Engines whose database has the GameDocuments table; databases created before it are
+# re-checked on each read, so the table is picked up once init_db() creates it
+_engines_with_documents = set()
+
+
+def read_game_document(session, game_id, format='json', schema=None) -> bytes | None:
+    """The stored body of a game in `format` (from the season partition `schema` if given), or None if it has none."""
+    engine = session.get_bind()
+    # Partitions are created with every per-game table
+    if schema is None and engine not in _engines_with_documents:
+        if not inspect(engine).has_table(GameDocument.__tablename__):
+            return None
+        _engines_with_documents.add(engine)
+    column = GameDocument.__table__.c[GAME_FORMATS[format][1]]
+    # A Core select on the session's connection: a single value needs none of the ORM's execution machinery
+    return session.connection().execute(
+        select(column).where(GameDocument.__table__.c.GameId == game_id), execution_options=in_partition(schema)).scalar()
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Text
+from .models_base import Base
+
+class IngestEvent(Base):
+    """
+    A "game ingested" event, written by the ingest daemon (api.bin.ingest) in the transaction
+    that stored the game, and pushed to GET /games/stream clients (see ingest_events.py).
+    """
+    __tablename__ = "IngestEvents"
+
+    # Increasing, never reused (AUTOINCREMENT): the SSE event id clients resume from
+    Id = Column(Integer, primary_key=True, autoincrement=True)
+    GameId = Column(String, nullable=False)
+    Tournament = Column(Text)
+    DateTime_UTC = Column(Text)
+    CreatedAt = Column(Text, nullable=False, index=True) # ISO8601, UTC
+
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    def __repr__(self):
+        return f"<IngestEvent(Id={self.Id}, GameId='{self.GameId}', CreatedAt='{self.CreatedAt}')>"
@@ -0,0 +1,187 @@
+"""
+"Game ingested" events, from the ingest daemon to GET /games/stream.
+
+The daemon (api.bin.ingest) adds an IngestEvents row for each game it stores, in the
+transaction that stores it, so an event is never published for a game readers can't see
+yet. API processes don't share memory with the daemon (nor with each other under
+Gunicorn), so each one runs an IngestEventFeed: a single thread polls the table for rows
+after the last one it saw and wakes the process's streams, whatever their number.
+
+Event ids are the rows' Ids. A client reconnecting with Last-Event-ID gets the events it
+missed, from the feed's buffer or, further back, from the table, which the daemon prunes
+after EVENT_RETENTION seconds.
+"""
+import json
+import sys
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, insert, select
+
+from .ingest_event_model import IngestEvent
+from .models_base import get_read_only_session
+
+# Seconds between the feed's reads of IngestEvents, bounding the push delay
+POLL_INTERVAL = 1.0
+# Events kept in memory per process for streams that fall behind or reconnect
+BUFFER_SIZE = 1000
+# Events read from the table at once for a stream that fell further behind
+REPLAY_LIMIT = 1000
+# Seconds the daemon keeps events for reconnecting clients
+EVENT_RETENTION = 24 * 3600
+# Seconds between comments sent on idle streams, so proxies don't time them out
+KEEPALIVE_INTERVAL = 15
+# Reconnection delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 3000
+
+
+def _utc(moment) -> str:
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def record_ingest_events(session, games) -> int:
+    """Adds an event for each of `games`, (GameId, Tournament, DateTime_UTC) tuples. Doesn't commit."""
+    created_at = _utc(datetime.now(timezone.utc))
+    rows = [{'GameId': game_id, 'Tournament': tournament, 'DateTime_UTC': date, 'CreatedAt': created_at}
+            for game_id, tournament, date in games]
+    if rows:
+        session.execute(insert(IngestEvent), rows)
+    return len(rows)
+
+
+def prune_ingest_events(session, max_age=EVENT_RETENTION, now=None) -> int:
+    """Deletes the events older than `max_age` seconds. Doesn't commit. Returns the number deleted."""
+    cutoff = _utc((now or datetime.now(timezone.utc)) - timedelta(seconds=max_age))
+    return session.execute(delete(IngestEvent).where(IngestEvent.CreatedAt < cutoff)).rowcount
+
+
+def load_ingest_events(session, after_id, limit=REPLAY_LIMIT) -> list[tuple[int, dict]]:
+    """The (id, data) of up to `limit` events after `after_id`, oldest first."""
+    rows = session.execute(
+        select(IngestEvent.Id, IngestEvent.GameId, IngestEvent.Tournament, IngestEvent.DateTime_UTC)
+        .where(IngestEvent.Id > after_id).order_by(IngestEvent.Id).limit(limit))
+    return [(event_id, {"id": game_id, "tournament": tournament, "date": date})
+            for event_id, game_id, tournament, date in rows]
+
+
+def last_event_id(session) -> int:
+    return session.execute(select(func.coalesce(func.max(IngestEvent.Id), 0))).scalar_one()
+
+
+def sse_message(event_id, data) -> str:
+    """An event in the text/event-stream format; `data` has the shape of a GET /games item's id, tournament and date."""
+    return f"id: {event_id}\nevent: game\ndata: {json.dumps(data, sort_keys=True, separators=(',', ':'))}\n\n"
+
+
+class IngestEventFeed:
+    """
+    One process's view of IngestEvents: a thread reads the new rows every `poll_interval`
+    seconds into a buffer of the latest `buffer_size` events and wakes the streams waiting
+    on it. Started by the first stream, so after Gunicorn forks its workers.
+    """
+
+    def __init__(self, poll_interval=POLL_INTERVAL, buffer_size=BUFFER_SIZE, open_session=get_read_only_session):
+        self.poll_interval = poll_interval
+        self.last_id = None # newest event read, once started
+        self._events = deque(maxlen=buffer_size) # (id, data), oldest first
+        self._floor = None # the buffer holds every event after this id
+        self._open_session = open_session
+        self._condition = threading.Condition()
+        self._listeners = set()
+        self._thread = None
+        self._closed = threading.Event()
+
+    def start(self) -> int:
+        """Starts polling if it isn't yet. Returns the newest event's id (0 without events), where new streams start."""
+        with self._condition:
+            if self._thread is None:
+                session = self._open_session()
+                try:
+                    self.last_id = self._floor = last_event_id(session)
+                finally:
+                    session.close()
+                self._thread = threading.Thread(target=self._run, name='ingest-event-feed', daemon=True)
+                self._thread.start()
+            return self.last_id
+
+    def _run(self):
+        while not self._closed.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Error reading IngestEvents: {e}", file=sys.stderr)
+
+    def close(self):
+        """Stops polling; streams waiting on the feed get no more events."""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def poll(self) -> int:
+        """Reads the events added since the last poll and wakes the streams. Returns how many there were."""
+        added = 0
+        while True:
+            session = self._open_session()
+            try:
+                events = load_ingest_events(session, self.last_id, self._events.maxlen)
+            finally:
+                session.close()
+            if not events:
+                break
+            with self._condition:
+                for event in events:
+                    if len(self._events) == self._events.maxlen:
+                        self._floor = self._events[0][0]
+                    self._events.append(event)
+                self.last_id = events[-1][0]
+                self._condition.notify_all()
+                listeners = list(self._listeners)
+            for listener in listeners:
+                listener()
+            added += len(events)
+            if len(events) < self._events.maxlen:
+                break
+        return added
+
+    def events_after(self, after_id) -> list[tuple[int, dict]] | None:
+        """The buffered events after `after_id`; None if some of them already left the buffer."""
+        with self._condition:
+            if after_id < self._floor:
+                return None
+            events = []
+            for event in reversed(self._events):
+                if event[0] <= after_id:
+                    break
+                events.append(event)
+            return events[::-1]
+
+    def catch_up(self, after_id) -> list[tuple[int, dict]]:
+        """Events after `after_id`, from the buffer or, if it doesn't reach back that far, from the table."""
+        events = self.events_after(after_id)
+        if events is None:
+            session = self._open_session()
+            try:
+                events = load_ingest_events(session, after_id)
+            finally:
+                session.close()
+        return events
+
+    def wait(self, after_id, timeout) -> list[tuple[int, dict]]:
+        """Blocks until there are events after `after_id`, or `timeout` seconds; returns them (maybe none)."""
+        with self._condition:
+            self._condition.wait_for(lambda: self.last_id > after_id, timeout)
+        return self.catch_up(after_id)
+
+    # For event loops, which can't block on wait(): `listener` is called from the feed's thread on new events
+    def add_listener(self, listener):
+        with self._condition:
+            self._listeners.add(listener)
+
+    def remove_listener(self, listener):
+        with self._condition:
+            self._listeners.discard(listener)
+
+
+# Shared by the API's streams; its thread starts with the first one.
+ingest_feed = IngestEventFeed()
@@ -0,0 +1,316 @@
+"""
+Metrics in the Prometheus text format, per-request timings and an opt-in sampling profiler.
+
+Request timings are split into phases: `db` (time in the DB driver's execute calls, with the
+number of SQL statements), `hydrate` (ORM statement execution and turning rows into objects,
+minus the `db` time within it) and `serialize` (JSON encoding of the response). They are
+collected through SQLAlchemy engine and session events while a RequestTimings is active, so
+code outside requests (the collector, scripts) is not affected.
+"""
+import contextvars
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as StackCounter
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# Seconds; covers sub-millisecond cache hits up to slow exports
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Opt-in profiling: `X-Profile: 1` requests are profiled only when API_PROFILING is set
+PROFILING_ENABLED = os.environ.get('API_PROFILING', '').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.environ.get(
+    'API_PROFILE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'profiles'))
+PROFILE_INTERVAL = 0.001
+
+
+# --- Metrics ---
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_sample(key, value) for key, value in items)
+        return '\n'.join(line for line in lines if line)
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _render_sample(self, key, value):
+        return f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket, the +Inf bucket, then the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def count(self, **labels):
+        counts = self._values.get(self._key(labels))
+        return sum(counts[:-1]) if counts else 0
+
+    def quantile(self, q, **labels):
+        """Estimate from the buckets (the upper bound of the bucket holding the q-th observation)."""
+        counts = self._values.get(self._key(labels))
+        if not counts:
+            return None
+        rank, seen = q * sum(counts[:-1]), 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts[:-1]):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return float('inf')
+
+    def _render_sample(self, key, counts):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts[:-1]):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, [("le", _format_value(bound))])} {cumulative}')
+        lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(counts[-1])}')
+        lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}')
+        return '\n'.join(lines)
+
+
+class Registry:
+    """A set of metrics, plus callbacks refreshing gauges right before each render."""
+
+    def __init__(self):
+        self.metrics = {}
+        self._callbacks = []
+
+    def _add(self, metric):
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def on_render(self, callback):
+        self._callbacks.append(callback)
+        return callback
+
+    def render(self):
+        for callback in self._callbacks:
+            callback()
+        return '\n'.join(metric.render() for metric in self.metrics.values()) + '\n'
+
+    def write_textfile(self, path):
+        """Writes the metrics for node_exporter's textfile collector, atomically."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(f'{path}.tmp', 'w') as f:
+            f.write(self.render())
+        os.replace(f'{path}.tmp', path)
+
+
+# --- Request timings ---
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Phase durations (seconds) and SQL statement count of one request; activate() it for the request's duration."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.hydrate = 0.0
+        self.serialize = 0.0
+        self.statements = 0
+        self._token = None
+
+    def activate(self):
+        self._token = _current.set(self)
+        return self
+
+    def deactivate(self):
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError: # ended in another context, e.g. after a streamed response
+                _current.set(None)
+            self._token = None
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def phases(self):
+        """{phase: seconds}; `app` is what's left: view logic, building response dicts, framework."""
+        total = self.total
+        return {'db': self.db, 'hydrate': self.hydrate, 'serialize': self.serialize,
+                'app': max(total - self.db - self.hydrate - self.serialize, 0.0), 'total': total}
+
+    def server_timing(self):
+        """Server-Timing header value (milliseconds), shown by browser devtools."""
+        return ', '.join(f'{name};dur={seconds * 1e3:.2f}' for name, seconds in self.phases().items())
+
+
+def current_timings():
+    return _current.get()
+
+
+class timed:
+    """Adds the time spent in the block to the active request's `phase` attribute, if any."""
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self._timings = _current.get()
+        self._started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if self._timings is not None:
+            setattr(self._timings, self.phase, getattr(self._timings, self.phase) + time.perf_counter() - self._started)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault('_timings_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _current.get()
+    started = conn.info.get('_timings_started') if conn is not None else None
+    if timings is not None and started:
+        timings.db += time.perf_counter() - started.pop()
+        timings.statements += 1
+
+
+@event.listens_for(Engine, 'handle_error')
+def _failed_cursor_execute(context):
+    # Failed statements count too, and mustn't leave their start time behind
+    _after_cursor_execute(context.connection, None, None, None, None, None)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _time_orm_execute(orm_execute_state):
+    """
+    Runs ORM statements eagerly while a request is timed, so loading rows into objects is
+    measured here. Streaming executions (yield_per / stream_results) are left alone.
+    """
+    timings = _current.get()
+    options = orm_execute_state.execution_options
+    if timings is None or options.get('yield_per') or options.get('stream_results'):
+        return None
+    started, db_before = time.perf_counter(), timings.db
+    try:
+        frozen = orm_execute_state.invoke_statement().freeze()
+    finally:
+        # Statements run inside (e.g. eager loads) are already counted as db time
+        timings.hydrate += time.perf_counter() - started - (timings.db - db_before)
+    return frozen()
+
+
+# --- Sampling profiler ---
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a background thread,
+    counting identical stacks. Cheap enough to run on a single request, opt-in only.
+    """
+
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = StackCounter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def collapsed(self):
+        """Folded stacks ('frame;frame;frame count' lines), as read by flamegraph.pl and speedscope."""
+        return '\n'.join(f'{stack} {count}' for stack, count in self.samples.most_common()) + '\n'
+
+    def save(self, name, directory=PROFILE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S.%fZ')
+        path = os.path.join(directory, f"{stamp}-{name}.folded")
+        with open(path, 'w') as f:
+            f.write(self.collapsed())
+        return path
@@ -1,25 +1,223 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 
-# Ensure the data directory for the default DB exists (though test DB path is now preferred for tests)
+# Nothing here touches the filesystem or opens an engine at import: engines are created on
+# first use (and the default data directory with them), with fresh pools after a fork.
 _DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
-os.makedirs(_DEFAULT_DATA_DIR, exist_ok=True)
-
 _DEFAULT_DB_FILE = os.path.join(_DEFAULT_DATA_DIR, 'league_data.db')
-_DB_FILE_PATH = os.environ.get('LEAGUE_DB_PATH', _DEFAULT_DB_FILE)
 
-# Ensure the directory for the database exists, especially if LEAGUE_DB_PATH is used
-os.makedirs(os.path.dirname(_DB_FILE_PATH), exist_ok=True)
+def _database_url_from_env():
+    """LEAGUE_DB_PATH (a file path) wins over DATABASE_URL, then the default data file."""
+    db_file_path = os.environ.get('LEAGUE_DB_PATH')
+    if db_file_path or not os.environ.get('DATABASE_URL'):
+        db_file_path = db_file_path or _DEFAULT_DB_FILE
+        # Ensure the directory for the database exists, especially if LEAGUE_DB_PATH is used
+        os.makedirs(os.path.dirname(os.path.abspath(db_file_path)), exist_ok=True)
+        return f"sqlite:///{db_file_path}"
+    return os.environ['DATABASE_URL']
+
+# Pool sizing, shared by the API and the collector. Size it to the number of
+# threads that query concurrently (e.g. gunicorn workers x threads per process).
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+# How long a SQLite connection waits on a lock held by another connection before failing
+SQLITE_BUSY_TIMEOUT_MS = 30_000
+
+
+class PoolMetrics:
+    """Checkout counters and wait times for one engine's pool."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, wait, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self, pool):
+        with self._lock:
+            return {
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': pool.overflow(),
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_seconds_total': round(self.total_wait, 6),
+                'wait_seconds_avg': round(self.total_wait / self.checkouts, 6) if self.checkouts else 0.0,
+                'wait_seconds_max': round(self.max_wait, 6),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep counting into the same metrics.
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def make_engine(url, read_only=False):
+    """
+    Creates an engine with the configuration shared by the API and the collector.
+
+    SQLite connections get a busy timeout and relaxed (but WAL-safe) syncing. Read-write
+    engines switch the file to WAL journaling so readers never block on the writer, while
+    read-only engines (the API) run with `query_only` and leave the file untouched.
+    """
+    url = make_url(url)
+    if url.get_backend_name() != 'sqlite':
+        return create_engine(url, echo=False, pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT)
+
+    in_memory = url.database in (None, '', ':memory:')
+    kwargs = {} if in_memory else {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': POOL_SIZE, 'max_overflow': POOL_MAX_OVERFLOW, 'pool_timeout': POOL_TIMEOUT,
+    }
+    new_engine = create_engine(url, echo=False, connect_args={'check_same_thread': False}, **kwargs)
+
+    @event.listens_for(new_engine, "connect")
+    def _configure_sqlite_connection(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+        elif not in_memory:
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.close()
+
+    return new_engine
+
+
+class _Engines:
+    """
+    The read-write and read-only engines, created on first use.
+
+    Connections opened before a fork (e.g. in a pre-forking server's master process) are not
+    shared with the child: the first access from a new process swaps in a fresh pool, leaving
+    the inherited connections to the parent without closing them.
+    """
+
+    def __init__(self):
+        self.url = None
+        self.engine = None
+        self.read_only_engine = None
+        self.pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.pid != os.getpid() or self.engine is None:
+            with self._lock:
+                if self.engine is not None and self.pid != os.getpid():
+                    self.engine.dispose(close=False)
+                    self.read_only_engine.dispose(close=False)
+                if self.engine is None:
+                    self.url = self.url or _database_url_from_env()
+                    self.engine = make_engine(self.url)
+                    self.read_only_engine = make_engine(self.url, read_only=True)
+                self.pid = os.getpid()
+        return self.engine, self.read_only_engine
+
+    def configure(self, url):
+        with self._lock:
+            if self.engine is not None:
+                self.engine.dispose()
+                self.read_only_engine.dispose()
+            self.url, self.engine, self.read_only_engine = url, None, None
+
+
+_engines = _Engines()
+
+def get_engine():
+    """The read-write engine (collector, scripts), created on first use."""
+    return _engines.get()[0]
+
+def get_read_only_engine():
+    """The read-only engine used by the API, created on first use."""
+    return _engines.get()[1]
+
+def get_database_url():
+    if _engines.url is None:
+        _engines.url = _database_url_from_env()
+    return _engines.url
+
+def __getattr__(name):
+    # `models_base.engine`, `.read_only_engine` and `.DATABASE_URL` still work, resolved lazily
+    if name == 'engine':
+        return get_engine()
+    if name == 'read_only_engine':
+        return get_read_only_engine()
+    if name == 'DATABASE_URL':
+        return get_database_url()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def pool_metrics():
+    """Pool metrics for the read-write and read-only engines."""
+    return {
+        name: pool.metrics.snapshot(pool) if hasattr(pool, 'metrics') else {'status': pool.status()}
+        for name, pool in (('read_write', get_engine().pool), ('read_only', get_read_only_engine().pool))
+    }
+
 
-DATABASE_URL = f"sqlite:///{_DB_FILE_PATH}"
-engine = create_engine(DATABASE_URL, echo=False)
 Base = declarative_base()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Bound to the current engines when a session is created
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+ReadOnlySessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+def configure_engine(url):
+    """Points both engines (and their sessions) at another database, e.g. from a --db_url flag."""
+    _engines.configure(url)
 
 def get_session():
     """Provides a new SQLAlchemy session."""
-    return SessionLocal()
+    return SessionLocal(bind=get_engine())
+
+def get_read_only_session():
+    """Provides a new session on the read-only engine, for the API's request handlers."""
+    return ReadOnlySessionLocal(bind=get_read_only_engine())
+
+# PRAGMAs applied to every connection while a bulk load is running.
+# Durability is traded for speed: a crash mid-load may lose the last batches,
+# which the collector's checkpoints make safe to re-fetch.
+BULK_LOAD_PRAGMAS = {
+    'synchronous': 'OFF',
+    'cache_size': -256 * 1024, # negative means KiB, i.e. 256 MiB of page cache
+    'temp_store': 'MEMORY',
+}
 
 def init_db():
     """
@@ -27,10 +225,62 @@ def init_db():
     that inherit from the Base metadata.
     This function is typically called by database setup scripts.
     """
+    engine = get_engine()
     Base.metadata.create_all(bind=engine)
+    # create_all() skips the indexes of tables that already exist, e.g. indexes
+    # added to a model later or dropped by an interrupted bulk load.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def _apply_bulk_load_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in BULK_LOAD_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+@contextmanager
+def bulk_load(tables):
+    """
+    Tunes the database for a large insert into `tables`.
+
+    Switches the file to WAL journaling (persistent), applies BULK_LOAD_PRAGMAS to
+    every connection opened during the load, and drops the tables' secondary indexes
+    so they are rebuilt once at the end instead of updated row by row.
+    """
+    engine = get_engine()
+    with engine.connect() as connection:
+        journal_mode = connection.exec_driver_sql("PRAGMA journal_mode = WAL").scalar()
+    print(f"Bulk load: journal_mode={journal_mode}, pragmas {BULK_LOAD_PRAGMAS}")
+
+    indexes = [index for table in tables for index in table.indexes]
+    for index in indexes:
+        index.drop(bind=engine, checkfirst=True)
+
+    # Pooled connections were opened without the pragmas; start from fresh ones.
+    event.listen(engine, "connect", _apply_bulk_load_pragmas)
+    engine.dispose()
+    try:
+        yield
+    finally:
+        event.remove(engine, "connect", _apply_bulk_load_pragmas)
+        engine.dispose()
+        started = time.monotonic()
+        for index in indexes:
+            index.create(bind=engine, checkfirst=True)
+        if indexes:
+            print(f"Bulk load: rebuilt {len(indexes)} indexes in {time.monotonic() - started:.1f}s")
 
 # Ensure all models are imported when models_base is imported.
 # This helps SQLAlchemy's Base collect all model metadata.
 # The # noqa F401 silences flake8 unused import warnings, as they are needed for registration.
 from . import scoreboard_game_model # noqa: F401
 from . import picks_and_bans_model  # noqa: F401
+from . import collection_checkpoint_model  # noqa: F401
+from . import draft_action_model  # noqa: F401
+from . import stats_rollup_model  # noqa: F401
+from . import search_model  # noqa: F401
+from . import game_document_model  # noqa: F401
+from . import partition_model  # noqa: F401
+from . import fingerprint_model  # noqa: F401
+from . import ingest_event_model  # noqa: F401
@@ -0,0 +1,19 @@
+from sqlalchemy import Boolean, Column, Integer, String, Text
+from .models_base import Base
+
+class SeasonPartition(Base):
+    """
+    A season partition of the per-game tables (see partitions.py), cataloged in the main
+    database: the date range of its games routes queries to it without opening its file.
+    """
+    __tablename__ = "SeasonPartitions"
+
+    Season = Column(String, primary_key=True) # '2025', or 'undated'
+    FirstDate = Column(Text) # DateTime_UTC range of its games, NULL while it has no dated game
+    LastDate = Column(Text)
+    Games = Column(Integer, nullable=False, default=0)
+    # Compacted into a read-only file: attached with immutable=1, closed to the collector
+    Immutable = Column(Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f"<SeasonPartition(Season='{self.Season}', FirstDate='{self.FirstDate}', LastDate='{self.LastDate}', Games={self.Games}, Immutable={self.Immutable})>"
@@ -0,0 +1,333 @@
+"""
+Season partitions: the per-game tables split into one SQLite file per season.
+
+With LEAGUE_PARTITION_DIR set, the collector writes each game's ScoreboardGames,
+PicksAndBansS7, DraftActions and GameDocuments rows to the file of its season: the year
+in its OverviewPage (the start of its GameId), else the year of its DateTime_UTC. The
+main database keeps everything derived from them (rollups, search index, checkpoints)
+plus the SeasonPartitions catalog of each season's date range.
+
+Readers go through a SeasonRouter, which ATTACHes to the session's connection only the
+seasons a query can touch (a game's season for a GameId, the seasons whose date range
+overlaps a listing's) and runs the query against each with a schema_translate_map.
+SQLite attaches at most MAX_ATTACHED databases per connection; the least recently used
+season the open transaction hasn't touched is detached to make room.
+
+A closed season can be compacted (`python -m api.bin.partitions compact 2023`) into a
+read-only season-2023.immutable.db, attached with immutable=1: SQLite then reads it
+without locking or checking for a WAL. The collector refuses to write to it until it is
+reopened.
+
+Writes spanning the main database and a partition commit in one transaction, but WAL
+files only guarantee atomicity per file: a crash mid-commit can leave the derived tables
+ahead of a partition. Re-collecting the batch repairs it, every write being idempotent.
+"""
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .draft_action_model import DraftAction
+from .game_document_model import GameDocument
+from .models_base import Base, make_engine
+from .partition_model import SeasonPartition
+from .picks_and_bans_model import PicksAndBansS7Model
+from .scoreboard_game_model import ScoreboardGame
+
+PARTITION_DIR = os.environ.get('LEAGUE_PARTITION_DIR') or None
+PARTITIONED_TABLES = [ScoreboardGame.__table__, PicksAndBansS7Model.__table__, DraftAction.__table__, GameDocument.__table__]
+# SQLite's default SQLITE_MAX_ATTACHED
+MAX_ATTACHED = 10
+# Season of games with no year in their OverviewPage nor a date
+UNDATED = 'undated'
+
+_YEAR = re.compile(r'\b((?:19|20)\d\d)\b')
+
+
+def season_of(overview_page=None, date_utc=None) -> str:
+    """The partition of a game: the year in its OverviewPage, else its DateTime_UTC's, else UNDATED."""
+    match = _YEAR.search(overview_page or '')
+    if match:
+        return match.group(1)
+    if date_utc and date_utc[:4].isdigit():
+        return date_utc[:4]
+    return UNDATED
+
+def season_of_game_id(game_id) -> str | None:
+    """The season a GameId most likely belongs to, from the OverviewPage it starts with; None if it has no year."""
+    match = _YEAR.search(game_id.partition('_')[0])
+    return match.group(1) if match else None
+
+def schema_name(season) -> str:
+    return f"season_{season}"
+
+def in_partition(schema) -> dict:
+    """Execution options running a statement on a partition's tables (schema None: the main database's)."""
+    return {'schema_translate_map': {None: schema}} if schema else {}
+
+def create_partition(path):
+    """Creates a partition file with the per-game tables and their indexes, in WAL mode."""
+    engine = make_engine(f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(engine, tables=PARTITIONED_TABLES)
+    finally:
+        engine.dispose()
+
+
+class SeasonRouter:
+    """
+    Routes the per-game tables' queries to season partitions attached to a session's
+    connection. Disabled without a directory: every query then runs once, on the main
+    database (schema None).
+    """
+
+    def __init__(self, directory=PARTITION_DIR, max_attached=MAX_ATTACHED):
+        self.directory = os.path.abspath(directory) if directory else None
+        self.max_attached = max_attached
+        self._create_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.directory is not None
+
+    def path(self, season, immutable=False):
+        return os.path.join(self.directory, f"season-{season}{'.immutable' if immutable else ''}.db")
+
+    # --- Catalog ---
+    def catalog(self, session) -> list[SeasonPartition]:
+        """The partitions, latest games first; read once per session."""
+        if 'season_catalog' not in session.info:
+            partitions = session.query(SeasonPartition).all()
+            session.info['season_catalog'] = sorted(
+                partitions, key=lambda p: (p.LastDate is not None, p.LastDate or '', p.Season), reverse=True)
+        return session.info['season_catalog']
+
+    def record_games(self, session, season, dates, added):
+        """Adds `added` games dated `dates` (DateTime_UTC values, None for undated) to a season's catalog entry."""
+        dates = [date for date in dates if date]
+        stmt = sqlite_insert(SeasonPartition).values(
+            Season=season, FirstDate=min(dates, default=None), LastDate=max(dates, default=None), Games=added, Immutable=False)
+        # Scalar min()/max() return NULL if either side is, hence the coalesce
+        stmt = stmt.on_conflict_do_update(index_elements=['Season'], set_={
+            'FirstDate': func.min(func.coalesce(SeasonPartition.FirstDate, stmt.excluded.FirstDate),
+                                  func.coalesce(stmt.excluded.FirstDate, SeasonPartition.FirstDate)),
+            'LastDate': func.max(func.coalesce(SeasonPartition.LastDate, stmt.excluded.LastDate),
+                                 func.coalesce(stmt.excluded.LastDate, SeasonPartition.LastDate)),
+            'Games': SeasonPartition.Games + stmt.excluded.Games,
+        })
+        session.execute(stmt)
+        session.info.pop('season_catalog', None)
+
+    # --- Attaching ---
+    def attach(self, session, partition: SeasonPartition) -> str:
+        """Attaches a cataloged partition to the session's connection if it isn't yet, and returns its schema."""
+        schema = schema_name(partition.Season)
+        path = self.path(partition.Season, partition.Immutable)
+        # The file's identity, not just its path: a reopened season is a new file at the old path
+        stat = os.stat(path)
+        file_id = (path, stat.st_dev, stat.st_ino)
+        connection = session.connection()
+        attached = connection.info.setdefault('season_partitions', OrderedDict()) # schema -> file_id, least recent first
+        if attached.get(schema) == file_id:
+            attached.move_to_end(schema)
+            return schema
+        if schema in attached: # compacted or reopened since
+            self._detach(connection, attached, schema)
+        if len(attached) >= self.max_attached:
+            self._evict(connection, attached)
+        if partition.Immutable:
+            uri = f"file:{quote(path)}?mode=ro&immutable=1"
+            connection.exec_driver_sql(f'ATTACH DATABASE ? AS "{schema}"', (uri,))
+            file = next(row[2] for row in connection.exec_driver_sql("PRAGMA database_list") if row[1] == schema)
+            if os.path.abspath(file) != path:
+                connection.exec_driver_sql(f'DETACH DATABASE "{schema}"')
+                raise RuntimeError("This SQLite library does not accept URI filenames, needed to attach immutable partitions")
+        else:
+            connection.exec_driver_sql(f'ATTACH DATABASE ? AS "{schema}"', (path,))
+        attached[schema] = file_id
+        return schema
+
+    @staticmethod
+    def _detach(connection, attached, schema):
+        connection.exec_driver_sql(f'DETACH DATABASE "{schema}"')
+        attached.pop(schema)
+
+    def _evict(self, connection, attached):
+        """
+        Detaches the least recently used partition that can be. SQLite refuses to detach one
+        the open transaction has read or written (it holds a lock on it until the commit).
+        """
+        for schema in list(attached):
+            try:
+                self._detach(connection, attached, schema)
+                return
+            except OperationalError as e:
+                if 'locked' not in str(e.orig):
+                    raise
+        raise RuntimeError(f"A transaction can't use more than {self.max_attached} season partitions; "
+                           "commit before touching more seasons")
+
+    def writable(self, session, season) -> str:
+        """
+        The schema of `season` attached for writing, creating its file and catalog entry first
+        if needed. Raises RuntimeError for a compacted season.
+
+        The session's catalog may be older than a compaction, so the season's flag is read again
+        by a no-op UPDATE: the transaction then holds the main database's write lock until it
+        commits, which compact_season waits for before setting the flag.
+        """
+        partition = next((p for p in self.catalog(session) if p.Season == season), None)
+        if partition is None:
+            with self._create_lock:
+                os.makedirs(self.directory, exist_ok=True)
+                if not os.path.exists(self.path(season)):
+                    create_partition(self.path(season))
+            self.record_games(session, season, [], 0)
+            partition = next(p for p in self.catalog(session) if p.Season == season)
+        table = SeasonPartition.__table__
+        immutable = session.connection().execute(
+            update(table).where(table.c.Season == season).values(Immutable=table.c.Immutable).returning(table.c.Immutable)
+        ).scalar_one()
+        if immutable != partition.Immutable: # compacted or reopened since the catalog was read
+            session.info.pop('season_catalog', None)
+            session.expire(partition)
+        if immutable:
+            raise RuntimeError(f"Season {season} is compacted and read-only; "
+                               f"reopen it with `python -m api.bin.partitions reopen {season}` to add games")
+        return self.attach(session, partition)
+
+    # --- Routing ---
+    def schemas(self, session, seasons=None):
+        """
+        Schemas of `seasons` (default: all), each attached when iterated to; just None when
+        partitioning is disabled.
+        """
+        if not self.enabled:
+            yield None
+            return
+        for partition in self.catalog(session):
+            if seasons is None or partition.Season in seasons:
+                yield self.attach(session, partition)
+
+    def for_dates(self, session, first=None, last=None):
+        """
+        (schema, LastDate) of the partitions holding dated games between `first` and `last`
+        (either may be None), latest games first. Their schemas are attached when iterated,
+        so a caller that stops early never attaches the older ones.
+        """
+        if not self.enabled:
+            yield None, None
+            return
+        for partition in self.catalog(session):
+            if partition.LastDate is None or (first and partition.LastDate < first) or (last and partition.FirstDate > last):
+                continue
+            yield self.attach(session, partition), partition.LastDate
+
+    def for_games(self, session, game_ids):
+        """
+        (schema, ids) pairs to look `game_ids` up in: each id's likely season (from its GameId)
+        first, then every partition with ids None, meaning "whichever ids are still missing".
+        Callers stop once they found every id, so only unknown ids probe all partitions.
+        """
+        if not self.enabled:
+            yield None, None
+            return
+        catalog = {p.Season: p for p in self.catalog(session)}
+        likely = {}
+        for game_id in game_ids:
+            season = season_of_game_id(game_id)
+            if season in catalog:
+                likely.setdefault(season, set()).add(game_id)
+        for season, ids in likely.items():
+            yield self.attach(session, catalog[season]), ids
+        for partition in catalog.values():
+            yield self.attach(session, partition), None
+
+
+def drain_writes(path):
+    """Waits for the write transaction in progress on a partition file, if any, to commit."""
+    connection = sqlite3.connect(path, timeout=60)
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("COMMIT")
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        connection.close()
+
+
+def copy_database(source, destination, journal_mode):
+    """VACUUMs `source` INTO a fresh `destination` file (replacing it), with `journal_mode`."""
+    temporary = destination + '.tmp'
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    connection = sqlite3.connect(source)
+    try:
+        connection.execute("VACUUM INTO ?", (temporary,))
+    finally:
+        connection.close()
+    connection = sqlite3.connect(temporary)
+    try:
+        connection.execute(f"PRAGMA journal_mode = {journal_mode}")
+        connection.execute("ANALYZE")
+        if connection.execute("PRAGMA quick_check").fetchone()[0] != 'ok':
+            raise RuntimeError(f"{temporary} failed its integrity check")
+    finally:
+        connection.close()
+    os.replace(temporary, destination)
+
+
+def _remove_database(path):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def compact_season(router, session, season):
+    """
+    Rewrites a season's partition into a read-only immutable file and marks it immutable,
+    closing it to the collector. The flag is committed first and in-flight writes drained,
+    so no write can land in the old file after it was copied: committing the flag waits for
+    the write transactions that got past SeasonRouter.writable(), and later ones see it set.
+    """
+    partition = session.get(SeasonPartition, season)
+    if partition is None:
+        raise ValueError(f"No partition for season {season}")
+    if partition.Immutable:
+        return False
+    writable, immutable = router.path(season), router.path(season, immutable=True)
+    partition.Immutable = True
+    session.commit()
+    try:
+        drain_writes(writable)
+        copy_database(writable, immutable, 'DELETE')
+    except Exception:
+        partition.Immutable = False
+        session.commit()
+        raise
+    os.chmod(immutable, 0o444)
+    _remove_database(writable)
+    return True
+
+
+def reopen_season(router, session, season):
+    """Turns a compacted season back into a writable partition, e.g. to collect a late game."""
+    partition = session.get(SeasonPartition, season)
+    if partition is None:
+        raise ValueError(f"No partition for season {season}")
+    if not partition.Immutable:
+        return False
+    writable, immutable = router.path(season), router.path(season, immutable=True)
+    copy_database(immutable, writable, 'WAL')
+    partition.Immutable = False
+    session.commit()
+    os.remove(immutable)
+    return True
+
+
+season_router = SeasonRouter()
@@ -0,0 +1,57 @@
+import threading
+import time
+
+
+class AdaptiveTokenBucket:
+    """
+    Thread-safe token bucket whose refill rate adapts to the API's responses.
+
+    Every successful call nudges the rate up additively, while a throttling
+    (or otherwise failed) call cuts it multiplicatively and empties the bucket.
+    The collector therefore converges on the fastest rate the Cargo API
+    tolerates instead of sleeping a fixed amount between calls.
+    """
+
+    def __init__(self, rate=1.0, capacity=4, min_rate=0.05, max_rate=10.0,
+                 increase=0.05, decrease=0.5, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.slept_seconds = 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def acquire(self):
+        """Blocks until a token is available and consumes it. Returns the time waited."""
+        with self._lock:
+            self._refill(self._clock())
+            # Reserve the token now (the balance may go negative) so concurrent
+            # callers queue up behind each other instead of racing for the refill.
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.slept_seconds += wait
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self._lock:
+            self._refill(self._clock())
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = min(self._tokens, 0.0)
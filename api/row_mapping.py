@@ -0,0 +1,141 @@
+from sqlalchemy import Boolean, Float, Integer
+
+_BOOL_STRINGS = {
+    'true': True, '1': True, 'yes': True, 't': True,
+    'false': False, '0': False, 'no': False, 'f': False,
+}
+
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return _BOOL_STRINGS.get(value.lower())
+    if isinstance(value, int):
+        return bool(value)
+    return value
+
+
+def _to_int(value):
+    # Cargo returns every field as a string, with '' for empty ones.
+    if value == '' or value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return value
+        return int(number) if number.is_integer() else number
+
+
+def _to_float(value):
+    if value == '' or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _converter_for(column_type):
+    # Boolean first: on some dialects it is implemented on top of Integer.
+    if isinstance(column_type, Boolean):
+        return _to_bool
+    if isinstance(column_type, Integer):
+        return _to_int
+    if isinstance(column_type, Float):
+        return _to_float
+    return None
+
+
+class RowMapper:
+    """
+    Maps Cargo API rows onto a model's columns, compiled once per model.
+
+    The column order, the API key of every column and the type coercion needed for
+    Boolean, Integer and Float columns are worked out up front and compiled into a
+    single function, so turning a row into an insert tuple is one pass with no
+    per-row introspection of the table or the key map.
+    """
+
+    def __init__(self, model, db_to_api_key_map, key_column):
+        table = model.__table__
+        columns = table.columns
+        self.model = model
+        self.columns = tuple(columns.keys())
+        self.api_keys = tuple(db_to_api_key_map.get(name, name) for name in self.columns)
+        self.to_tuple = self._compile(columns, self.api_keys, db_to_api_key_map.get(key_column, key_column))
+        self.table_name = table.name
+        self.key_column = key_column
+        self.insert_or_ignore_sql = self.insert_sql()
+
+    def insert_sql(self, schema=None):
+        """
+        Positional insert matching to_tuple()'s output, ignoring rows whose key already exists,
+        into the table of `schema` (an attached database, e.g. a season partition) or of main.
+        """
+        table = f'"{schema}"."{self.table_name}"' if schema else f'"{self.table_name}"'
+        return (
+            f'INSERT INTO {table} ({", ".join(f'"{name}"' for name in self.columns)}) '
+            f'VALUES ({", ".join("?" for _ in self.columns)}) ON CONFLICT ("{self.key_column}") DO NOTHING'
+        )
+
+    def upsert_sql(self, schema=None):
+        """
+        Like insert_sql(), but a row whose key exists overwrites the stored one. The overwritten
+        row also moves to the end of the table's rowid order, so readers that follow a rowid
+        watermark pick the new values up; they must then drop the copy they already hold (the
+        draft similarity index replaces it, an incremental snapshot export falls back to a
+        full one).
+        """
+        table = f'"{schema}"."{self.table_name}"' if schema else f'"{self.table_name}"'
+        updates = ", ".join(f'"{name}" = excluded."{name}"' for name in self.columns if name != self.key_column)
+        return (
+            f'INSERT INTO {table} ({", ".join(f'"{name}"' for name in self.columns)}) '
+            f'VALUES ({", ".join("?" for _ in self.columns)}) ON CONFLICT ("{self.key_column}") DO UPDATE SET {updates}, '
+            f'rowid = (SELECT MAX(rowid) FROM {table}) + 1'
+        )
+
+    @staticmethod
+    def _compile(columns, api_keys, api_key_column):
+        """
+        Generates `to_tuple(api_row)`, which returns the row's values in `columns` order
+        (or None when its key column is empty), e.g.
+            def to_tuple(api_row):
+                get = api_row.get
+                if not get('GameId'): return None
+                return (get('OverviewPage'), ..., _to_int(get('Team1Score')), ...)
+        """
+        namespace = {}
+        values = []
+        for index, (column, api_key) in enumerate(zip(columns, api_keys)):
+            converter = _converter_for(column.type)
+            if converter is None:
+                values.append(f"get({api_key!r})")
+            else:
+                namespace[f"_convert{index}"] = converter
+                values.append(f"_convert{index}(get({api_key!r}))")
+        source = (
+            "def to_tuple(api_row):\n"
+            "    get = api_row.get\n"
+            f"    if not get({api_key_column!r}): return None\n"
+            f"    return ({', '.join(values)},)\n"
+        )
+        exec(compile(source, f"<RowMapper {columns.keys()[0]}...>", "exec"), namespace)
+        return namespace["to_tuple"]
+
+    def map_rows(self, api_rows):
+        """Converts API rows to insert tuples, skipping rows without a key."""
+        to_tuple = self.to_tuple
+        return [values for values in map(to_tuple, api_rows) if values is not None]
+
+    def insert_or_ignore(self, session, rows, schema=None):
+        """Inserts tuples from map_rows() with a single executemany. Returns the number of rows inserted."""
+        sql = self.insert_sql(schema) if schema else self.insert_or_ignore_sql
+        result = session.connection().exec_driver_sql(sql, rows)
+        return result.rowcount
+
+    def upsert(self, session, rows, schema=None):
+        """Inserts or overwrites tuples from map_rows() with a single executemany. Returns the number of rows written."""
+        result = session.connection().exec_driver_sql(self.upsert_sql(schema), rows)
+        return result.rowcount
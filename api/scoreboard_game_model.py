@@ -1,13 +1,19 @@
-from sqlalchemy import Column, Integer, String, Float, Text
-from sqlalchemy.orm import relationship # Import relationship
+from sqlalchemy import Column, Integer, String, Float, Text, Index
+from sqlalchemy.orm import deferred, relationship # Import relationship
 from .models_base import Base
 
 class ScoreboardGame(Base):
     __tablename__ = "ScoreboardGames"
+    # Columns marked deferred(group='wide') are rarely read by the API and only
+    # loaded on access (or with undefer_group('wide')).
+    __table_args__ = (
+        # Keyset pagination of the /games listing
+        Index('ix_ScoreboardGames_DateTime_UTC_GameId', 'DateTime_UTC', 'GameId'),
+    )
 
     # ... existing columns ...
 
-    OverviewPage = Column(Text)
+    OverviewPage = deferred(Column(Text), group='wide')
     Tournament = Column(Text)
     Team1 = Column(Text)
     Team2 = Column(Text)
@@ -45,23 +51,23 @@ class ScoreboardGame(Base):
     Team1Inhibitors = Column(Integer)
     Team2Inhibitors = Column(Integer)
     Patch = Column(Text)
-    LegacyPatch = Column(Text) # Assuming this is different from Patch
+    LegacyPatch = deferred(Column(Text), group='wide') # Assuming this is different from Patch
     PatchSort = Column(Text) # For sorting patches if Patch itself isn't sortable
-    MatchHistory = Column(Text) # URL or reference
-    VOD = Column(Text) # Wikitext, could be complex
+    MatchHistory = deferred(Column(Text), group='wide') # URL or reference
+    VOD = deferred(Column(Text), group='wide') # Wikitext, could be complex
     N_Page = Column(Integer)
     N_MatchInTab = Column(Integer)
     N_MatchInPage = Column(Integer)
     N_GameInMatch = Column(Integer)
-    Gamename = Column(Text)
-    UniqueLine = Column(Text) # This might be an alternative key from API, but GameId is primary for this table
+    Gamename = deferred(Column(Text), group='wide')
+    UniqueLine = deferred(Column(Text), group='wide') # This might be an alternative key from API, but GameId is primary for this table
     GameId = Column(String, primary_key=True) # Leaguepedia GameId
     MatchId = Column(String) # Leaguepedia MatchId
-    RiotPlatformGameId = Column(Text)
-    RiotPlatformId = Column(Text)
-    RiotGameId = Column(Text) # Riot's Game ID, may differ from RiotPlatformGameId
-    RiotHash = Column(Text)
-    RiotVersion = Column(Integer)
+    RiotPlatformGameId = deferred(Column(Text), group='wide')
+    RiotPlatformId = deferred(Column(Text), group='wide')
+    RiotGameId = deferred(Column(Text), group='wide') # Riot's Game ID, may differ from RiotPlatformGameId
+    RiotHash = deferred(Column(Text), group='wide')
+    RiotVersion = deferred(Column(Integer), group='wide')
 
     # Relationship to PicksAndBansS7Model
     picks_and_bans = relationship("PicksAndBansS7Model", back_populates="scoreboard_game")
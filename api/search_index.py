@@ -0,0 +1,261 @@
+import heapq
+import re
+import sys
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+
+from sqlalchemy import bindparam, delete, func, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .draft_actions import split_comma_separated
+from .partitions import in_partition
+from .scoreboard_game_model import ScoreboardGame
+from .search_model import SearchEntry, SearchIndexedGame
+
+# Order of the entity types in search results
+SEARCH_TYPES = ('team', 'player', 'tournament', 'champion')
+AUTOCOMPLETE_LIMIT = 10
+# Autocomplete prefixes up to this length are answered from precomputed trie nodes
+TRIE_DEPTH = 3
+# Seconds between checks for changed search entries
+REFRESH_INTERVAL = 60
+
+
+def normalize(name):
+    """Search form of a name: casefolded, without accents, apostrophes and dots, words separated by one space."""
+    name = ''.join(c for c in unicodedata.normalize('NFKD', name or '') if not unicodedata.combining(c)).casefold()
+    return ' '.join(re.findall(r'\w+', re.sub(r"['’.]", '', name)))
+
+
+def game_entities(game):
+    """The (type, name) pairs a ScoreboardGames row (a mapping of its columns) mentions, once each."""
+    get = game.get
+    entities = {('tournament', get('Tournament'))}
+    for side in (1, 2):
+        entities.add(('team', get(f'Team{side}')))
+        entities.update(('player', player) for player in split_comma_separated(get(f'Team{side}Players')))
+        for column in (f'Team{side}Picks', f'Team{side}Bans'):
+            entities.update(('champion', champion) for champion in split_comma_separated(get(column)))
+    return {(entity_type, name) for entity_type, name in entities if name and normalize(name)}
+
+
+def _counted(session, game_ids):
+    return {game_id for (game_id,) in session.query(SearchIndexedGame.GameId).filter(SearchIndexedGame.GameId.in_(game_ids))}
+
+
+def _entity_counts(session, game_ids, schema=None):
+    """How many of the given games mention each (type, name), from their stored rows."""
+    games = session.query(
+        ScoreboardGame.Tournament, ScoreboardGame.Team1, ScoreboardGame.Team2,
+        ScoreboardGame.Team1Players, ScoreboardGame.Team2Players, ScoreboardGame.Team1Picks,
+        ScoreboardGame.Team2Picks, ScoreboardGame.Team1Bans, ScoreboardGame.Team2Bans,
+    ).filter(ScoreboardGame.GameId.in_(game_ids)).execution_options(**in_partition(schema))
+    counts = Counter()
+    for game in games:
+        counts.update(game_entities(game._mapping))
+    return counts
+
+
+def update_search_index(session, game_ids, schema=None):
+    """
+    Adds the given games' teams, players, tournament and champions to SearchEntries (and so
+    to the FTS5 index), counting each game once. Call it once the games' ScoreboardGames rows
+    (in the season partition `schema`, if given) are written, in the same transaction.
+    Returns the number of games added.
+    """
+    game_ids = set(game_ids)
+    if not game_ids:
+        return 0
+    new_ids = list(game_ids - _counted(session, game_ids))
+    if not new_ids:
+        return 0
+
+    counts = _entity_counts(session, new_ids, schema)
+    if counts:
+        stmt = sqlite_insert(SearchEntry)
+        stmt = stmt.on_conflict_do_update(index_elements=['Type', 'Name'], set_={'Games': SearchEntry.Games + stmt.excluded.Games})
+        session.connection().execute(stmt, [
+            {'Type': entity_type, 'Name': name, 'Terms': normalize(name), 'Games': games}
+            for (entity_type, name), games in counts.items()
+        ])
+    session.connection().execute(sqlite_insert(SearchIndexedGame).on_conflict_do_nothing(), [{'GameId': game_id} for game_id in new_ids])
+    return len(new_ids)
+
+
+def remove_from_search_index(session, game_ids, schema=None):
+    """
+    Takes the given games back out of SearchEntries, dropping names no game mentions anymore,
+    e.g. before their rows are corrected; update_search_index() then adds them again. Call it
+    before the rows are rewritten, in the same transaction. Returns the number of games removed.
+    """
+    counted = list(_counted(session, set(game_ids)))
+    if not counted:
+        return 0
+    counts = _entity_counts(session, counted, schema)
+    if counts:
+        parameters = [{'type': entity_type, 'name': name, 'games': games} for (entity_type, name), games in counts.items()]
+        session.connection().execute(
+            update(SearchEntry).where(SearchEntry.Type == bindparam('type'), SearchEntry.Name == bindparam('name'))
+            .values(Games=SearchEntry.Games - bindparam('games')), parameters)
+        # The delete trigger takes them out of the FTS index
+        session.connection().execute(
+            delete(SearchEntry).where(SearchEntry.Type == bindparam('type'), SearchEntry.Name == bindparam('name'),
+                                      SearchEntry.Games <= 0), parameters)
+    session.connection().execute(delete(SearchIndexedGame).where(SearchIndexedGame.GameId.in_(counted)))
+    return len(counted)
+
+
+_SEARCH = text("""
+    SELECT Type, Name, Games FROM (
+        SELECT e.Type, e.Name, e.Games, ROW_NUMBER() OVER (
+            PARTITION BY e.Type ORDER BY e.Terms = :terms DESC, e.Games DESC, SearchIndex.rank, e.Name
+        ) AS position
+        FROM SearchIndex JOIN SearchEntries e ON e.Id = SearchIndex.rowid
+        WHERE SearchIndex MATCH :match
+    ) WHERE position <= :limit
+""")
+
+
+def search(session, query, types=SEARCH_TYPES, limit=5):
+    """
+    Entries whose words start with every word of `query`, grouped by type in SEARCH_TYPES
+    order, then exact matches, most games and best FTS rank first; at most `limit` per type.
+    """
+    terms = normalize(query)
+    if not terms:
+        return []
+    match = ' '.join(f'"{word}"*' for word in terms.split())
+    rows = session.execute(_SEARCH, {'terms': terms, 'match': match, 'limit': limit}).all()
+    results = [{"type": entity_type, "name": name, "games": games} for entity_type, name, games in rows if entity_type in types]
+    # Row order within a type is the window's; sorted() is stable
+    position = {entity_type: i for i, entity_type in enumerate(SEARCH_TYPES)}
+    return sorted(results, key=lambda result: position[result["type"]])
+
+
+class PrefixTrie:
+    """
+    Prefix index over every word start of the keys, so 'esp' finds 'G2 Esports'.
+
+    Keys are given most relevant first and lookups return key positions in that order. The
+    trie's top TRIE_DEPTH levels are a {prefix: first k positions} table, so short prefixes,
+    the ones matching most keys, are a single lookup. Longer prefixes bisect a sorted array of
+    the word-start suffixes, whose matching range is small by then.
+    """
+
+    def __init__(self, keys, k=AUTOCOMPLETE_LIMIT):
+        self.k = k
+        suffixes = []
+        self.nodes = {}
+        for position, key in enumerate(keys):
+            for start in [0] + [i + 1 for i, c in enumerate(key) if c == ' ']:
+                suffixes.append((key[start:], position))
+                for depth in range(1, min(TRIE_DEPTH, len(key) - start) + 1):
+                    node = self.nodes.setdefault(key[start:start + depth], [])
+                    if len(node) < k and position not in node:
+                        node.append(position)
+        suffixes.sort()
+        self.suffixes = [suffix for suffix, _ in suffixes]
+        self.positions = [position for _, position in suffixes]
+
+    def lookup(self, prefix):
+        if len(prefix) <= TRIE_DEPTH:
+            return self.nodes.get(prefix, [])
+        low = bisect_left(self.suffixes, prefix)
+        high = bisect_left(self.suffixes, prefix + '\U0010ffff', low)
+        return heapq.nsmallest(self.k, set(self.positions[low:high]))
+
+
+class AutocompleteIndex:
+    """
+    In-memory PrefixTrie of SearchEntries, most games first. Rebuilt from the database when
+    the entries changed, at most every `refresh_interval` seconds; lookups never query it.
+    Rebuilds run on a background thread, lookups meanwhile using the previous trie.
+    """
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL, clock=time.monotonic):
+        self.refresh_interval = refresh_interval
+        self.entries = [] # (type, name, games, terms)
+        self.trie = PrefixTrie([])
+        self.version = None
+        self._clock = clock
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._thread = None # latest background refresh
+
+    def build(self, entries):
+        """Replaces the index with (type, name, games) entries."""
+        entries = sorted(((entity_type, name, games, normalize(name)) for entity_type, name, games in entries),
+                         key=lambda entry: (-entry[2], entry[1]))
+        trie = PrefixTrie([entry[3] for entry in entries])
+        with self._lock:
+            self.entries, self.trie = entries, trie
+
+    def refresh(self, session):
+        """Rebuilds the index if SearchEntries changed since the last refresh. Returns whether it did."""
+        version = tuple(session.execute(select(func.count(), func.max(SearchEntry.Id), func.total(SearchEntry.Games))).one())
+        self._refreshed_at = self._clock()
+        if version == self.version:
+            return False
+        self.build(session.execute(select(SearchEntry.Type, SearchEntry.Name, SearchEntry.Games)).all())
+        self.version = version
+        return True
+
+    def refresh_if_stale(self, open_session):
+        """
+        Starts a refresh, with a session from `open_session()`, if the last one is
+        `refresh_interval` seconds old and none is in progress. It runs on a background thread,
+        except the first one: until then there is no index to answer from. Returns whether
+        a refresh started.
+        """
+        with self._lock:
+            if self._refreshing or (
+                    self._refreshed_at is not None and self._clock() - self._refreshed_at < self.refresh_interval):
+                return False
+            self._refreshing = True
+            first = self.version is None
+        if first:
+            self._refresh_with(open_session, raise_errors=True)
+        else:
+            self._thread = threading.Thread(target=self._refresh_with, args=(open_session,), name='autocomplete-refresh',
+                                            daemon=True)
+            self._thread.start()
+        return True
+
+    def _refresh_with(self, open_session, raise_errors=False):
+        try:
+            session = open_session()
+            try:
+                self.refresh(session)
+            finally:
+                session.close()
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"Error refreshing the autocomplete index: {e}", file=sys.stderr)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def wait(self, timeout=None):
+        """Waits for the background refresh in progress, if any."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def complete(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        """Up to `limit` entries with a word starting with `prefix`, most games first."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            entries, trie = self.entries, self.trie
+        return [{"type": entity_type, "name": name, "games": games}
+                for entity_type, name, games, _ in (entries[i] for i in trie.lookup(prefix)[:limit])]
+
+
+# Shared by the API's request handlers; refreshed from the database at most every REFRESH_INTERVAL seconds.
+autocomplete_index = AutocompleteIndex()
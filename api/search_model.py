@@ -0,0 +1,44 @@
+from sqlalchemy import DDL, Column, Integer, String, Text, UniqueConstraint, event
+from .models_base import Base
+
+class SearchEntry(Base):
+    """
+    A searchable name: a team, player, tournament or champion, with the number of games it appears in.
+    Terms is the normalized name indexed by the SearchIndex FTS5 table.
+    """
+    __tablename__ = "SearchEntries"
+    __table_args__ = (
+        UniqueConstraint('Type', 'Name', name='uq_SearchEntries_Type_Name'),
+    )
+
+    # The FTS5 index refers to entries by this rowid alias, which VACUUM keeps stable
+    Id = Column(Integer, primary_key=True)
+    Type = Column(String, nullable=False) # 'team', 'player', 'tournament' or 'champion'
+    Name = Column(String, nullable=False)
+    Terms = Column(Text, nullable=False)
+    Games = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<SearchEntry(Type='{self.Type}', Name='{self.Name}', Games={self.Games})>"
+
+class SearchIndexedGame(Base):
+    """Games already counted in SearchEntries, so a game is never added twice."""
+    __tablename__ = "SearchIndexedGames"
+
+    GameId = Column(String, primary_key=True)
+
+# SearchIndex is an external-content FTS5 table over SearchEntries.Terms (keyed by Id),
+# kept in sync by triggers; updating Games alone doesn't touch it. Prefix indexes make `term*`
+# queries a single index lookup.
+for statement in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS SearchIndex USING fts5("
+    "Terms, content='SearchEntries', content_rowid='Id', prefix='1 2 3')",
+    "CREATE TRIGGER IF NOT EXISTS SearchEntries_ai AFTER INSERT ON SearchEntries BEGIN "
+    "INSERT INTO SearchIndex(rowid, Terms) VALUES (new.Id, new.Terms); END",
+    "CREATE TRIGGER IF NOT EXISTS SearchEntries_ad AFTER DELETE ON SearchEntries BEGIN "
+    "INSERT INTO SearchIndex(SearchIndex, rowid, Terms) VALUES ('delete', old.Id, old.Terms); END",
+    "CREATE TRIGGER IF NOT EXISTS SearchEntries_au AFTER UPDATE OF Terms ON SearchEntries BEGIN "
+    "INSERT INTO SearchIndex(SearchIndex, rowid, Terms) VALUES ('delete', old.Id, old.Terms); "
+    "INSERT INTO SearchIndex(rowid, Terms) VALUES (new.Id, new.Terms); END",
+):
+    event.listen(SearchEntry.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
@@ -0,0 +1,221 @@
+"""
+Columnar snapshots of the ScoreboardGames and PicksAndBansS7 tables, as .npy files.
+
+Layout of a snapshot directory:
+    manifest.json                  tables, their parts, column encodings and export watermarks
+                                   (one per season partition, see partitions.py)
+    dictionaries/<name>.json       append-only value lists of dictionary-encoded columns
+    <table>/part-NNNNN/<column>.npy
+
+Integer columns are int64 (plus a <column>.valid.npy mask when a part has NULLs), Float
+columns float64 with NaN for NULL, Boolean columns int8 (-1 for NULL) and every text
+column int32 codes into a dictionary (-1 for NULL). Champions, teams and roles share one
+dictionary each across columns and tables.
+"""
+import json
+import os
+import re
+
+import numpy as np
+from sqlalchemy import Boolean, Float, Integer
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+
+_SHARED_DICTIONARIES = (
+    ('champion', re.compile(r'^Team[12](Ban|Pick)[1-5]$')),
+    ('role', re.compile(r'^Team[12]Role[1-5]$')),
+    ('team', re.compile(r'^(Team[12]|WinTeam|LossTeam)$')),
+)
+
+
+def column_encoding(table_name, column):
+    """('int' | 'float' | 'bool' | 'dict', dictionary name or None) for a model column."""
+    if isinstance(column.type, Boolean):
+        return 'bool', None
+    if isinstance(column.type, Integer):
+        return 'int', None
+    if isinstance(column.type, Float):
+        return 'float', None
+    for name, pattern in _SHARED_DICTIONARIES:
+        if pattern.match(column.name):
+            return 'dict', name
+    return 'dict', f'{table_name}.{column.name}'
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    """Writes through a temporary file, so readers never see a partial file."""
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(f'{path}.tmp', path)
+
+
+class SnapshotWriter:
+    """Appends parts to a snapshot; nothing is visible to readers until commit() writes the manifest."""
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest = _read_json(os.path.join(path, MANIFEST), {'version': FORMAT_VERSION, 'tables': {}})
+        self._dictionaries = {}
+
+    def _dictionary(self, name):
+        if name not in self._dictionaries:
+            values = _read_json(os.path.join(self.path, 'dictionaries', f'{name}.json'), [])
+            self._dictionaries[name] = (values, {value: code for code, value in enumerate(values)})
+        return self._dictionaries[name]
+
+    def last_rowid(self, table_name, partition=None):
+        """The export watermark of a table, in the main database or in the season partition `partition` (a schema)."""
+        entry = self.manifest['tables'].get(table_name, {})
+        if partition is None:
+            return entry.get('last_rowid', 0)
+        return entry.get('partition_rowids', {}).get(partition, 0)
+
+    def known_values(self, table_name, column_name):
+        """{value: code} of the values a dictionary-encoded column of the snapshot ever held."""
+        encoding = self.manifest['tables'].get(table_name, {}).get('columns', {}).get(column_name)
+        if encoding is None:
+            return {}
+        kind, dictionary = encoding
+        if kind != 'dict':
+            raise ValueError(f"{table_name}.{column_name} is not dictionary-encoded")
+        return self._dictionary(dictionary)[1]
+
+    def _encode(self, kind, dictionary, values):
+        """Returns {suffix: array} for one column of a part."""
+        if kind == 'float':
+            return {'': np.array([np.nan if v is None else v for v in values], dtype=np.float64)}
+        if kind == 'bool':
+            return {'': np.array([-1 if v is None else int(bool(v)) for v in values], dtype=np.int8)}
+        if kind == 'int':
+            valid = np.array([v is not None for v in values], dtype=bool)
+            encoded = {'': np.array([0 if v is None else int(v) for v in values], dtype=np.int64)}
+            if not valid.all():
+                encoded['.valid'] = valid
+            return encoded
+        dictionary_values, codes = self._dictionary(dictionary)
+        column_codes = np.empty(len(values), dtype=np.int32)
+        for row, value in enumerate(values):
+            if value is None:
+                column_codes[row] = -1
+                continue
+            value = str(value)
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(dictionary_values)
+                dictionary_values.append(value)
+            column_codes[row] = code
+        return {'': column_codes}
+
+    def append(self, table, rowids, rows, partition=None):
+        """
+        Writes `rows` (tuples in `table.columns` order, with their rowids in the main database
+        or the season partition `partition`) as a new part of `table`.
+        """
+        entry = self.manifest['tables'].setdefault(table.name, {
+            'columns': {column.name: column_encoding(table.name, column) for column in table.columns},
+            'parts': [], 'rows': 0, 'last_rowid': 0,
+        })
+        part = f"part-{len(entry['parts']):05d}"
+        part_dir = os.path.join(self.path, table.name, part)
+        os.makedirs(part_dir, exist_ok=True)
+        for index, column in enumerate(table.columns):
+            kind, dictionary = entry['columns'][column.name]
+            for suffix, array in self._encode(kind, dictionary, [row[index] for row in rows]).items():
+                np.save(os.path.join(part_dir, f'{column.name}{suffix}.npy'), array)
+        entry['parts'].append({'name': part, 'rows': len(rows)})
+        entry['rows'] += len(rows)
+        if partition is None:
+            entry['last_rowid'] = rowids[-1]
+        else:
+            entry.setdefault('partition_rowids', {})[partition] = rowids[-1]
+
+    def commit(self):
+        os.makedirs(os.path.join(self.path, 'dictionaries'), exist_ok=True)
+        for name, (values, _) in self._dictionaries.items():
+            _write_json(os.path.join(self.path, 'dictionaries', f'{name}.json'), values)
+        _write_json(os.path.join(self.path, MANIFEST), self.manifest)
+
+
+class SnapshotTable:
+    """One table of a snapshot, every column memory-mapped read-only part by part."""
+
+    def __init__(self, snapshot, name, entry):
+        self.snapshot = snapshot
+        self.name = name
+        self.columns = {column: tuple(encoding) for column, encoding in entry['columns'].items()}
+        self.parts = [part['name'] for part in entry['parts']]
+        self.rows = entry['rows']
+
+    def __len__(self):
+        return self.rows
+
+    def _load(self, part, file_name):
+        path = os.path.join(self.snapshot.path, self.name, part, f'{file_name}.npy')
+        return np.load(path, mmap_mode='r') if os.path.exists(path) else None
+
+    def column_parts(self, column):
+        """The column's arrays, one memory map per part (zero-copy)."""
+        return [self._load(part, column) for part in self.parts]
+
+    def column(self, column):
+        """The whole column; a memory map if the snapshot has one part, else a concatenated copy."""
+        parts = self.column_parts(column)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def valid(self, column):
+        """Boolean mask of non-NULL values."""
+        kind, _ = self.columns[column]
+        if kind == 'int':
+            masks = [self._load(part, f'{column}.valid') for part in self.parts]
+            return np.concatenate([np.ones(rows, dtype=bool) if mask is None else mask
+                                   for mask, rows in zip(masks, map(len, self.column_parts(column)))]) \
+                if masks else np.empty(0, dtype=bool)
+        values = self.column(column)
+        return ~np.isnan(values) if kind == 'float' else values >= 0
+
+    def dictionary(self, column):
+        """The values a dictionary-encoded column's codes index into."""
+        kind, dictionary = self.columns[column]
+        if kind != 'dict':
+            raise ValueError(f"{self.name}.{column} is not dictionary-encoded")
+        return self.snapshot.dictionary(dictionary)
+
+    def decode(self, column, codes=None):
+        """Decodes codes (default: the whole column) back to strings, None for NULL."""
+        values = self.dictionary(column)
+        codes = self.column(column) if codes is None else codes
+        return [values[code] if code >= 0 else None for code in codes]
+
+
+class Snapshot:
+    """Read side of a snapshot directory written by bin/export_snapshot."""
+
+    def __init__(self, path):
+        self.path = path
+        manifest = _read_json(os.path.join(path, MANIFEST), None)
+        if manifest is None:
+            raise FileNotFoundError(f"No snapshot manifest in {path}")
+        self.tables = {name: SnapshotTable(self, name, entry) for name, entry in manifest['tables'].items()}
+        self._dictionaries = {}
+
+    def __getitem__(self, table_name):
+        return self.tables[table_name]
+
+    def dictionary(self, name):
+        if name not in self._dictionaries:
+            self._dictionaries[name] = _read_json(os.path.join(self.path, 'dictionaries', f'{name}.json'), [])
+        return self._dictionaries[name]
+
+
+def load_snapshot(path):
+    return Snapshot(path)
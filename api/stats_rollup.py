@@ -0,0 +1,172 @@
+from collections import defaultdict
+from itertools import product
+
+from sqlalchemy import bindparam, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .draft_action_model import DraftAction
+from .partitions import in_partition
+from .scoreboard_game_model import ScoreboardGame
+from .stats_rollup_model import ALL, ChampionStat, RolledUpGame, TeamStat
+
+SIDES = {1: 'blue', 2: 'red'}
+TEAM_COUNTERS = ('Games', 'Wins')
+CHAMPION_COUNTERS = ('Picks', 'Bans', 'Wins')
+
+
+def _slices(patch, tournament, side):
+    """Every (patch, tournament, side) slice a game or action falls into."""
+    return product((patch or '', ALL), (tournament or '', ALL), (side, ALL))
+
+
+def _add_increments(session, model, counters, increments):
+    """Upserts `increments` ({primary key tuple: counter values}), adding to the stored counters."""
+    if not increments:
+        return
+    key_columns = [column.name for column in model.__table__.primary_key.columns]
+    stmt = sqlite_insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={name: getattr(model, name) + getattr(stmt.excluded, name) for name in counters},
+    )
+    rows = [dict(zip(key_columns, key), **dict(zip(counters, values))) for key, values in increments.items()]
+    session.connection().execute(stmt, rows)
+
+
+def _counted(session, game_ids):
+    return {game_id for (game_id,) in session.query(RolledUpGame.GameId).filter(RolledUpGame.GameId.in_(game_ids))}
+
+
+def _increments(session, game_ids, schema=None):
+    """
+    The (TeamStats, ChampionStats) counters the given games add, from their stored rows, and
+    the GameIds of the games found.
+    """
+    games = session.query(
+        ScoreboardGame.GameId, ScoreboardGame.Patch, ScoreboardGame.Tournament,
+        ScoreboardGame.Team1, ScoreboardGame.Team2, ScoreboardGame.Winner,
+    ).filter(ScoreboardGame.GameId.in_(game_ids)).execution_options(**in_partition(schema)).all()
+
+    teams = defaultdict(lambda: [0, 0]) # games, wins
+    for _, patch, tournament, team1, team2, winner in games:
+        for side, team in ((1, team1), (2, team2)):
+            for slice_key in _slices(patch, tournament, SIDES[side]):
+                for team_key in ((team, ALL) if team else (ALL,)):
+                    if team_key == ALL and slice_key[2] == ALL:
+                        # The all-teams, all-sides row counts each game once, won if it has a winner
+                        if side == 2:
+                            continue
+                        won = winner in SIDES
+                    else:
+                        won = winner == side
+                    stat = teams[slice_key + (team_key,)]
+                    stat[0] += 1
+                    stat[1] += int(won)
+
+    game_slices = {game_id: (patch, tournament) for game_id, patch, tournament, *_ in games}
+    champions = defaultdict(lambda: [0, 0, 0]) # picks, bans, wins
+    actions = session.query(DraftAction.GameId, DraftAction.Side, DraftAction.ActionType, DraftAction.Champion, DraftAction.Won) \
+        .filter(DraftAction.GameId.in_(game_ids)).execution_options(**in_partition(schema))
+    for game_id, side, action_type, champion, won in actions:
+        if game_id not in game_slices or side not in SIDES:
+            continue
+        for slice_key in _slices(*game_slices[game_id], SIDES[side]):
+            stat = champions[slice_key + (champion,)]
+            if action_type == 'pick':
+                stat[0] += 1
+                stat[2] += int(bool(won))
+            else:
+                stat[1] += 1
+
+    return teams, champions, set(game_slices)
+
+
+def update_rollups(session, game_ids, schema=None):
+    """
+    Adds the given games to ChampionStats and TeamStats, skipping games already counted.
+
+    Reads the games' ScoreboardGames and DraftActions rows (from the season partition
+    `schema` if given), so call it once those are written, in the same transaction.
+    Games without a ScoreboardGames row there aren't recorded as counted, so a later call
+    adds them once they are stored. Returns the number of games added.
+    """
+    game_ids = set(game_ids)
+    if not game_ids:
+        return 0
+    new_ids = list(game_ids - _counted(session, game_ids))
+    if not new_ids:
+        return 0
+
+    teams, champions, found = _increments(session, new_ids, schema)
+    if not found:
+        return 0
+    _add_increments(session, TeamStat, TEAM_COUNTERS, teams)
+    _add_increments(session, ChampionStat, CHAMPION_COUNTERS, champions)
+    session.connection().execute(sqlite_insert(RolledUpGame).on_conflict_do_nothing(), [{'GameId': game_id} for game_id in found])
+    return len(found)
+
+
+def remove_from_rollups(session, game_ids, schema=None):
+    """
+    Takes the given games back out of ChampionStats and TeamStats, e.g. before their rows are
+    corrected; update_rollups() then counts them again. Reads the rows still stored, so call
+    it before they are rewritten, in the same transaction. Returns the number of games removed.
+    """
+    counted = list(_counted(session, set(game_ids)))
+    if not counted:
+        return 0
+    teams, champions, found = _increments(session, counted, schema)
+    if not found:
+        return 0
+    for model, counters, increments in zip((TeamStat, ChampionStat), (TEAM_COUNTERS, CHAMPION_COUNTERS), (teams, champions)):
+        _add_increments(session, model, counters, {key: [-value for value in values] for key, values in increments.items()})
+        # Slices no game falls into anymore
+        key_columns = model.__table__.primary_key.columns
+        stmt = delete(model).where(*(column == bindparam(f'key_{column.name}') for column in key_columns),
+                                   *(getattr(model, name) == 0 for name in counters))
+        session.connection().execute(stmt, [{f'key_{column.name}': value for column, value in zip(key_columns, key)} for key in increments])
+    session.connection().execute(delete(RolledUpGame).where(RolledUpGame.GameId.in_(found)))
+    return len(found)
+
+
+def _rate(count, total):
+    return round(count / total, 4) if total else None
+
+
+def champion_stats(session, patch=ALL, tournament=ALL, side=ALL, champion=None):
+    """Champion pick/ban/win counts and rates for one slice, most present first."""
+    slice_games = session.get(TeamStat, (patch, tournament, side, ALL))
+    games = slice_games.Games if slice_games else 0
+    query = session.query(ChampionStat).filter(
+        ChampionStat.Patch == patch, ChampionStat.Tournament == tournament, ChampionStat.Side == side,
+    )
+    if champion is not None:
+        query = query.filter(ChampionStat.Champion == champion)
+    champions = [{
+        "champion": stat.Champion,
+        "picks": stat.Picks,
+        "bans": stat.Bans,
+        "wins": stat.Wins,
+        "pick_rate": _rate(stat.Picks, games),
+        "ban_rate": _rate(stat.Bans, games),
+        "presence": _rate(stat.Picks + stat.Bans, games),
+        "win_rate": _rate(stat.Wins, stat.Picks),
+    } for stat in query]
+    champions.sort(key=lambda c: (-(c["picks"] + c["bans"]), c["champion"]))
+    return {"patch": patch, "tournament": tournament, "side": side, "games": games, "champions": champions}
+
+
+def team_stats(session, patch=ALL, tournament=ALL, side=ALL, team=None):
+    """Team games and win rates for one slice, most games first."""
+    query = session.query(TeamStat).filter(
+        TeamStat.Patch == patch, TeamStat.Tournament == tournament, TeamStat.Side == side,
+    )
+    query = query.filter(TeamStat.Team == team) if team is not None else query.filter(TeamStat.Team != ALL)
+    teams = [{
+        "team": stat.Team,
+        "games": stat.Games,
+        "wins": stat.Wins,
+        "win_rate": _rate(stat.Wins, stat.Games),
+    } for stat in query]
+    teams.sort(key=lambda t: (-t["games"], t["team"]))
+    return {"patch": patch, "tournament": tournament, "side": side, "teams": teams}
@@ -0,0 +1,44 @@
+from sqlalchemy import Column, Integer, String
+from .models_base import Base
+
+# Slice value meaning "any": the rollups hold every combination of a game's
+# patch, tournament and side with ALL, so each slice is a single row lookup.
+ALL = '*'
+
+class ChampionStat(Base):
+    """Pick, ban and win counts of a champion within one (patch, tournament, side) slice."""
+    __tablename__ = "ChampionStats"
+
+    Patch = Column(String, primary_key=True)
+    Tournament = Column(String, primary_key=True)
+    Side = Column(String, primary_key=True) # 'blue', 'red' or ALL
+    Champion = Column(String, primary_key=True)
+    Picks = Column(Integer, nullable=False, default=0)
+    Bans = Column(Integer, nullable=False, default=0)
+    Wins = Column(Integer, nullable=False, default=0) # games won when picked
+
+    def __repr__(self):
+        return f"<ChampionStat(Patch='{self.Patch}', Tournament='{self.Tournament}', Side='{self.Side}', Champion='{self.Champion}')>"
+
+class TeamStat(Base):
+    """
+    Games played and won by a team within one (patch, tournament, side) slice.
+    The Team = ALL row of a slice counts the slice's games, the denominator of the champion rates.
+    """
+    __tablename__ = "TeamStats"
+
+    Patch = Column(String, primary_key=True)
+    Tournament = Column(String, primary_key=True)
+    Side = Column(String, primary_key=True)
+    Team = Column(String, primary_key=True)
+    Games = Column(Integer, nullable=False, default=0)
+    Wins = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TeamStat(Patch='{self.Patch}', Tournament='{self.Tournament}', Side='{self.Side}', Team='{self.Team}')>"
+
+class RolledUpGame(Base):
+    """Games already counted in the rollups, so a game is never added twice."""
+    __tablename__ = "RolledUpGames"
+
+    GameId = Column(String, primary_key=True)
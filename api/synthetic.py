@@ -0,0 +1,188 @@
+"""
+Deterministic synthetic ScoreboardGames / PicksAndBansS7 rows for benchmarks.
+
+Games are grouped into best-of series of tournaments, carry a legal draft (20 distinct
+champions in tournament order, roles per pick, picks in role order in the ScoreboardGames
+lists) and plausible stats, so every endpoint and the collector see realistic shapes.
+The same seed always gives the same rows.
+"""
+import random
+from itertools import accumulate
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from .draft_actions import DRAFT_SEQUENCE, ROLES, build_draft_actions, insert_draft_actions
+from .models_base import Base
+from .picks_and_bans_model import PicksAndBansS7Model
+from .scoreboard_game_model import ScoreboardGame
+from .game_documents import write_game_documents
+from .search_index import update_search_index
+from .stats_rollup import update_rollups
+
+_CHAMPION_NAMES = (
+    "Aatrox Ahri Akali Akshan Alistar Amumu Anivia Annie Aphelios Ashe Aurelion_Sol Aurora Azir Bard Bel'Veth "
+    "Blitzcrank Brand Braum Briar Caitlyn Camille Cassiopeia Cho'Gath Corki Darius Diana Dr._Mundo Draven Ekko "
+    "Elise Evelynn Ezreal Fiddlesticks Fiora Fizz Galio Gangplank Garen Gnar Gragas Graves Gwen Hecarim "
+    "Heimerdinger Hwei Illaoi Irelia Ivern Janna Jarvan_IV Jax Jayce Jhin Jinx K'Sante Kai'Sa Kalista Karma "
+    "Karthus Kassadin Katarina Kayle Kayn Kennen Kha'Zix Kindred Kled Kog'Maw LeBlanc Lee_Sin Leona Lillia "
+    "Lissandra Lucian Lulu Lux Malphite Malzahar Maokai Master_Yi Milio Miss_Fortune Mordekaiser Morgana Naafiri "
+    "Nami Nasus Nautilus Neeko Nidalee Nilah Nocturne Nunu_&_Willump Olaf Orianna Ornn Pantheon Poppy Pyke Qiyana "
+    "Quinn Rakan Rammus Rek'Sai Rell Renata_Glasc Renekton Rengar Riven Rumble Ryze Samira Sejuani Senna "
+    "Seraphine Sett Shaco Shen Shyvana Singed Sion Sivir Skarner Smolder Sona Soraka Swain Sylas Syndra Tahm_Kench "
+    "Taliyah Talon Taric Teemo Thresh Tristana Trundle Tryndamere Twisted_Fate Twitch Udyr Urgot Varus Vayne Veigar "
+    "Vel'Koz Vex Vi Viego Viktor Vladimir Volibear Warwick Wukong Xayah Xerath Xin_Zhao Yasuo Yone Yorick Yuumi "
+    "Zac Zed Zeri Ziggs Zilean Zoe Zyra"
+)
+CHAMPIONS = tuple(name.replace('_', ' ') for name in _CHAMPION_NAMES.split())
+LEAGUES = ('LCK', 'LPL', 'LEC', 'LCS', 'PCS', 'VCS', 'CBLOL', 'LJL', 'LLA', 'TCL')
+SPLITS = ('Spring', 'Summer')
+TEAMS_PER_LEAGUE = 10
+START_DATE = datetime(2015, 1, 10, 9, 0)
+
+
+def _team_name(league, index):
+    return f"{league} Team {index + 1}"
+
+
+def _popularity(seed, patch):
+    """Cumulative pick weights of CHAMPIONS on a patch: a few dominate, like a real meta."""
+    patch_rng = random.Random(f"{seed}-{patch}")
+    return list(accumulate(patch_rng.paretovariate(1.2) for _ in CHAMPIONS))
+
+
+def _draft(rng, cum_weights):
+    """Tournament-order draft: 20 distinct champions, popular ones more likely."""
+    chosen = {}
+    while len(chosen) < len(DRAFT_SEQUENCE):
+        for champion in rng.choices(CHAMPIONS, cum_weights=cum_weights, k=len(DRAFT_SEQUENCE)):
+            chosen.setdefault(champion)
+    return {step[0]: champion for step, champion in zip(DRAFT_SEQUENCE, chosen)}
+
+
+def generate_games(count, seed=0):
+    """Yields (ScoreboardGames row, PicksAndBansS7 row) dicts keyed by column name, oldest game first."""
+    rng = random.Random(seed)
+    date = START_DATE
+    games = 0
+    series = 0
+    popularity = {}
+    while games < count:
+        year = date.year
+        split = SPLITS[0] if date.month <= 6 else SPLITS[1]
+        league = rng.choice(LEAGUES)
+        tournament = f"{league} {year} {split}"
+        # Champion popularity drifts per patch; one patch every ~2 weeks, 24 per season
+        patch_number = min(24, (date.timetuple().tm_yday - 1) // 15 + 1)
+        patch = f"{year - 2010}.{patch_number}"
+        if patch not in popularity:
+            popularity = {patch: _popularity(seed, patch)}
+
+        team1, team2 = rng.sample(range(TEAMS_PER_LEAGUE), 2)
+        teams = (_team_name(league, team1), _team_name(league, team2))
+        strength = rng.uniform(0.35, 0.65)
+        best_of = rng.choice((1, 1, 3, 3, 5))
+        wins = [0, 0]
+        series += 1
+        match_id = f"{tournament}_Week {series % 9 + 1}_{series}"
+        game_in_match = 0
+        while max(wins) <= best_of // 2 and games < count:
+            game_in_match += 1
+            games += 1
+            date += timedelta(minutes=rng.randint(35, 75))
+            # Sides alternate inside a series
+            blue, red = teams if game_in_match % 2 else teams[::-1]
+            winner = 1 if (rng.random() < strength) == (blue == teams[0]) else 2
+            wins[0 if (winner == 1) == (blue == teams[0]) else 1] += 1
+            yield _game_rows(rng, tournament, match_id, game_in_match, date, patch, blue, red, winner, _draft(rng, popularity[patch]))
+        # Next series later the same day or a few days later
+        date += timedelta(hours=rng.choice((1, 2, 26, 50, 74)))
+
+
+def _game_rows(rng, tournament, match_id, game_in_match, date, patch, blue, red, winner, draft):
+    game_id = f"{match_id}_{game_in_match}"
+    minutes = rng.uniform(22, 42)
+    sg = {
+        'OverviewPage': tournament.replace(' ', '_'), 'Tournament': tournament,
+        'Team1': blue, 'Team2': red,
+        'WinTeam': blue if winner == 1 else red, 'LossTeam': red if winner == 1 else blue,
+        'DateTime_UTC': date.strftime('%Y-%m-%d %H:%M:%S'), 'DST': 'no',
+        'Team1Score': None, 'Team2Score': None, 'Winner': winner,
+        'Gamelength': f"{int(minutes)}:{int(minutes % 1 * 60):02d}", 'Gamelength_Number': round(minutes, 2),
+        'Patch': patch, 'PatchSort': '{:0>2}.{:0>2}'.format(*patch.split('.')),
+        'N_GameInMatch': game_in_match, 'N_MatchInTab': 1, 'N_MatchInPage': 1, 'N_Page': 1,
+        'GameId': game_id, 'MatchId': match_id, 'UniqueLine': f"{game_id}_1",
+        'VOD': f"[https://example.invalid/vod/{game_id.replace(' ', '_')} VOD]",
+        'MatchHistory': f"https://example.invalid/match/{rng.getrandbits(40)}",
+        'RiotPlatformGameId': f"ESPORTSTMNT01_{rng.getrandbits(32)}", 'RiotPlatformId': 'ESPORTSTMNT01',
+        'RiotGameId': str(rng.getrandbits(32)), 'RiotHash': f"{rng.getrandbits(64):016x}", 'RiotVersion': 5,
+        'Gamename': f"Game {game_in_match}",
+    }
+    pb = {
+        'UniqueLine': f"{game_id}_pb", 'GameId': game_id, 'MatchId': match_id, 'Team1': blue, 'Team2': red,
+        'Winner': winner, 'OverviewPage': sg['OverviewPage'], 'Phase': 'Game', 'IsComplete': True, 'IsFilled': True,
+        'Tab': 'Week 1', 'N_Page': 1, 'N_TabInPage': 1, 'N_MatchInPage': 1, 'N_GameInPage': game_in_match,
+        'N_GameInMatch': game_in_match, 'N_MatchInTab': 1, 'N_GameInTab': game_in_match, 'GameID_Wiki': game_id,
+    }
+    pb.update(draft)
+    for side, team in ((1, blue), (2, red)):
+        won = winner == side
+        roles = rng.sample(ROLES, len(ROLES))
+        for slot, role in enumerate(roles, start=1):
+            pb[f'Team{side}Role{slot}'] = role
+        picks_by_role = {role: draft[f'Team{side}Pick{slot}'] for slot, role in enumerate(roles, start=1)}
+        sg[f'Team{side}Picks'] = ','.join(picks_by_role[role] for role in ROLES)
+        sg[f'Team{side}Bans'] = ','.join(draft[f'Team{side}Ban{slot}'] for slot in range(1, 6))
+        sg[f'Team{side}Players'] = ','.join(f"{team.split(' Team ')[0]}{team.split(' Team ')[1]} {role}" for role in ROLES)
+        sg[f'Team{side}Kills'] = rng.randint(12, 30) if won else rng.randint(2, 18)
+        sg[f'Team{side}Gold'] = round(rng.uniform(55, 75) if won else rng.uniform(40, 62), 1)
+        sg[f'Team{side}Towers'] = rng.randint(7, 11) if won else rng.randint(0, 6)
+        sg[f'Team{side}Inhibitors'] = rng.randint(1, 3) if won else rng.randint(0, 1)
+        sg[f'Team{side}Dragons'] = rng.randint(2, 5) if won else rng.randint(0, 3)
+        sg[f'Team{side}Barons'] = rng.randint(0, 2) if won else rng.randint(0, 1)
+        sg[f'Team{side}RiftHeralds'] = rng.randint(0, 1)
+        sg[f'Team{side}VoidGrubs'] = rng.randint(0, 6)
+        sg[f'Team{side}Atakhans'] = rng.randint(0, 1)
+    return sg, pb
+
+
+def write_database(path, count, seed=0, batch_size=5000, derived=False):
+    """
+    Creates (or extends) a SQLite database at `path` with `count` synthetic games. Returns the number written.
+
+    With `derived`, every model table is created and DraftActions, the stats rollups, the
+    search index and the game documents are filled too, giving a database the API can serve as is; without it only the two Cargo
+    tables are written, as the collector benchmark's Cargo source.
+    """
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=None if derived else [ScoreboardGame.__table__, PicksAndBansS7Model.__table__])
+    sg_columns = ScoreboardGame.__table__.columns.keys()
+    pb_columns = PicksAndBansS7Model.__table__.columns.keys()
+    batch = []
+
+    def flush():
+        with Session(engine) as session, session.begin():
+            connection = session.connection()
+            connection.exec_driver_sql("PRAGMA synchronous = OFF")
+            connection.execute(ScoreboardGame.__table__.insert().prefix_with('OR IGNORE'),
+                               [{column: sg.get(column) for column in sg_columns} for sg, _ in batch])
+            connection.execute(PicksAndBansS7Model.__table__.insert().prefix_with('OR IGNORE'),
+                               [{column: pb.get(column) for column in pb_columns} for _, pb in batch])
+            if derived:
+                insert_draft_actions(session, [action for sg, pb in batch for action in build_draft_actions(sg, pb)])
+                update_rollups(session, [sg['GameId'] for sg, _ in batch])
+                update_search_index(session, [sg['GameId'] for sg, _ in batch])
+                write_game_documents(session, [sg['GameId'] for sg, _ in batch])
+        batch.clear()
+
+    written = 0
+    for rows in generate_games(count, seed):
+        batch.append(rows)
+        written += 1
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    engine.dispose()
+    return written
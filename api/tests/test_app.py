@@ -1,3 +1,4 @@
+import json
 import pytest
 import os
 
@@ -86,3 +87,161 @@ def test_echo_path(client):
     response_no_message = client.post("/echo", json={})
     assert response_no_message.status_code == 400
     assert response_no_message.get_json()["error"] == "No message provided"
+
+def test_pool_metrics(client):
+    """Pool metrics are exposed, and the request's session is returned to the pool afterwards."""
+    client.get("/games/2025 Mid-Season Invitational_Play-In Day 2_2_1")
+    response = client.get("/metrics/pool")
+    assert response.status_code == 200
+
+    metrics = response.get_json()["read_only"]
+    assert metrics["checkouts"] >= 1
+    assert metrics["checked_out"] == 0
+    assert {"overflow", "wait_seconds_avg", "wait_seconds_max"} <= metrics.keys()
+
+def test_list_games_keyset_pagination(client):
+    """Pages follow (DateTime_UTC, GameId) descending and the cursors cover every game exactly once."""
+    seen = []
+    cursor = None
+    while True:
+        response = client.get("/games", query_string={"limit": 3, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        data = response.get_json()
+        seen.extend(game["id"] for game in data["games"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 10 and len(set(seen)) == 10
+    assert seen[0] == "2025 Mid-Season Invitational_Play-In Day 3_1_5"
+    assert seen[-1] == "2025 Mid-Season Invitational_Play-In Day 2_1_5"
+
+def test_list_games_filters(client):
+    data = client.get("/games?team=Bilibili Gaming&from=2025-06-29&to=2025-06-29").get_json()
+    assert [game["id"] for game in data["games"]] == [
+        "2025 Mid-Season Invitational_Play-In Day 2_2_3",
+        "2025 Mid-Season Invitational_Play-In Day 2_2_2",
+        "2025 Mid-Season Invitational_Play-In Day 2_2_1",
+    ]
+    assert data["games"][2]["blue"]["picks"] == ["Rumble", "Xin Zhao", "Annie", "Miss Fortune", "Alistar"]
+    assert client.get("/games?tournament=MSI 2025&patch=25.12").get_json()["games"] == []
+    assert client.get("/games?cursor=not-a-cursor").status_code == 400
+
+def test_list_games_ndjson(client):
+    response = client.get("/games?format=ndjson&tournament=MSI 2025")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 9
+    assert json.loads(lines[0])["id"] == "2025 Mid-Season Invitational_Play-In Day 3_1_5"
+
+def test_get_game_details_etag(client):
+    """Game responses carry an ETag and a matching If-None-Match gets a 304."""
+    game_id = "2025 Mid-Season Invitational_Play-In Day 2_2_1"
+    response = client.get(f"/games/{game_id}")
+    etag = response.headers["ETag"]
+    # Corrected games must reach clients: stored responses are revalidated, cheaply with the ETag
+    assert response.headers["Cache-Control"] == "public, no-cache"
+
+    cached = client.get(f"/games/{game_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b""
+
+    changed = client.get(f"/games/{game_id}", headers={"If-None-Match": '"stale"'})
+    assert changed.status_code == 200
+    assert changed.get_json() == response.get_json()
+
+def test_get_game_details_msgpack(client):
+    """The Accept header selects msgpack, with its own ETag."""
+    import msgpack
+    game_id = "2025 Mid-Season Invitational_Play-In Day 2_2_1"
+    as_json = client.get(f"/games/{game_id}")
+    response = client.get(f"/games/{game_id}", headers={"Accept": "application/msgpack, application/json;q=0.5"})
+    assert response.status_code == 200
+    assert response.content_type == "application/msgpack"
+    assert response.headers["Vary"] == "Accept"
+    assert msgpack.unpackb(response.data) == as_json.get_json()
+    assert response.headers["ETag"] != as_json.headers["ETag"]
+    assert len(response.data) < len(as_json.data)
+
+    browser = client.get(f"/games/{game_id}", headers={"Accept": "text/html,*/*;q=0.8"})
+    assert browser.content_type == "application/json"
+
+def test_get_games_batch(client):
+    """Batch lookups keep request order and report unknown ids per item."""
+    ids = [
+        "2025 Mid-Season Invitational_Play-In Day 3_1_1",
+        "missing_game",
+        "2025 Mid-Season Invitational_Play-In Day 2_2_1",
+    ]
+    response = client.post("/games:batch", json={"ids": ids})
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [r["id"] for r in results] == ids
+    assert [r["status"] for r in results] == [200, 404, 200]
+    assert results[1]["error"] == "Game not found"
+    assert results[2]["game"] == client.get(f"/games/{ids[2]}").get_json()
+
+    assert client.post("/games:batch", json={"ids": "not-a-list"}).status_code == 400
+    assert client.post("/games:batch", json={"ids": ["x"] * 501}).status_code == 400
+
+def test_get_game_details_fields_projection(client):
+    """?fields= trims the response and the SELECT; the draft is joined into the same query."""
+    from sqlalchemy import event
+    from api import models_base
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(models_base.read_only_engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/games/2025 Mid-Season Invitational_Play-In Day 3_1_1?fields=id,winner,draft")
+    finally:
+        event.remove(models_base.read_only_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert set(data) == {"id", "winner", "draft"}
+    assert data["draft"]["blue"]["picks"][0] == "Varus"
+    assert data["draft"]["blue"]["roles"][0] == "Bot"
+    assert data["draft"]["red"]["bans"][0] == "Pantheon"
+
+    assert len(statements) == 1
+    assert "JOIN" in statements[0] and "VOD" not in statements[0] and "Team1Players" not in statements[0]
+
+    assert client.get("/games/x?fields=id,nope").status_code == 400
+    assert set(client.get("/games?limit=2&fields=id,patch").get_json()["games"][0]) == {"id", "patch"}
+
+def test_similar_drafts(client):
+    game_id = "2025 Mid-Season Invitational_Play-In Day 2_2_1"
+    response = client.get(f"/drafts/similar?game_id={game_id}&k=3")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["query"]["picks"][:2] == ["Rumble", "Xin Zhao"]
+    results = data["results"]
+    assert len(results) == 3 and game_id not in [r["id"] for r in results]
+    assert results[0]["similarity"] >= results[-1]["similarity"]
+    assert results[0]["game"]["id"] == results[0]["id"]
+
+    by_picks = client.get("/drafts/similar?picks=Rumble,Xin Zhao,Annie,Miss Fortune,Alistar,Ornn,Pantheon,Aurora,Ezreal,Leona"
+                          "&bans=Twisted Fate,Azir,Varus,Braum,Kai'Sa,Poppy,Taliyah,Wukong,Kalista,Xayah&k=1").get_json()
+    assert by_picks["results"][0]["id"] == game_id
+    assert by_picks["results"][0]["similarity"] == 1.0
+
+    assert client.get("/drafts/similar").status_code == 400
+    assert client.get("/drafts/similar?game_id=missing").status_code == 404
+
+def test_requests_report_timings_and_metrics(client):
+    response = client.get("/games?limit=2&fields=id,draft")
+    assert response.status_code == 200
+    assert response.headers["X-SQL-Statements"] == "1"
+    assert [part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")] == \
+        ["db", "hydrate", "serialize", "app", "total"]
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    body = response.get_data(as_text=True)
+    assert 'api_requests_total{endpoint="list_games",method="GET",status="200"}' in body
+    assert 'api_request_phase_seconds_count{endpoint="list_games",phase="hydrate"}' in body
+    assert 'api_request_sql_statements_bucket{endpoint="list_games",le="1"}' in body
+    assert 'db_pool_checkouts{engine="read_only"}' in body
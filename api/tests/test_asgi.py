@@ -0,0 +1,97 @@
+import asyncio
+import json
+import os
+
+TEST_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'league_data.db')
+os.environ['LEAGUE_DB_PATH'] = TEST_DB_PATH
+
+from api.app import REQUESTS, app as flask_app
+from api.asgi import app as asgi_app
+
+GAME_ID = "2025 Mid-Season Invitational_Play-In Day 2_2_1"
+
+
+def asgi_request(method, path, query=b"", body=b"", headers=()):
+    """Calls the ASGI app directly; returns (status, headers, body)."""
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http', 'path': path,
+        'raw_path': path.encode(), 'query_string': query, 'root_path': '',
+        'headers': [(name.lower().encode(), value.encode()) for name, value in headers],
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 12345),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi_app(scope, receive, send))
+    start = messages[0]
+    return (start['status'], {name.decode(): value.decode() for name, value in start['headers']},
+            b''.join(message.get('body', b'') for message in messages[1:]))
+
+
+def test_native_game_matches_flask():
+    client = flask_app.test_client()
+    for query in (b"", b"fields=id,winner"):
+        expected = client.get(f"/games/{GAME_ID}", query_string=query.decode())
+        status, headers, body = asgi_request('GET', f"/games/{GAME_ID}", query)
+        assert status == 200
+        assert json.loads(body) == expected.get_json()
+        assert headers['etag'] == expected.headers['ETag']
+
+    _, headers, _ = asgi_request('GET', f"/games/{GAME_ID}")
+    status, _, body = asgi_request('GET', f"/games/{GAME_ID}", headers=[('If-None-Match', headers['etag'])])
+    assert (status, body) == (304, b"")
+    for validators in (f'W/{headers["etag"]}', f'"other", {headers["etag"]}', '*'):
+        assert asgi_request('GET', f"/games/{GAME_ID}", headers=[('If-None-Match', validators)])[0] == 304
+        assert flask_app.test_client().get(f"/games/{GAME_ID}", headers={'If-None-Match': validators}).status_code == 304
+    assert asgi_request('GET', f"/games/{GAME_ID}", headers=[('If-None-Match', 'W/"other"')])[0] == 200
+
+    status, headers, body = asgi_request('GET', f"/games/{GAME_ID}", headers=[('Accept', 'application/msgpack')])
+    assert (status, headers['content-type']) == (200, 'application/msgpack')
+
+    status, _, body = asgi_request('GET', "/games/non_existent_game_id_12345")
+    assert status == 404
+    assert json.loads(body) == {"error": "Game not found"}
+
+    status, _, _ = asgi_request('GET', f"/games/{GAME_ID}", b"fields=nope")
+    assert status == 400
+
+
+def test_native_game_reports_timings():
+    # A projection isn't cached, so its game is read on the executor, where the timings must follow
+    expected = flask_app.test_client().get(f"/games/{GAME_ID}", query_string="fields=id,winner")
+    _, headers, _ = asgi_request('GET', f"/games/{GAME_ID}", b"fields=id,winner")
+    assert headers['x-sql-statements'] == expected.headers['X-SQL-Statements'] != '0'
+    phases = dict(phase.split(';dur=') for phase in headers['server-timing'].split(', '))
+    assert list(phases) == ['db', 'hydrate', 'serialize', 'app', 'total']
+    assert float(phases['db']) > 0
+
+    status, headers, _ = asgi_request('GET', "/games/non_existent_game_id_12345")
+    assert status == 404 and 'server-timing' in headers
+
+
+def test_echo_and_wsgi_fallback():
+    headers = [('Content-Type', 'application/json')]
+    status, _, body = asgi_request('POST', "/echo", body=b'{"message": "hello"}', headers=headers)
+    assert (status, json.loads(body)) == (200, {"echo": "hello"})
+    status, _, body = asgi_request('POST', "/echo", body=b'{}', headers=headers)
+    assert (status, json.loads(body)) == (400, {"error": "No message provided"})
+
+    # Counted and timed like the Flask responses, whichever handler answered
+    counts = {status: REQUESTS.value(endpoint='echo', method='POST', status=status) for status in (200, 400)}
+    _, response_headers, _ = asgi_request('POST', "/echo", body=b'{"message": "hello"}', headers=headers)
+    assert 'server-timing' in response_headers and response_headers['x-sql-statements'] == '0'
+    asgi_request('POST', "/echo", body=b'not json', headers=headers)
+    assert {status: REQUESTS.value(endpoint='echo', method='POST', status=status) for status in (200, 400)} \
+        == {200: counts[200] + 1, 400: counts[400] + 1}
+
+    # Routes without a native handler are served by the Flask app
+    expected = flask_app.test_client().get("/games", query_string={"limit": 2})
+    status, headers, body = asgi_request('GET', "/games", b"limit=2")
+    assert status == 200
+    assert json.loads(body) == expected.get_json()
+    assert 'server-timing' in headers
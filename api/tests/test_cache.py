@@ -0,0 +1,34 @@
+from api.cache import DictBackend, LRUCache, ResponseCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_cache_evicts_least_recently_used_and_expired():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=2, ttl=10, clock=clock)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3) # evicts 'b', the least recently used
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+    clock.now = 10
+    assert cache.get('a') is None
+    assert len(cache) == 1
+
+def test_response_cache_reads_through_and_invalidates_shared_backend():
+    shared = DictBackend()
+    writer = ResponseCache(LRUCache(), shared)
+    reader = ResponseCache(LRUCache(), shared)
+    writer.set('game:G1', ('etag1', b'{"id": "G1"}'))
+    assert reader.get('game:G1') == ('etag1', b'{"id": "G1"}')
+
+    reader.invalidate(['game:G1'])
+    assert reader.get('game:G1') is None
+    assert 'game:G1' not in shared.data
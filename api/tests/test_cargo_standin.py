@@ -0,0 +1,83 @@
+import sqlite3
+
+import pytest
+from mwclient.errors import APIError
+
+from api.cargo_replay import FixtureMissError, RecordingCargoClient, ReplayCargoClient
+from api.cargo_standin import CargoStandIn, SqliteCargo, http_cargo_client, serve_http
+from api.synthetic import generate_games, write_database
+
+
+@pytest.fixture(scope="module")
+def cargo_db(tmp_path_factory):
+    path = tmp_path_factory.mktemp("cargo") / "cargo.db"
+    write_database(str(path), 30, seed=1)
+    return str(path)
+
+
+def test_synthetic_games_are_deterministic_and_have_legal_drafts():
+    first = list(generate_games(20, seed=3))
+    assert first == list(generate_games(20, seed=3))
+    dates = [sg['DateTime_UTC'] for sg, _ in first]
+    assert dates == sorted(dates)
+    for sg, pb in first:
+        champions = [value for column, value in pb.items() if 'Pick' in column or 'Ban' in column]
+        assert len(champions) == len(set(champions)) == 20
+        assert sorted(sg['Team1Picks'].split(',')) == sorted(pb[f'Team1Pick{slot}'] for slot in range(1, 6))
+
+
+def test_sqlite_cargo_answers_joined_queries_like_cargo(cargo_db):
+    rows = SqliteCargo(cargo_db).query(
+        tables="ScoreboardGames=SG, PicksAndBansS7=PB", join_on="SG.GameId=PB.GameId",
+        fields="SG.GameId=GameId, SG.DateTime_UTC=DateTime_UTC, SG.Team1Score=Team1Score, PB.Team1Role1=PBTeam1Role1",
+        where="PB.UniqueLine IS NOT NULL", order_by="SG.DateTime_UTC DESC, SG.GameId DESC", limit=5,
+    )
+    assert len(rows) == 5
+    assert set(rows[0]) == {'GameId', 'DateTime UTC', 'Team1Score', 'PBTeam1Role1'}
+    assert rows[0]['Team1Score'] == '' # NULLs come back as empty strings
+    assert [row['DateTime UTC'] for row in rows] == sorted((row['DateTime UTC'] for row in rows), reverse=True)
+
+
+def test_replay_serves_recorded_responses(cargo_db, tmp_path):
+    params = {'tables': "ScoreboardGames", 'fields': "GameId, Patch", 'order_by': "GameId", 'limit': 10}
+    recorder = RecordingCargoClient(SqliteCargo(cargo_db), str(tmp_path / "fixture.jsonl.gz"))
+    recorded = recorder.query(**params)
+    assert recorder.save() == 1
+
+    replay = ReplayCargoClient(str(tmp_path / "fixture.jsonl.gz"))
+    assert replay.query(**dict(reversed(params.items())), where=None) == recorded
+    with pytest.raises(FixtureMissError):
+        replay.query(**{**params, 'limit': 11})
+
+
+def test_standin_throttles_in_process_and_over_http(cargo_db):
+    standin = CargoStandIn(SqliteCargo(cargo_db), throttle_rate=1.0)
+    with pytest.raises(APIError) as error:
+        standin.query(tables="ScoreboardGames", fields="GameId")
+    assert error.value.code == 'ratelimited'
+
+    standin.throttle_rate = 0.0
+    server = serve_http(standin)
+    try:
+        client = http_cargo_client(f"http://127.0.0.1:{server.server_port}/")
+        rows = client.query(tables="ScoreboardGames", fields="GameId", order_by="GameId", limit=3)
+        assert [row['GameId'] for row in rows] == sorted(row['GameId'] for row in rows)
+        assert len(rows) == 3
+
+        standin.throttle_rate = 1.0
+        with pytest.raises(APIError) as error:
+            client.query(tables="ScoreboardGames", fields="GameId", limit=3)
+        assert error.value.code == 'ratelimited'
+    finally:
+        server.shutdown()
+
+
+def test_synthetic_database_with_derived_tables(tmp_path):
+    path = str(tmp_path / "api.db")
+    assert write_database(path, 12, seed=2, derived=True) == 12
+    with sqlite3.connect(path) as connection:
+        assert connection.execute('SELECT COUNT(*) FROM "DraftActions"').fetchone()[0] == 12 * 20
+        assert connection.execute('SELECT COUNT(*) FROM "RolledUpGames"').fetchone()[0] == 12
+        assert connection.execute(
+            'SELECT "Games" FROM "TeamStats" WHERE "Patch" = \'*\' AND "Tournament" = \'*\' AND "Side" = \'*\' AND "Team" = \'*\''
+        ).fetchone()[0] == 12
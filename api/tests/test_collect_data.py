@@ -0,0 +1,208 @@
+import sqlite3
+from urllib.parse import urlencode
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from api import models_base
+from api.bin import collect_data
+from api.cargo_standin import SqliteCargo
+from api.collection_checkpoint_model import CollectionCheckpoint
+from api.picks_and_bans_model import PicksAndBansS7Model
+from api.rate_limiter import AdaptiveTokenBucket
+from api.scoreboard_game_model import ScoreboardGame
+from api.synthetic import write_database
+
+
+@pytest.fixture()
+def wiki(tmp_path):
+    """A synthetic wiki of 60 games, and a fresh database to collect it into."""
+    path = str(tmp_path / "cargo.db")
+    write_database(path, 60, seed=7)
+    original_url = models_base.DATABASE_URL
+    models_base.configure_engine(f"sqlite:///{tmp_path / 'collected.db'}")
+    models_base.init_db()
+    yield path
+    models_base.configure_engine(original_url)
+
+
+def collect(wiki, limit=0, **options):
+    return collect_data.collect_data(process_limit=limit, cargo_client=SqliteCargo(wiki),
+                                     limiter=AdaptiveTokenBucket(rate=1000, max_rate=1000, capacity=10), **options)
+
+
+def database_state():
+    """Every table's row count, and the checkpoints."""
+    session = models_base.get_session()
+    try:
+        counts = {table.name: session.execute(select(func.count()).select_from(table)).scalar_one()
+                  for table in models_base.Base.metadata.sorted_tables}
+        checkpoints = {c.Direction: (c.DateTime_UTC, c.GameId) for c in session.query(CollectionCheckpoint)}
+        return counts, checkpoints
+    finally:
+        session.close()
+
+
+def fail(*args, **kwargs):
+    raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+
+def test_a_failed_insert_rolls_the_batch_back_and_stops(wiki, monkeypatch):
+    collect(wiki, limit=20)
+    before = database_state()
+    assert before[0]['ScoreboardGames'] == 20
+
+    monkeypatch.setattr(collect_data.SG_ROW_MAPPER, 'insert_or_ignore', fail)
+    assert collect(wiki).sg_rows == 0
+    assert database_state() == before # checkpoint, games and derived rows alike
+
+    monkeypatch.undo()
+    collect(wiki)
+    assert database_state()[0]['ScoreboardGames'] == 60
+
+
+class FlakyCargo(SqliteCargo):
+    """The stand-in, failing every query after the first `working` ones and recording the games it returned."""
+
+    def __init__(self, db_path, working=None):
+        super().__init__(db_path)
+        self.working = working
+        self.game_ids = set()
+
+    def query(self, **params):
+        if self.working is not None:
+            if self.working <= 0:
+                raise ConnectionError("wiki unreachable")
+            self.working -= 1
+        rows = super().query(**params)
+        self.game_ids.update(row['GameId'] for row in rows)
+        return rows
+
+
+def wiki_game_ids(path):
+    """The wiki's games, newest first."""
+    with sqlite3.connect(path) as connection:
+        return [game_id for (game_id,) in connection.execute(
+            'SELECT GameId FROM "ScoreboardGames" ORDER BY DateTime_UTC DESC, GameId DESC')]
+
+
+def stored_game_ids():
+    session = models_base.get_session()
+    try:
+        return {game_id for (game_id,) in session.query(ScoreboardGame.GameId)}
+    finally:
+        session.close()
+
+
+def test_each_direction_resumes_from_its_own_checkpoint(wiki):
+    game_ids = wiki_game_ids(wiki)
+    collect(wiki, limit=20) # backward, from the newest game on the wiki
+    assert stored_game_ids() == set(game_ids[:20])
+    collect(wiki, limit=20)
+    assert stored_game_ids() == set(game_ids[:40])
+    counts, checkpoints = database_state()
+    assert checkpoints[collect_data.BACKWARD][1] == game_ids[39]
+
+    # Without its own checkpoint, a forward run starts after the newest stored game: nothing newer yet
+    assert collect(wiki, direction=collect_data.FORWARD).sg_rows == 0
+    assert database_state()[0] == counts
+    collect(wiki)
+    assert stored_game_ids() == set(game_ids)
+
+
+def test_a_forward_run_starts_from_the_oldest_game(wiki):
+    game_ids = wiki_game_ids(wiki)
+    collect(wiki, limit=20, direction=collect_data.FORWARD)
+    assert stored_game_ids() == set(game_ids[-20:])
+    # and a backward run then starts below the oldest stored game, where there is nothing left
+    assert collect(wiki).sg_rows == 0
+    collect(wiki, direction=collect_data.FORWARD)
+    assert stored_game_ids() == set(game_ids)
+    assert database_state()[1][collect_data.FORWARD][1] == game_ids[0]
+
+
+def test_a_failed_page_is_fetched_again_by_the_next_run(wiki, monkeypatch):
+    monkeypatch.setattr(collect_data.JoinedFetch, 'page_size', 20)
+    game_ids = wiki_game_ids(wiki)
+    first = FlakyCargo(wiki, working=1) # the first page, then the second one's every retry fails
+    collect_data.collect_data(cargo_client=first, limiter=AdaptiveTokenBucket(rate=1000, max_rate=1000, capacity=10))
+    stored = stored_game_ids()
+    assert stored == set(game_ids[:len(stored)])
+    assert database_state()[1][collect_data.BACKWARD][1] == game_ids[len(stored) - 1]
+
+    # The restart picks up below the checkpoint: no game fetched twice, none skipped
+    second = FlakyCargo(wiki)
+    collect_data.collect_data(cargo_client=second, limiter=AdaptiveTokenBucket(rate=1000, max_rate=1000, capacity=10))
+    assert not stored & second.game_ids
+    assert stored_game_ids() == stored | second.game_ids == set(game_ids)
+
+
+def test_in_queries_split_by_encoded_length_and_quote_their_values(tmp_path):
+    # Quotes and commas cost more once URL-encoded, and must come back as the same values
+    values = [f"O'Neil, Cup_{'Week ' * 30}{n}_1_1" for n in range(200)] + ["plain", "it's", "a,b", "''"]
+    queries = collect_data.in_queries({'tables': "ScoreboardGames", 'fields': "GameId"}, "GameId", values, max_values=150)
+    assert len(queries) > 2
+    assert all(len(urlencode(query)) <= collect_data.MAX_QUERY_CHARS for query in queries)
+
+    path = str(tmp_path / "values.db")
+    with sqlite3.connect(path) as connection:
+        connection.execute('CREATE TABLE "ScoreboardGames" (GameId VARCHAR)')
+        connection.executemany('INSERT INTO "ScoreboardGames" VALUES (?)', [(value,) for value in values + ["O'Neil"]])
+    cargo = SqliteCargo(path)
+    chunks = [[row['GameId'] for row in cargo.query(**query)] for query in queries]
+    assert [value for chunk in chunks for value in chunk] == values
+    assert max(map(len, chunks)) <= 150
+
+    assert collect_data.in_queries({'tables': "ScoreboardGames"}, "GameId", [str(n) for n in range(1200)])[0]['where'].count(',') \
+        == collect_data.CARGO_MAX_LIMIT - 1
+
+
+def test_trim_joined_page():
+    page = [{'GameId': 'a'}, {'GameId': 'b'}, {'GameId': 'c'}, {'GameId': 'c'}]
+    assert collect_data.trim_joined_page(page, 4) == page[:2] # c may have more rows on the next page
+    assert collect_data.trim_joined_page(page, 5) == page # the last page holds every row
+    assert collect_data.trim_joined_page(page[2:], 2) == page[2:] # a single game is kept, so paging moves on
+    assert collect_data.first_games(page, 2) == page[:2]
+    assert collect_data.first_games(page, 3) == page
+
+
+def test_a_game_straddling_a_full_page_is_fetched_whole_on_the_next_one(wiki, monkeypatch):
+    game_ids = wiki_game_ids(wiki)
+    with sqlite3.connect(wiki) as connection:
+        # The 5th newest game gets a second PicksAndBansS7 row: rows 5 and 6 of the joined query
+        rows = connection.execute('SELECT * FROM "PicksAndBansS7" WHERE GameId = ?', (game_ids[4],))
+        columns, row = [column[0] for column in rows.description], dict(zip([c[0] for c in rows.description], rows.fetchone()))
+        row['UniqueLine'] += '_2'
+        connection.execute(f'INSERT INTO "PicksAndBansS7" ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})',
+                           [row[column] for column in columns])
+
+    monkeypatch.setattr(collect_data.JoinedFetch, 'page_size', 5)
+    # The first page is trimmed to 4 games; the second has the 5th game's two rows, cut to that game
+    assert collect(wiki, limit=5).api_calls == 2
+    assert stored_game_ids() == set(game_ids[:5])
+    assert database_state()[1][collect_data.BACKWARD][1] == game_ids[4]
+    session = models_base.get_session()
+    try:
+        assert session.query(PicksAndBansS7Model).filter(PicksAndBansS7Model.GameId == game_ids[4]).count() == 2
+    finally:
+        session.close()
+
+
+def test_joined_fetch_makes_fewer_api_calls(wiki):
+    joined = collect(wiki)
+    # One joined query covers all 60 games; the original fetch needed a page, 3 chunks of
+    # 20 PicksAndBansS7 refs, and 2 chunks of 50 each for full ScoreboardGames and PicksAndBansS7 rows
+    assert (joined.api_calls, joined.legacy_api_calls) == (1, 8)
+
+    models_base.init_db()
+    session = models_base.get_session()
+    try:
+        session.query(CollectionCheckpoint).delete()
+        session.query(ScoreboardGame).delete()
+        session.commit()
+    finally:
+        session.close()
+    split = collect(wiki, fetch_mode='split')
+    assert (split.api_calls, split.legacy_api_calls) == (4, 8) # a page, then one IN query each
+    assert split.sg_rows == 60
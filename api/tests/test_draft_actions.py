@@ -0,0 +1,66 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.models_base import Base
+from api.scoreboard_game_model import ScoreboardGame
+from api.picks_and_bans_model import PicksAndBansS7Model
+from api.draft_action_model import DraftAction
+from api.draft_actions import DRAFT_SEQUENCE, build_draft_actions
+from api.bin.backfill import backfill_draft_actions
+
+SG_ROW = {
+    'GameId': 'G1', 'Team1': 'Blue', 'Team2': 'Red', 'Winner': 2, 'Patch': '15.1', 'Tournament': 'LEC',
+    'DateTime_UTC': '2025-01-01 10:00:00',
+    'Team1Picks': 'Aatrox,Vi,Ahri,Jinx,Nautilus', 'Team2Picks': 'Renekton,Sejuani,Azir,Xayah,Rakan',
+    'Team1Players': 'B1,B2,B3,B4,B5', 'Team2Players': 'R1,R2,R3,R4,R5',
+    'Team1Bans': 'Yone,Kalista,,Rell,Sylas', 'Team2Bans': 'Ksante,Ezreal,Taliyah,Ivern,Nidalee',
+}
+PB_ROW = {
+    'UniqueLine': 'U1', 'GameId': 'G1',
+    'Team1Ban1': 'Yone', 'Team1Ban2': 'Kalista', 'Team1Ban3': '', 'Team1Ban4': 'Rell', 'Team1Ban5': 'Sylas',
+    'Team2Ban1': 'Ksante', 'Team2Ban2': 'Ezreal', 'Team2Ban3': 'Taliyah', 'Team2Ban4': 'Ivern', 'Team2Ban5': 'Nidalee',
+    'Team1Pick1': 'Jinx', 'Team1Pick2': 'Vi', 'Team1Pick3': 'Nautilus', 'Team1Pick4': 'Ahri', 'Team1Pick5': 'Aatrox',
+    'Team2Pick1': 'Azir', 'Team2Pick2': 'Rakan', 'Team2Pick3': 'Xayah', 'Team2Pick4': 'Sejuani', 'Team2Pick5': 'Renekton',
+    'Team1Role1': 'Bot', 'Team1Role2': 'Jungle', 'Team1Role3': 'Support', 'Team1Role4': 'Mid', 'Team1Role5': 'Top',
+}
+
+
+def test_draft_sequence_follows_tournament_order():
+    assert len(DRAFT_SEQUENCE) == 20
+    assert [entry[0] for entry in DRAFT_SEQUENCE[:8]] == [
+        'Team1Ban1', 'Team2Ban1', 'Team1Ban2', 'Team2Ban2', 'Team1Ban3', 'Team2Ban3', 'Team1Pick1', 'Team2Pick1',
+    ]
+    assert DRAFT_SEQUENCE[-1] == ('Team2Pick5', 2, 'pick', 5, 4)
+
+def test_builds_actions_from_picks_and_bans_with_sg_fallback():
+    actions = build_draft_actions(SG_ROW, PB_ROW)
+    assert len(actions) == 19  # the empty ban is skipped
+    first_pick = next(a for a in actions if a['ActionType'] == 'pick')
+    assert (first_pick['Champion'], first_pick['DraftOrder'], first_pick['Phase']) == ('Jinx', 7, 2)
+    assert (first_pick['Role'], first_pick['Player'], first_pick['Team'], first_pick['Won']) == ('Bot', 'B4', 'Blue', False)
+    red_pick = next(a for a in actions if a['Champion'] == 'Sejuani')
+    assert (red_pick['Role'], red_pick['Player'], red_pick['Won']) == ('Jungle', 'R2', True)
+
+    fallback = build_draft_actions(SG_ROW)
+    assert len(fallback) == 19
+    assert all(a['DraftOrder'] is None for a in fallback)
+    assert {(a['Champion'], a['Slot'], a['Role']) for a in fallback if a['ActionType'] == 'pick' and a['Side'] == 1} == {
+        ('Aatrox', 1, 'Top'), ('Vi', 2, 'Jungle'), ('Ahri', 3, 'Mid'), ('Jinx', 4, 'Bot'), ('Nautilus', 5, 'Support'),
+    }
+
+def test_backfill_is_idempotent():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[
+        ScoreboardGame.__table__, PicksAndBansS7Model.__table__, DraftAction.__table__,
+    ])
+    session = sessionmaker(bind=engine)()
+    session.add(ScoreboardGame(**SG_ROW))
+    session.add(ScoreboardGame(**dict(SG_ROW, GameId='G2')))
+    session.add(PicksAndBansS7Model(**PB_ROW))
+    session.commit()
+
+    assert backfill_draft_actions(session, batch_size=1) == 38
+    assert backfill_draft_actions(session) == 0
+    ordered = session.query(DraftAction).filter_by(GameId='G1').filter(DraftAction.DraftOrder.isnot(None)).count()
+    assert ordered == 19
+    assert session.query(DraftAction).filter_by(Champion='Jinx', ActionType='pick').count() == 2
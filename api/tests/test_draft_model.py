@@ -0,0 +1,92 @@
+import time
+
+import numpy as np
+
+from api import draft_model
+from api.draft_model import DraftModel, build_tables, save_tables
+
+CHAMPIONS = ['Aatrox', 'Ahri', 'Jinx', 'Vi', 'Yone']
+# Aatrox and Jinx always win, together or apart; Yone always loses
+GAMES = [
+    (['Aatrox', 'Vi'], ['Ahri', 'Yone'], 1),
+    (['Ahri', 'Yone'], ['Jinx', 'Vi'], 2),
+    (['Yone', 'Vi'], ['Aatrox', 'Jinx'], 2),
+    (['Jinx', 'Ahri'], ['Vi', 'Yone'], 1),
+] * 10
+
+
+def _model(tmp_path):
+    tables = build_tables(GAMES, CHAMPIONS)
+    save_tables(tmp_path, 'all', tables, CHAMPIONS, None, len(GAMES))
+    save_tables(tmp_path, '25.1-25.6', build_tables(GAMES[:4], CHAMPIONS), CHAMPIONS, ['25.1', '25.6'], 4)
+    return DraftModel.load(str(tmp_path))
+
+
+def test_tables_capture_win_rates_and_pairs():
+    tables = build_tables(GAMES, CHAMPIONS)
+    index = {name: i for i, name in enumerate(CHAMPIONS)}
+    assert tables['pick_games'][index['Aatrox']] == 20
+    assert tables['champion_logit'][index['Aatrox']] > 0 > tables['champion_logit'][index['Yone']]
+    # Counter terms are antisymmetric
+    assert abs(tables['counter'] + tables['counter'].T).max() < 1e-5
+
+
+def test_tables_are_the_same_built_in_chunks(monkeypatch):
+    whole = build_tables(GAMES, CHAMPIONS)
+    monkeypatch.setattr(draft_model, 'BUILD_CHUNK_GAMES', 3)
+    chunked = build_tables(GAMES + [(['Aatrox', 'Aatrox', 'Unknown'], [], 1)], CHAMPIONS)
+    assert chunked['pick_games'][0] == whole['pick_games'][0] + 1 # counted once, unknown names ignored
+    chunked = build_tables(GAMES, CHAMPIONS)
+    for name, array in whole.items():
+        assert np.allclose(chunked[name], array)
+
+def test_predict_ranks_next_pick_and_picks_patch_range(tmp_path, monkeypatch):
+    model = _model(tmp_path)
+    assert model.tables_for('25.3').name == '25.1-25.6'
+    assert model.tables_for('24.1').name == 'all'
+
+    tables = model.tables_for(None)
+    bans = {'Team1Ban1': 'Ahri', 'Team2Ban1': 'Vi', 'Team1Ban2': None}
+    # Predictions read the memory-mapped tables in place, never loading them again
+    synergy = tables.synergy
+    assert isinstance(synergy, np.memmap) and not synergy.flags.writeable
+    monkeypatch.setattr(draft_model.np, 'load', None)
+    result = tables.predict(bans, top=3)
+    assert tables.synergy is synergy
+    assert result['next'] == {'column': 'Team1Ban2', 'side': 'blue', 'action': 'ban'}
+
+    draft = dict(bans, Team1Ban2='Vi', Team2Ban2='Ahri', Team1Ban3='None', Team2Ban3='None', Team1Pick1='Yone')
+    result = tables.predict(draft, top=3)
+    assert result['next']['column'] == 'Team2Pick1'
+    assert result['blue_win_probability'] < 0.5
+    assert [c['champion'] for c in result['candidates']][:2] in (['Aatrox', 'Jinx'], ['Jinx', 'Aatrox'])
+    assert 'Yone' not in [c['champion'] for c in result['candidates']]
+
+def test_predict_endpoint(tmp_path, monkeypatch):
+    from api import app as app_module
+    monkeypatch.setattr(app_module, 'draft_model', _model(tmp_path))
+    client = app_module.app.test_client()
+
+    response = client.post("/drafts/predict", json={"actions": ["Ahri", "Vi", "Vi", "Ahri", "None", "None", "Yone"]})
+    assert response.status_code == 200
+    assert response.get_json()['next']['column'] == 'Team2Pick1'
+    assert client.post("/drafts/predict", json={"draft": {"Team3Pick1": "Vi"}}).status_code == 400
+
+    monkeypatch.setattr(app_module, 'draft_model', DraftModel([]))
+    assert client.post("/drafts/predict", json={"actions": []}).status_code == 503
+
+def test_concurrent_first_requests_load_the_model_once(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from api import app as app_module
+    loads = []
+
+    def load():
+        loads.append(1)
+        time.sleep(0.05)
+        return DraftModel([])
+
+    monkeypatch.setattr(app_module, 'draft_model', None)
+    monkeypatch.setattr(DraftModel, 'load', staticmethod(load))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        models = list(pool.map(lambda _: app_module.get_draft_model(), range(8)))
+    assert len(loads) == 1 and all(model is models[0] for model in models)
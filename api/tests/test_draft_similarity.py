@@ -0,0 +1,43 @@
+import pytest
+
+from api.draft_similarity import DraftIndex
+
+
+def _row(rowid, game_id, picks, bans=''):
+    blue, red = picks.split('|')
+    return (rowid, game_id, blue, red, bans, '')
+
+
+def test_similar_ranks_by_weighted_jaccard():
+    index = DraftIndex()
+    index.add_games([
+        _row(1, 'G1', 'Aatrox,Vi,Ahri,Jinx,Nautilus|Renekton,Sejuani,Azir,Xayah,Rakan', 'Yone,Kalista'),
+        _row(2, 'G2', 'Aatrox,Vi,Ahri,Jinx,Rell|Gnar,Sejuani,Azir,Xayah,Rakan', 'Yone'),
+        _row(3, 'G3', 'Ornn,Lee Sin,Orianna,Ezreal,Karma|Jax,Maokai,Syndra,Varus,Alistar'),
+    ])
+    results = index.similar(['Aatrox', 'Vi', 'Ahri', 'Jinx', 'Nautilus', 'Renekton', 'Sejuani', 'Azir', 'Xayah', 'Rakan'],
+                            ['Yone', 'Kalista'], k=3)
+    assert [r[0] for r in results] == ['G1', 'G2', 'G3']
+    assert results[0][1:] == (1.0, 1.0, 1.0)
+    assert results[1][2] == pytest.approx(8 / 12) and results[1][3] == 0.5
+    assert results[2][1] == 0.0
+
+    assert [r[0] for r in index.similar(['Aatrox', 'Unknown'], k=5, exclude=['G1'])] == ['G2', 'G3']
+
+def test_incremental_add_widens_bitsets():
+    index = DraftIndex()
+    index.add_games([_row(1, 'G1', 'Aatrox|Vi')])
+    names = [f"Champion{i}" for i in range(150)]
+    index.add_games([_row(2, 'G2', ','.join(names[:75]) + '|' + ','.join(names[75:])), _row(5, 'G3', 'Aatrox|Champion149')])
+    assert (len(index), index.watermark) == (3, 5)
+    assert index.similar(['Champion149', 'Aatrox'], k=1)[0][0] == 'G3'
+    assert index.similar(names, k=1)[0][:2] == ('G2', 0.75)
+
+def test_corrected_game_replaces_its_draft():
+    index = DraftIndex()
+    index.add_games([_row(1, 'G1', 'Aatrox|Vi'), _row(2, 'G2', 'Ahri|Jinx')])
+    # Corrected rows move to a new rowid
+    index.add_games([_row(3, 'G1', 'Ornn|Vi')])
+    assert (len(index), index.watermark, index.game_ids) == (2, 3, ['G1', 'G2'])
+    assert index.similar(['Ornn', 'Vi'], k=1)[0][:2] == ('G1', 0.75)
+    assert index.similar(['Aatrox'], k=2)[0][1] == 0.0
@@ -0,0 +1,57 @@
+import json
+
+import msgpack
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.app import game_body
+from api.game_document_model import GameDocument
+from api.game_documents import DEFAULT_GAME_FIELDS, read_game_document, serialize_game, write_game_documents
+from api.models_base import Base
+from api.scoreboard_game_model import ScoreboardGame
+
+GAME = {'GameId': 'Doc Cup_Week 1_1_1', 'MatchId': 'Doc Cup_Week 1_1', 'Tournament': 'Doc Cup', 'DateTime_UTC': '2025-01-01 10:00:00',
+        'Team1': 'Blue', 'Team2': 'Rød', 'Winner': 2, 'Team1Players': 'A,B', 'Team2Players': 'C,D',
+        'Team1Picks': "Kai'Sa,Vi", 'Team2Picks': 'Renekton,Sejuani', 'Team1Bans': 'Yone', 'Team2Bans': 'Azir'}
+
+
+@pytest.fixture()
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(ScoreboardGame(**GAME))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_documents_hold_the_serialized_game(session):
+    assert read_game_document(session, GAME['GameId']) is None
+    assert write_game_documents(session, [GAME['GameId'], 'missing']) == 1
+    assert write_game_documents(session, [GAME['GameId']]) == 1 # rewritten in place
+    session.commit()
+
+    expected = serialize_game(session.get(ScoreboardGame, GAME['GameId']))
+    body = read_game_document(session, GAME['GameId'])
+    assert json.loads(body) == expected
+    assert b', ' not in body and 'Rød'.encode() in body # compact, UTF-8
+    assert msgpack.unpackb(read_game_document(session, GAME['GameId'], 'msgpack')) == expected
+
+
+def test_game_body_serves_stored_documents(session):
+    # Without a document the game is serialized from its row, to the same bytes
+    _, fallback = game_body(GAME['GameId'], DEFAULT_GAME_FIELDS, lambda: session, 'msgpack')
+    write_game_documents(session, [GAME['GameId']])
+    session.commit()
+    assert read_game_document(session, GAME['GameId'], 'msgpack') == fallback
+
+    session.query(GameDocument).update({GameDocument.Json: b'{"stored":true}\n'})
+    session.commit()
+    etag, body = game_body(GAME['GameId'], DEFAULT_GAME_FIELDS, lambda: session)
+    assert body == b'{"stored":true}\n'
+    # Other projections are serialized from the row
+    _, body = game_body(GAME['GameId'], ("id", "winner"), lambda: session)
+    assert json.loads(body) == {"id": GAME['GameId'], "winner": "red"}
+    assert game_body('missing', DEFAULT_GAME_FIELDS, lambda: session) is None
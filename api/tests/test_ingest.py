@@ -0,0 +1,202 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from api import app as app_module
+from api import asgi
+from sqlalchemy.exc import OperationalError
+
+from api import models_base
+from api.bin import collect_data
+from api.bin.ingest import AdaptiveInterval, SingleWriter, ingest
+from api.cargo_standin import SqliteCargo
+from api.collection_checkpoint_model import CollectionCheckpoint
+from api.ingest_event_model import IngestEvent
+from api.ingest_events import IngestEventFeed, load_ingest_events, record_ingest_events
+from api.rate_limiter import AdaptiveTokenBucket
+from api.scoreboard_game_model import ScoreboardGame
+from api.synthetic import write_database
+
+
+@pytest.fixture()
+def feed(monkeypatch):
+    """A fast-polling event feed for the Flask and ASGI streams."""
+    feed = IngestEventFeed(poll_interval=0.02)
+    monkeypatch.setattr(app_module, 'ingest_feed', feed)
+    monkeypatch.setattr(asgi, 'ingest_feed', feed)
+    yield feed
+    feed.close()
+
+
+@pytest.fixture()
+def database(tmp_path):
+    original_url = models_base.DATABASE_URL
+    models_base.configure_engine(f"sqlite:///{tmp_path / 'ingested.db'}")
+    models_base.init_db()
+    yield tmp_path
+    models_base.configure_engine(original_url)
+
+
+def hold_back(path, count):
+    """Removes the wiki's `count` latest games, returning a function that publishes them again."""
+    with sqlite3.connect(path) as connection:
+        game_ids = [game_id for (game_id,) in connection.execute(
+            'SELECT GameId FROM "ScoreboardGames" ORDER BY DateTime_UTC DESC, GameId DESC LIMIT ?', (count,))]
+        marks = ", ".join("?" for _ in game_ids)
+        held = {}
+        for table in ("ScoreboardGames", "PicksAndBansS7"):
+            rows = connection.execute(f'SELECT * FROM "{table}" WHERE GameId IN ({marks})', game_ids)
+            held[table] = ([column[0] for column in rows.description], rows.fetchall())
+            connection.execute(f'DELETE FROM "{table}" WHERE GameId IN ({marks})', game_ids)
+
+    def publish():
+        with sqlite3.connect(path) as connection:
+            for table, (columns, rows) in held.items():
+                connection.executemany(f'INSERT INTO "{table}" ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})', rows)
+    return sorted(game_ids), publish
+
+
+def run_daemon(path, polls=1):
+    return ingest(min_interval=0, max_interval=0, cargo_client=SqliteCargo(path),
+                  limiter=AdaptiveTokenBucket(rate=1000, max_rate=1000, capacity=10), max_polls=polls)
+
+
+def test_daemon_ingests_new_games_with_an_event_each(database):
+    wiki = str(database / "cargo.db")
+    write_database(wiki, 60, seed=5)
+    late_game_ids, publish = hold_back(wiki, 4)
+
+    assert run_daemon(wiki).ingested_games == 56 # written in chunks of 20 games
+    assert run_daemon(wiki).ingested_games == 0
+    publish()
+    stats = run_daemon(wiki)
+    assert (stats.ingested_games, stats.api_calls) == (4, 1)
+
+    session = models_base.get_session()
+    try:
+        assert session.query(ScoreboardGame).count() == 60
+        events = load_ingest_events(session, 0)
+        assert [event_id for event_id, _ in events] == list(range(1, 61))
+        assert sorted(data['id'] for _, data in events[-4:]) == late_game_ids
+        game = session.get(ScoreboardGame, events[-1][1]['id'])
+        assert events[-1][1] == {'id': game.GameId, 'tournament': game.Tournament, 'date': game.DateTime_UTC}
+    finally:
+        session.close()
+
+
+def test_a_failed_chunk_stops_the_checkpoint_and_skips_the_next_ones(database, monkeypatch):
+    wiki = str(database / "cargo.db")
+    write_database(wiki, 60, seed=5)
+    insert = collect_data.SG_ROW_MAPPER.insert_or_ignore
+    calls = []
+
+    def insert_failing_the_second_chunk(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        return insert(*args)
+
+    monkeypatch.setattr(collect_data.SG_ROW_MAPPER, 'insert_or_ignore', insert_failing_the_second_chunk)
+    stats = run_daemon(wiki)
+    assert (stats.failed_polls, stats.ingested_games) == (1, 0)
+    assert len(calls) == 2 # the third chunk was skipped
+
+    session = models_base.get_session()
+    try:
+        stored = session.query(ScoreboardGame).order_by(ScoreboardGame.DateTime_UTC, ScoreboardGame.GameId).all()
+        assert len(stored) == 20 # the first chunk only
+        checkpoint = session.get(CollectionCheckpoint, 'forward')
+        assert (checkpoint.DateTime_UTC, checkpoint.GameId) == (stored[-1].DateTime_UTC, stored[-1].GameId)
+        assert sorted(data['id'] for _, data in load_ingest_events(session, 0)) == sorted(game.GameId for game in stored)
+    finally:
+        session.close()
+
+    monkeypatch.undo()
+    assert run_daemon(wiki).ingested_games == 40
+
+
+def test_adaptive_interval():
+    interval = AdaptiveInterval(minimum=5, maximum=60)
+    assert [interval.update(added) for added in (0, 0, 0, 0, 3, 0)] == [10, 20, 40, 60, 5, 10]
+
+
+def test_writes_after_a_failed_one_are_skipped(database):
+    writer = SingleWriter()
+    try:
+        def fail(session):
+            record_ingest_events(session, [('written then rolled back', None, None)])
+            raise RuntimeError("write failed")
+
+        failed = writer.submit(fail)
+        chained = writer.submit(lambda session: record_ingest_events(session, [('skipped', None, None)]), after=failed)
+        unrelated = writer.submit(lambda session: record_ingest_events(session, [('written', None, None)]))
+        with pytest.raises(RuntimeError, match="write failed"):
+            chained.result()
+        assert unrelated.result() == 1
+    finally:
+        writer.close()
+    session = models_base.get_session()
+    try:
+        assert [event.GameId for event in session.query(IngestEvent)] == ['written']
+    finally:
+        session.close()
+
+
+def add_events(*game_ids):
+    session = models_base.get_session()
+    try:
+        record_ingest_events(session, [(game_id, 'Cup', '2025-01-01 10:00:00') for game_id in game_ids])
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_stream_pushes_new_events(database, feed, monkeypatch):
+    add_events('old game')
+    monkeypatch.setattr(app_module, 'KEEPALIVE_INTERVAL', 0.05)
+    client = app_module.app.test_client()
+
+    response = client.get('/games/stream', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    stream = iter(response.response)
+    assert next(stream) == b"retry: 3000\n\n"
+    assert next(stream) == b": keepalive\n\n" # only events after the stream started
+    add_events('new game')
+    while (chunk := next(stream)) == b": keepalive\n\n":
+        pass
+    assert chunk == b'id: 2\nevent: game\ndata: {"date":"2025-01-01 10:00:00","id":"new game","tournament":"Cup"}\n\n'
+    response.close()
+
+    # A reconnecting client gets the events after its Last-Event-ID, from the table or the feed's buffer
+    response = client.get('/games/stream', headers={'Last-Event-ID': '0'}, buffered=False)
+    stream = iter(response.response)
+    next(stream)
+    assert [next(stream).split(b"\n")[0] for _ in range(2)] == [b"id: 1", b"id: 2"]
+    response.close()
+    assert client.get('/games/stream', headers={'Last-Event-ID': 'x'}).status_code == 400
+
+
+def test_asgi_stream(database, feed):
+    add_events('game 1', 'game 2')
+    scope = {'type': 'http', 'method': 'GET', 'path': '/games/stream', 'query_string': b'',
+             'headers': [(b'last-event-id', b'1')]}
+    messages = []
+
+    async def run():
+        got_event = asyncio.Event()
+
+        async def receive():
+            await got_event.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            if b"event: game" in message.get('body', b''):
+                got_event.set()
+
+        await asyncio.wait_for(asgi.app(scope, receive, send), timeout=5)
+
+    asyncio.run(run())
+    assert messages[0]['status'] == 200
+    assert b"".join(message.get('body', b'') for message in messages[1:]).split(b"\n\n")[1].startswith(b"id: 2\nevent: game\n")
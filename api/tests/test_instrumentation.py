@@ -0,0 +1,65 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from api.instrumentation import Registry, RequestTimings, SamplingProfiler, timed
+from api.models_base import Base
+from api.scoreboard_game_model import ScoreboardGame
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    requests = registry.counter('requests_total', "Requests.", ('endpoint',))
+    latency = registry.histogram('latency_seconds', "Latency.", ('endpoint',), buckets=(0.1, 1.0))
+    requests.inc(endpoint='games')
+    requests.inc(2, endpoint='games')
+    for value in (0.05, 0.5, 3.0):
+        latency.observe(value, endpoint='games')
+
+    lines = registry.render().splitlines()
+    assert '# TYPE requests_total counter' in lines
+    assert 'requests_total{endpoint="games"} 3' in lines
+    assert 'latency_seconds_bucket{endpoint="games",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{endpoint="games",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{endpoint="games",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{endpoint="games"} 3' in lines
+    assert latency.quantile(0.5, endpoint='games') == 1.0
+    assert latency.quantile(0.5, endpoint='other') is None
+
+
+def test_request_timings_count_statements_and_phases():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine, tables=[ScoreboardGame.__table__])
+    session = sessionmaker(bind=engine)()
+    session.add_all([ScoreboardGame(GameId=f"g{i}", Team1="A", Team2="B") for i in range(3)])
+    session.commit()
+
+    timings = RequestTimings().activate()
+    try:
+        assert len(session.query(ScoreboardGame).all()) == 3
+        session.execute(text("SELECT 1"))
+        with timed('serialize'):
+            pass
+    finally:
+        timings.deactivate()
+    session.query(ScoreboardGame).all() # not counted once deactivated
+
+    assert timings.statements == 2
+    phases = timings.phases()
+    assert set(phases) == {'db', 'hydrate', 'serialize', 'app', 'total'}
+    assert phases['db'] > 0 and phases['hydrate'] > 0
+    assert phases['total'] >= phases['db'] + phases['hydrate'] + phases['serialize']
+    assert 'db;dur=' in timings.server_timing()
+    session.close()
+
+
+def test_sampling_profiler_collects_folded_stacks(tmp_path):
+    def busy():
+        return sum(i * i for i in range(300_000))
+
+    profiler = SamplingProfiler(interval=0.0005).start()
+    for _ in range(5):
+        busy()
+    samples = profiler.stop()
+    assert samples and any('busy' in stack for stack in samples)
+    path = profiler.save('test', directory=str(tmp_path))
+    assert open(path).read().splitlines()[0].rsplit(' ', 1)[1].isdigit()
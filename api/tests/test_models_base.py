@@ -0,0 +1,47 @@
+from contextlib import nullcontext
+
+import pytest
+from sqlalchemy import inspect
+
+from api import models_base
+from api.draft_action_model import DraftAction
+from api.picks_and_bans_model import PicksAndBansS7Model
+from api.scoreboard_game_model import ScoreboardGame
+
+TABLES = [ScoreboardGame.__table__, PicksAndBansS7Model.__table__, DraftAction.__table__]
+
+
+@pytest.fixture()
+def database(tmp_path):
+    original_url = models_base.DATABASE_URL
+    models_base.configure_engine(f"sqlite:///{tmp_path / 'bulk.db'}")
+    models_base.init_db()
+    yield
+    models_base.configure_engine(original_url)
+
+
+def pragmas():
+    with models_base.get_engine().connect() as connection:
+        return {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+                for name in ('journal_mode', *models_base.BULK_LOAD_PRAGMAS)}
+
+
+def index_names():
+    inspector = inspect(models_base.get_engine())
+    return {index['name'] for table in TABLES for index in inspector.get_indexes(table.name)}
+
+
+@pytest.mark.parametrize('fails', [False, True])
+def test_bulk_load_drops_indexes_and_restores_everything_after(database, fails):
+    indexes, settings = index_names(), pragmas()
+    assert indexes and settings == {'journal_mode': 'wal', 'synchronous': 1, 'cache_size': -2000, 'temp_store': 0}
+
+    with pytest.raises(RuntimeError) if fails else nullcontext():
+        with models_base.bulk_load(TABLES):
+            assert not index_names()
+            assert pragmas() == {'journal_mode': 'wal', 'synchronous': 0, 'cache_size': -256 * 1024, 'temp_store': 2}
+            if fails:
+                raise RuntimeError("batch failed")
+
+    assert index_names() == indexes
+    assert pragmas() == settings
@@ -0,0 +1,187 @@
+import os
+
+import pytest
+
+from api import app as app_module
+from api.bin import build_draft_tables, collect_data, export_snapshot
+from api import models_base
+from api.bin.partitions import split_main_database
+from api.cache import ResponseCache
+from api.game_documents import write_game_documents
+from api.partitions import SeasonRouter, compact_season, reopen_season, season_of, season_of_game_id
+from api.scoreboard_game_model import ScoreboardGame
+from api.snapshot import load_snapshot
+
+# The 2024 season's finals were played after the 2025 season started
+GAMES = [
+    {'GameId': '2025 Cup_Week 1_1_1', 'OverviewPage': '2025 Cup', 'DateTime UTC': '2025-01-03 10:00:00', 'Team1': 'A', 'Team2': 'B', 'Winner': '1'},
+    {'GameId': '2024 Cup_Finals_1_1', 'OverviewPage': '2024 Cup', 'DateTime UTC': '2025-01-05 10:00:00', 'Team1': 'C', 'Team2': 'D', 'Winner': '2'},
+    {'GameId': '2025 Cup_Week 2_1_1', 'OverviewPage': '2025 Cup', 'DateTime UTC': '2025-01-10 10:00:00', 'Team1': 'B', 'Team2': 'A', 'Winner': '1'},
+    {'GameId': '2024 Cup_Week 1_1_1', 'OverviewPage': '2024 Cup', 'DateTime UTC': '2024-06-01 10:00:00', 'Team1': 'D', 'Team2': 'C', 'Winner': '1'},
+]
+
+
+@pytest.fixture()
+def router(tmp_path, monkeypatch):
+    original_url = models_base.DATABASE_URL
+    models_base.configure_engine(f"sqlite:///{tmp_path / 'main.db'}")
+    models_base.init_db()
+    router = SeasonRouter(tmp_path / 'partitions')
+    monkeypatch.setattr(app_module, 'season_router', router)
+    for module in (collect_data, export_snapshot, build_draft_tables):
+        monkeypatch.setattr(module, 'season_router', router)
+    monkeypatch.setattr(app_module, 'game_cache', ResponseCache())
+    yield router
+    models_base.configure_engine(original_url)
+
+
+def collect(router, games):
+    """Writes `games` like the collector does: each season's rows to its partition."""
+    session = models_base.get_session()
+    try:
+        by_season = collect_data.rows_by_season(games, []) if router.enabled else {None: (games, [])}
+        for season, (sg_rows, _) in by_season.items():
+            schema = router.writable(session, season) if season else None
+            count = collect_data.insert_scoreboard_games_batch(session, sg_rows, schema)
+            if season:
+                router.record_games(session, season, [row['DateTime UTC'] for row in sg_rows], count)
+            write_game_documents(session, [row['GameId'] for row in sg_rows], schema)
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_season_of():
+    assert season_of('LCK/2025 Season/Split 1', '2025-01-15 08:00:00') == '2025'
+    assert season_of('Worlds Qualifier', '2023-08-01 08:00:00') == '2023'
+    assert season_of(None, None) == 'undated'
+    assert season_of_game_id('LEC/2024 Season/Summer Season_Week 1_1_1') == '2024'
+    assert season_of_game_id('Doc Cup_Week 2025_1_1') is None # only the OverviewPage part counts
+
+
+def test_games_are_routed_to_their_season(router):
+    collect(router, GAMES)
+    assert sorted(name for name in os.listdir(router.directory) if name.endswith('.db')) == ['season-2024.db', 'season-2025.db']
+    session = models_base.get_session()
+    try:
+        assert session.query(ScoreboardGame).count() == 0 # nothing in the main database
+        assert [(p.Season, p.Games, p.FirstDate, p.LastDate) for p in router.catalog(session)] == [
+            ('2025', 2, '2025-01-03 10:00:00', '2025-01-10 10:00:00'),
+            ('2024', 2, '2024-06-01 10:00:00', '2025-01-05 10:00:00'),
+        ]
+    finally:
+        session.close()
+
+    client = app_module.app.test_client()
+    assert client.get('/games/2024 Cup_Finals_1_1').get_json()['blue']['team']['name'] == 'C'
+    batch = client.post('/games:batch', json={'ids': ['2024 Cup_Week 1_1_1', '2025 Cup_Week 2_1_1', 'missing']}).get_json()
+    assert [result['status'] for result in batch['results']] == [200, 200, 404]
+
+    # Listing merges the overlapping seasons, newest first, across pages
+    seen, cursor = [], None
+    while True:
+        data = client.get('/games', query_string={'limit': 2, **({'cursor': cursor} if cursor else {})}).get_json()
+        seen.extend(game['id'] for game in data['games'])
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+    assert seen == ['2025 Cup_Week 2_1_1', '2024 Cup_Finals_1_1', '2025 Cup_Week 1_1_1', '2024 Cup_Week 1_1_1']
+    data = client.get('/games', query_string={'from': '2024-01-01', 'to': '2024-12-31'}).get_json()
+    assert [game['id'] for game in data['games']] == ['2024 Cup_Week 1_1_1']
+
+
+def test_compacted_seasons_are_read_only(router):
+    collect(router, GAMES)
+    session = models_base.get_session()
+    try:
+        assert compact_season(router, session, '2024')
+        assert not compact_season(router, session, '2024')
+        assert sorted(name for name in os.listdir(router.directory) if name.endswith('.db')) == ['season-2024.immutable.db', 'season-2025.db']
+        with pytest.raises(RuntimeError):
+            router.writable(session, '2024')
+        session.rollback()
+    finally:
+        session.close()
+
+    client = app_module.app.test_client()
+    assert client.get('/games/2024 Cup_Week 1_1_1').status_code == 200
+
+    session = models_base.get_session()
+    try:
+        assert reopen_season(router, session, '2024')
+    finally:
+        session.close()
+    collect(router, [dict(GAMES[3], GameId='2024 Cup_Week 1_1_2')])
+    assert client.get('/games/2024 Cup_Week 1_1_2').status_code == 200
+
+
+def test_writers_see_a_compaction_after_reading_the_catalog(router):
+    collect(router, GAMES)
+    writer, compactor = models_base.get_session(), models_base.get_session()
+    try:
+        assert not any(p.Immutable for p in router.catalog(writer))
+        assert compact_season(router, compactor, '2024')
+        with pytest.raises(RuntimeError, match="compacted"):
+            router.writable(writer, '2024')
+        writer.rollback()
+
+        assert next(p for p in router.catalog(writer) if p.Season == '2024').Immutable
+        assert reopen_season(router, compactor, '2024')
+        assert router.writable(writer, '2024') == 'season_2024'
+        writer.rollback()
+    finally:
+        writer.close()
+        compactor.close()
+
+
+def test_split_moves_the_main_database_into_seasons(router):
+    collect(SeasonRouter(None), GAMES) # unpartitioned
+    session = models_base.get_session()
+    try:
+        assert split_main_database(router, session, delete=True) == {'2024': 2, '2025': 2}
+        assert session.query(ScoreboardGame).count() == 0
+        assert [(p.Season, p.Games) for p in router.catalog(session)] == [('2025', 2), ('2024', 2)]
+    finally:
+        session.close()
+    assert app_module.app.test_client().get('/games/2025 Cup_Week 1_1_1').status_code == 200
+
+
+def test_split_of_more_seasons_than_can_be_attached(router):
+    # Leaguepedia's 2011-2025 seasons are more than SQLite's 10 attached databases
+    games = [dict(GAMES[0], GameId=f'{year} Cup_Week 1_1_1', OverviewPage=f'{year} Cup', **{'DateTime UTC': f'{year}-06-01 10:00:00'})
+             for year in range(2011, 2026)]
+    collect(SeasonRouter(None), games)
+    session = models_base.get_session()
+    try:
+        assert split_main_database(router, session) == {str(year): 1 for year in range(2011, 2026)}
+        # A single transaction can't write to more seasons than that, and says so
+        with pytest.raises(RuntimeError, match="commit"):
+            for year in range(2011, 2026):
+                schema = router.writable(session, str(year))
+                session.connection().exec_driver_sql(f'DELETE FROM "{schema}"."GameDocuments"')
+        session.rollback()
+    finally:
+        session.close()
+    assert app_module.app.test_client().get('/games/2011 Cup_Week 1_1_1').status_code == 200
+
+
+def test_offline_exports_read_every_partition(router, tmp_path):
+    collect(router, GAMES[:3])
+    snapshot_dir = str(tmp_path / 'snapshot')
+    assert export_snapshot.export_snapshot(snapshot_dir)['ScoreboardGames'] == 3
+    collect(router, GAMES[3:])
+    # Each partition's rowids start at 1: a watermark per partition picks the new 2024 game up
+    assert export_snapshot.export_snapshot(snapshot_dir, incremental=True)['ScoreboardGames'] == 1
+    assert sorted(load_snapshot(snapshot_dir)['ScoreboardGames'].decode('GameId')) == sorted(game['GameId'] for game in GAMES)
+
+    session = models_base.get_session()
+    try:
+        assert len(build_draft_tables.load_games(session)) == 4
+    finally:
+        session.close()
+    # A rebuild swaps the new tables in, the old directory renamed aside and then deleted
+    tables_dir = str(tmp_path / 'draft_tables')
+    for _ in range(2):
+        build_draft_tables.build_draft_tables(tables_dir)
+        assert [name for name in os.listdir(tmp_path) if name.startswith('draft_tables')] == ['draft_tables']
+    assert os.listdir(tables_dir) == ['all']
@@ -0,0 +1,45 @@
+from api.rate_limiter import AdaptiveTokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_bucket(**kwargs):
+    clock = FakeClock()
+    return AdaptiveTokenBucket(clock=clock, sleep=clock.sleep, **kwargs), clock
+
+def test_burst_then_waits_for_refill():
+    """A full bucket allows a burst of `capacity` calls, then calls are paced at `rate`."""
+    bucket, clock = make_bucket(rate=2.0, capacity=2)
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0.5
+    assert clock.sleeps == [0.5]
+    assert bucket.slept_seconds == 0.5
+
+def test_throttle_backs_off_and_success_recovers():
+    """Throttling halves the rate and drains the bucket; successes raise the rate back up to max_rate."""
+    bucket, clock = make_bucket(rate=1.0, capacity=3, increase=0.5, max_rate=2.0)
+    bucket.on_throttle()
+    assert bucket.rate == 0.5
+    assert bucket.acquire() == 2.0
+
+    for _ in range(10):
+        bucket.on_success()
+    assert bucket.rate == 2.0
+
+def test_rate_never_drops_below_min_rate():
+    bucket, _ = make_bucket(rate=0.1, min_rate=0.05)
+    for _ in range(5):
+        bucket.on_throttle()
+    assert bucket.rate == 0.05
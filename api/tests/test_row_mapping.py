@@ -0,0 +1,46 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.models_base import Base
+from api.picks_and_bans_model import PicksAndBansS7Model
+from api.bin.collect_data import SG_ROW_MAPPER, PB_ROW_MAPPER
+
+
+def test_maps_api_keys_and_coerces_types():
+    """API keys are renamed to columns and numeric/boolean strings are coerced by column type."""
+    row = SG_ROW_MAPPER.to_tuple({
+        'GameId': 'G1', 'DateTime UTC': '2025-06-29 00:15:00', 'N GameInMatch': '2',
+        'Gamelength Number': '31.5', 'Team1Kills': '', 'Team1': 'T1',
+    })
+    values = dict(zip(SG_ROW_MAPPER.columns, row))
+    assert values['GameId'] == 'G1'
+    assert values['DateTime_UTC'] == '2025-06-29 00:15:00'
+    assert values['N_GameInMatch'] == 2
+    assert values['Gamelength_Number'] == 31.5
+    assert values['Team1Kills'] is None
+    assert values['Team1'] == 'T1'
+    assert values['VOD'] is None
+
+def test_normalizes_booleans_and_skips_rows_without_key():
+    rows = PB_ROW_MAPPER.map_rows([
+        {'UniqueLine': 'U1', 'IsComplete': 'Yes', 'IsFilled': 'f', 'N GameInPage': '3'},
+        {'UniqueLine': 'U2', 'IsComplete': 'maybe', 'IsFilled': 1},
+        {'UniqueLine': '', 'IsComplete': 'true'},
+        {'GameId': 'G1'},
+    ])
+    values = [dict(zip(PB_ROW_MAPPER.columns, row)) for row in rows]
+    assert [v['UniqueLine'] for v in values] == ['U1', 'U2']
+    assert (values[0]['IsComplete'], values[0]['IsFilled'], values[0]['N_GameInPage']) == (True, False, 3)
+    assert (values[1]['IsComplete'], values[1]['IsFilled']) == (None, True)
+
+def test_insert_or_ignore_skips_existing_keys():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[PicksAndBansS7Model.__table__])
+    session = sessionmaker(bind=engine)()
+    rows = PB_ROW_MAPPER.map_rows([{'UniqueLine': 'U1', 'IsComplete': '1'}, {'UniqueLine': 'U2'}])
+
+    assert PB_ROW_MAPPER.insert_or_ignore(session, rows) == 2
+    assert PB_ROW_MAPPER.insert_or_ignore(session, rows) == 0
+    session.commit()
+    assert session.get(PicksAndBansS7Model, 'U1').IsComplete is True
+    session.close()
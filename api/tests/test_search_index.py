@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.models_base import Base
+from api.scoreboard_game_model import ScoreboardGame
+from api.search_index import AutocompleteIndex, normalize, search, update_search_index
+
+GAMES = [
+    {'GameId': 'G1', 'Tournament': 'LEC 2025 Winter', 'Team1': 'G2 Esports', 'Team2': 'Fnatic',
+     'Team1Players': 'BrokenBlade,SkewMond,Caps,Hans Sama,Labrov', 'Team2Players': 'Oscarinin,Razork,Humanoid,Upset,Mikyx',
+     'Team1Picks': "Kai'Sa,Vi", 'Team2Picks': 'Renekton,Sejuani', 'Team1Bans': 'Yone', 'Team2Bans': 'Azir'},
+    {'GameId': 'G2', 'Tournament': 'LEC 2025 Winter', 'Team1': 'Fnatic', 'Team2': 'G2 Esports',
+     'Team1Players': 'Oscarinin,Razork,Humanoid,Upset,Mikyx', 'Team2Players': 'BrokenBlade,SkewMond,Caps,Hans Sama,Labrov',
+     'Team1Picks': 'Azir,Vi', 'Team2Picks': 'Aatrox,Rell', 'Team1Bans': 'Yone', 'Team2Bans': ''},
+    {'GameId': 'G3', 'Tournament': 'Première Ligue', 'Team1': 'Gentle Mates', 'Team2': 'Esprit Shōnen',
+     'Team1Players': 'Capsule', 'Team2Players': '', 'Team1Picks': 'Aatrox', 'Team2Picks': 'Yone', 'Team1Bans': '', 'Team2Bans': ''},
+]
+
+
+@pytest.fixture()
+def session():
+    # One connection shared with the autocomplete index's refresh thread
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={'check_same_thread': False})
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all(ScoreboardGame(**game) for game in GAMES)
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_normalize():
+    assert normalize("Kai'Sa") == "kaisa"
+    assert normalize("Première  Ligue") == "premiere ligue"
+    assert normalize("Bin (Chen Ze-Bin)") == "bin chen ze bin"
+
+
+def test_update_counts_each_game_once(session):
+    assert update_search_index(session, ['G1', 'G2']) == 2
+    assert update_search_index(session, ['G1', 'G2', 'G3']) == 1
+    session.commit()
+
+    results = search(session, "caps")
+    assert results == [{"type": "player", "name": "Caps", "games": 2}, {"type": "player", "name": "Capsule", "games": 1}]
+    # Every word must prefix a word of the name; results are grouped by type, teams first
+    assert [(r["type"], r["name"]) for r in search(session, "es")] == [
+        ("team", "G2 Esports"), ("team", "Esprit Shōnen")]
+    assert [r["name"] for r in search(session, "g2 esp")] == ["G2 Esports"]
+    assert [r["type"] for r in search(session, "s")] == ["team", "player", "player", "champion"]
+    assert search(session, "premiere", types=("tournament",)) == [{"type": "tournament", "name": "Première Ligue", "games": 1}]
+    assert search(session, "kaisa")[0]["name"] == "Kai'Sa"
+    assert search(session, '"*') == []
+
+
+def test_autocomplete_refreshes_from_entries(session):
+    update_search_index(session, ['G1'])
+    session.commit()
+    index = AutocompleteIndex(refresh_interval=0)
+    assert index.refresh(session)
+    assert [r["name"] for r in index.complete("Ca")] == ["Caps"]
+    assert not index.refresh(session)
+
+    update_search_index(session, ['G2', 'G3'])
+    session.commit()
+    # The rebuild runs in the background, lookups answering from the previous trie until it is done
+    opened = threading.Event()
+    release = threading.Event()
+
+    def open_session():
+        opened.set()
+        release.wait(5)
+        return sessionmaker(bind=session.get_bind())()
+
+    assert index.refresh_if_stale(open_session)
+    assert opened.wait(5)
+    assert not index.refresh_if_stale(open_session) # one refresh at a time
+    assert index.complete("ca") == [{"type": "player", "name": "Caps", "games": 1}]
+    release.set()
+    index.wait(5)
+    assert index.complete("ca") == [{"type": "player", "name": "Caps", "games": 2}, {"type": "player", "name": "Capsule", "games": 1}]
+    assert [r["name"] for r in index.complete("ligue")] == ["Première Ligue"]
+    # Most games first, across types
+    assert [r["name"] for r in index.complete("y")] == ["Yone"]
+    assert len(index.complete("a", limit=2)) == 2
+    assert index.complete("zz") == [] and index.complete("") == []
@@ -0,0 +1,57 @@
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.models_base import Base
+from api.scoreboard_game_model import ScoreboardGame
+from api.picks_and_bans_model import PicksAndBansS7Model
+from api.bin.export_snapshot import export_table
+from api.snapshot import SnapshotWriter, load_snapshot
+
+TABLES = [ScoreboardGame.__table__, PicksAndBansS7Model.__table__]
+
+
+def _export(connection, path, chunk_size=2):
+    writer = SnapshotWriter(str(path))
+    counts = [export_table(connection, writer, table, chunk_size) for table in TABLES]
+    writer.commit()
+    return counts
+
+
+def test_export_appends_incrementally_and_memory_maps(tmp_path):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=TABLES)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        ScoreboardGame(GameId='G1', Team1='T1', Team2='G2', Team1Kills=10, Gamelength_Number=31.5),
+        ScoreboardGame(GameId='G2', Team1='G2', Team2='T1', Team1Kills=None),
+        ScoreboardGame(GameId='G3', Team1='T1', Team2='BLG', Team1Kills=7),
+        PicksAndBansS7Model(UniqueLine='U1', GameId='G1', Team1='T1', Team1Pick1='Azir', Team2Ban1='Azir', IsComplete=True),
+    ])
+    session.commit()
+    snapshot_dir = tmp_path / 'snapshot'
+    assert _export(session.connection(), snapshot_dir) == [3, 1]
+
+    session.add_all([
+        ScoreboardGame(GameId='G4', Team1='BLG', Team2='T1', Team1Kills=3),
+        PicksAndBansS7Model(UniqueLine='U2', GameId='G4', Team1Pick1='Rumble', IsComplete=None),
+    ])
+    session.commit()
+    assert _export(session.connection(), snapshot_dir) == [1, 1]
+
+    snapshot = load_snapshot(str(snapshot_dir))
+    games = snapshot['ScoreboardGames']
+    assert len(games) == 4 and len(games.parts) == 3
+    assert isinstance(games.column_parts('Team1Kills')[0], np.memmap)
+    assert games.column('Team1Kills')[[0, 2, 3]].tolist() == [10, 7, 3]
+    assert games.valid('Team1Kills').tolist() == [True, False, True, True]
+    assert np.isnan(games.column('Gamelength_Number')[1])
+    assert games.decode('GameId') == ['G1', 'G2', 'G3', 'G4']
+    assert games.decode('Team2') == ['G2', 'T1', 'BLG', 'T1']
+
+    picks = snapshot['PicksAndBansS7']
+    # Teams and champions share a dictionary across columns and tables
+    assert picks.dictionary('Team1') is games.dictionary('Team1')
+    assert picks.column('Team1Pick1')[0] == picks.column('Team2Ban1')[0]
+    assert picks.decode('Team1Pick1') == ['Azir', 'Rumble']
+    assert picks.column('IsComplete').tolist() == [1, -1]
@@ -0,0 +1,27 @@
+import pytest
+
+from api import models_base
+from api.benchmarks.bench_import import import_once
+
+
+@pytest.mark.parametrize("module", ["api.app", "api.bin.collect_data"])
+def test_import_has_no_side_effects(module):
+    report, _, _ = import_once(module)
+    assert not report['engines_created']
+    assert not report['files_created']
+    assert report['heavy_modules'] == []
+
+
+def test_pools_are_replaced_in_a_new_process(tmp_path, monkeypatch):
+    original_url = models_base.DATABASE_URL
+    models_base.configure_engine(f"sqlite:///{tmp_path / 'fork.db'}")
+    try:
+        engine = models_base.get_engine()
+        assert models_base.engine is engine
+        pools = engine.pool, models_base.get_read_only_engine().pool
+        # As if inherited from a parent process (e.g. a pre-forking server's master)
+        monkeypatch.setattr(models_base._engines, 'pid', -1)
+        assert models_base.get_engine() is engine
+        assert engine.pool is not pools[0] and models_base.get_read_only_engine().pool is not pools[1]
+    finally:
+        models_base.configure_engine(original_url)
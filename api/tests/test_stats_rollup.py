@@ -0,0 +1,97 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api import models_base
+from api.models_base import Base
+from api.scoreboard_game_model import ScoreboardGame
+from api.draft_actions import build_draft_actions, insert_draft_actions
+from api.stats_rollup import champion_stats, team_stats, update_rollups
+
+GAMES = [
+    {'GameId': 'G1', 'Team1': 'Blue', 'Team2': 'Red', 'Winner': 1, 'Patch': '15.1', 'Tournament': 'LEC', 'DateTime_UTC': '2025-01-01 10:00:00',
+     'Team1Picks': 'Aatrox,Vi', 'Team2Picks': 'Renekton,Sejuani', 'Team1Bans': 'Yone', 'Team2Bans': 'Azir'},
+    {'GameId': 'G2', 'Team1': 'Red', 'Team2': 'Blue', 'Winner': 1, 'Patch': '15.1', 'Tournament': 'LEC', 'DateTime_UTC': '2025-01-01 11:00:00',
+     'Team1Picks': 'Azir,Vi', 'Team2Picks': 'Aatrox,Rell', 'Team1Bans': 'Yone', 'Team2Bans': 'Kalista'},
+    {'GameId': 'G3', 'Team1': 'Blue', 'Team2': 'Other', 'Winner': 2, 'Patch': '15.2', 'Tournament': 'LCK',
+     'Team1Picks': 'Aatrox', 'Team2Picks': 'Yone', 'Team1Bans': '', 'Team2Bans': 'Vi'},
+]
+
+
+def _populate(session):
+    for game in GAMES:
+        session.add(ScoreboardGame(**game))
+    session.flush()
+    insert_draft_actions(session, [action for game in GAMES for action in build_draft_actions(game)])
+    session.commit()
+
+@pytest.fixture()
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    _populate(session)
+    yield session
+    session.close()
+
+
+def test_rollups_count_each_game_once(session):
+    assert update_rollups(session, ['G1', 'G2']) == 2
+    assert update_rollups(session, ['G1', 'G2', 'G3']) == 1
+    assert update_rollups(session, ['G3']) == 0
+
+    data = champion_stats(session)
+    assert data["games"] == 3
+    aatrox = data["champions"][0]
+    assert aatrox == {"champion": "Aatrox", "picks": 3, "bans": 0, "wins": 1,
+                      "pick_rate": 1.0, "ban_rate": 0.0, "presence": 1.0, "win_rate": 0.3333}
+
+    yone = champion_stats(session, patch='15.1', champion='Yone')
+    assert (yone["games"], yone["champions"][0]["bans"]) == (2, 2)
+    blue_vi = champion_stats(session, side='blue', champion='Vi')["champions"][0]
+    assert (blue_vi["picks"], blue_vi["wins"]) == (2, 2)
+
+def test_games_not_stored_yet_are_added_later(session):
+    assert update_rollups(session, ['G1', 'G4']) == 1
+    session.add(ScoreboardGame(GameId='G4', Team1='Blue', Team2='Red', Winner=2, Patch='15.2', Tournament='LCK'))
+    session.flush()
+    assert update_rollups(session, ['G1', 'G4']) == 1
+    assert champion_stats(session)["games"] == 2
+
+def test_team_stats_by_side(session):
+    update_rollups(session, [game['GameId'] for game in GAMES])
+    teams = {t["team"]: t for t in team_stats(session)["teams"]}
+    assert (teams["Blue"]["games"], teams["Blue"]["wins"]) == (3, 1)
+    assert (teams["Red"]["games"], teams["Red"]["wins"]) == (2, 1)
+    red_side = team_stats(session, side='red', tournament='LEC')["teams"]
+    assert [(t["team"], t["wins"]) for t in red_side] == [("Blue", 0), ("Red", 0)]
+
+
+@pytest.fixture()
+def stats_client(tmp_path):
+    from api.app import app
+    original_url = models_base.DATABASE_URL
+    models_base.configure_engine(f"sqlite:///{tmp_path / 'stats.db'}")
+    models_base.init_db()
+    session = models_base.get_session()
+    _populate(session)
+    update_rollups(session, [game['GameId'] for game in GAMES])
+    session.commit()
+    session.close()
+    yield app.test_client()
+    models_base.configure_engine(original_url)
+
+def test_stats_endpoints(stats_client):
+    response = stats_client.get("/stats/champions?patch=15.1&tournament=LEC")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["games"] == 2
+    assert [c["champion"] for c in data["champions"]][:2] == ["Aatrox", "Azir"]
+
+    response = stats_client.get("/stats/teams?side=blue&team=Blue")
+    assert response.get_json()["teams"] == [{"team": "Blue", "games": 2, "wins": 1, "win_rate": 0.5}]
+
+    assert stats_client.get("/stats/teams?side=purple").status_code == 400
+
+    games = stats_client.get("/games?champion=Aatrox").get_json()["games"]
+    assert [game["id"] for game in games] == ["G2", "G1"]
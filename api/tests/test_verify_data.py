@@ -0,0 +1,161 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from sqlalchemy.exc import OperationalError
+
+from api import models_base
+from api.bin import collect_data as collect_module
+from api.bin.collect_data import collect_data
+from api.bin.export_snapshot import export_snapshot
+from api.bin.verify_data import verify_data
+from api.cargo_standin import SqliteCargo
+from api.draft_action_model import DraftAction
+from api.fingerprint_model import GameFingerprint
+from api.game_documents import read_game_document
+from api.rate_limiter import AdaptiveTokenBucket
+from api.scoreboard_game_model import ScoreboardGame
+from api.search_index import update_search_index
+from api.search_model import SearchEntry, SearchIndexedGame
+from api.snapshot import load_snapshot
+from api.stats_rollup import update_rollups
+from api.stats_rollup_model import ChampionStat, RolledUpGame, TeamStat
+from api.synthetic import write_database
+
+
+def limiter():
+    return AdaptiveTokenBucket(rate=1000, max_rate=1000, capacity=10)
+
+
+@pytest.fixture()
+def wiki(tmp_path):
+    """A synthetic wiki, collected into a fresh database."""
+    path = str(tmp_path / "cargo.db")
+    write_database(path, 40, seed=4)
+    original_url = models_base.DATABASE_URL
+    models_base.configure_engine(f"sqlite:///{tmp_path / 'collected.db'}")
+    collect_data(process_limit=0, cargo_client=SqliteCargo(path), limiter=limiter())
+    yield path
+    models_base.configure_engine(original_url)
+
+
+def resave(path, game_id, **changes):
+    """Saves a game's wiki page again, as Cargo does: its rows are rewritten under new _IDs."""
+    with sqlite3.connect(path) as connection:
+        for table in ("ScoreboardGames", "PicksAndBansS7"):
+            rows = connection.execute(f'SELECT * FROM "{table}" WHERE GameId = ?', (game_id,))
+            columns = [column[0] for column in rows.description]
+            rows = [dict(zip(columns, row)) for row in rows.fetchall()]
+            connection.execute(f'DELETE FROM "{table}" WHERE GameId = ?', (game_id,))
+            for row in rows:
+                row.update((key, value) for key, value in changes.items() if key in row)
+                connection.execute(f'INSERT INTO "{table}" ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})',
+                                   list(row.values()))
+
+
+def rollups(session):
+    return (sorted((s.Patch, s.Tournament, s.Side, s.Team, s.Games, s.Wins) for s in session.query(TeamStat)),
+            sorted((s.Patch, s.Tournament, s.Side, s.Champion, s.Picks, s.Bans, s.Wins) for s in session.query(ChampionStat)))
+
+
+def search_entries(session):
+    return sorted((e.Type, e.Name, e.Games) for e in session.query(SearchEntry))
+
+
+def test_only_edited_games_are_fetched_and_corrected(wiki):
+    session = models_base.get_session()
+    try:
+        game_ids = [game_id for (game_id,) in session.query(ScoreboardGame.GameId).order_by(ScoreboardGame.DateTime_UTC)]
+        assert session.query(GameFingerprint).count() == len(game_ids) == 40 # stamped as collected
+        edited, resaved = game_ids[5], game_ids[6]
+        old = session.get(ScoreboardGame, edited)
+        new_winner = 2 if old.Winner == 1 else 1
+    finally:
+        session.close()
+
+    assert verify_data(cargo_client=SqliteCargo(wiki), limiter=limiter()).changed_stamps == 0
+    resave(wiki, edited, VOD='https://vod.example/fixed', Winner=new_winner, Team1='Renamed Team')
+    resave(wiki, resaved) # saved without changes
+
+    assert verify_data(cargo_client=SqliteCargo(wiki), limiter=limiter(), dry_run=True).corrected_games == 1
+    stats = verify_data(cargo_client=SqliteCargo(wiki), limiter=limiter())
+    assert (stats.verified_games, stats.changed_stamps, stats.corrected_games, stats.added_games) == (40, 2, 1, 0)
+    assert stats.api_calls == 2 # a page of stamps, then the two games' rows
+
+    session = models_base.get_session()
+    try:
+        game = session.get(ScoreboardGame, edited)
+        assert (game.VOD, game.Winner, game.Team1) == ('https://vod.example/fixed', new_winner, 'Renamed Team')
+        assert json.loads(read_game_document(session, edited))['blue']['team']['name'] == 'Renamed Team'
+        # The rollups and search entries match ones counted from scratch
+        corrected = rollups(session), search_entries(session)
+        assert ('team', 'Renamed Team', 1) in corrected[1]
+        for model in (TeamStat, ChampionStat, RolledUpGame, SearchEntry, SearchIndexedGame):
+            session.query(model).delete()
+        update_rollups(session, game_ids)
+        update_search_index(session, game_ids)
+        assert (rollups(session), search_entries(session)) == corrected
+        session.rollback()
+    finally:
+        session.close()
+    assert verify_data(cargo_client=SqliteCargo(wiki), limiter=limiter()).changed_stamps == 0
+
+
+def test_snapshot_export_after_a_correction_has_no_duplicates(wiki, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshot")
+    assert export_snapshot(snapshot_dir)['ScoreboardGames'] == 40
+    session = models_base.get_session()
+    try:
+        edited = session.query(ScoreboardGame.GameId).order_by(ScoreboardGame.GameId).first()[0]
+    finally:
+        session.close()
+    resave(wiki, edited, VOD='https://vod.example/fixed')
+    assert verify_data(cargo_client=SqliteCargo(wiki), limiter=limiter()).corrected_games == 1
+
+    # The corrected rows moved past the watermark: an append would export them a second time
+    old_parts = load_snapshot(snapshot_dir)['ScoreboardGames'].column_parts('GameId')
+    assert export_snapshot(snapshot_dir, incremental=True) == {'ScoreboardGames': 40, 'PicksAndBansS7': 40}
+    # The new snapshot was swapped in whole: readers of the old one keep their memory maps
+    assert sum(len(part) for part in old_parts) == 40
+    assert [name for name in os.listdir(tmp_path) if name.startswith('snapshot')] == ['snapshot']
+    games = load_snapshot(snapshot_dir)['ScoreboardGames']
+    game_ids = games.decode('GameId')
+    assert len(game_ids) == len(set(game_ids)) == 40
+    assert games.decode('VOD')[game_ids.index(edited)] == 'https://vod.example/fixed'
+    assert export_snapshot(snapshot_dir, incremental=True) == {'ScoreboardGames': 0, 'PicksAndBansS7': 0}
+
+
+def test_a_failed_rewrite_rolls_the_page_back(wiki, monkeypatch):
+    session = models_base.get_session()
+    try:
+        edited = session.query(ScoreboardGame.GameId).order_by(ScoreboardGame.GameId).first()[0]
+        actions = session.query(DraftAction).filter(DraftAction.GameId == edited).count()
+        assert actions > 0
+    finally:
+        session.close()
+    resave(wiki, edited, VOD='https://vod.example/fixed')
+
+    def fail(*args):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    # The game's DraftActions are deleted, then inserted again from the corrected rows
+    monkeypatch.setattr(collect_module, 'insert_draft_actions', fail)
+    assert verify_data(cargo_client=SqliteCargo(wiki), limiter=limiter()).corrected_games == 1
+    session = models_base.get_session()
+    try:
+        assert session.get(ScoreboardGame, edited).VOD != 'https://vod.example/fixed'
+        assert session.query(DraftAction).filter(DraftAction.GameId == edited).count() == actions
+    finally:
+        session.close()
+
+    # Its stamp wasn't saved, so the next run fetches and corrects it again
+    monkeypatch.undo()
+    assert verify_data(cargo_client=SqliteCargo(wiki), limiter=limiter()).corrected_games == 1
+    session = models_base.get_session()
+    try:
+        assert session.get(ScoreboardGame, edited).VOD == 'https://vod.example/fixed'
+        assert session.query(DraftAction).filter(DraftAction.GameId == edited).count() == actions
+    finally:
+        session.close()